@@ -0,0 +1,200 @@
+"""
+Benchmark cases for the hot paths of the workflows' own scripts.
+
+Each case is registered with `@case(name)` and is called with the directory of
+a synthetic dataset (see synthetic_data.py). It does all of its (untimed) input
+preparation and returns a `Benchmark` whose `run` is what's measured. Cases
+which modify their inputs provide a `setup`, called (untimed) before each run to
+produce fresh arguments.
+"""
+import copy
+import importlib.util
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGEST_SCRIPTS = os.path.join(REPO_ROOT, "ingest", "scripts")
+PHYLOGENETIC_SCRIPTS = os.path.join(REPO_ROOT, "phylogenetic", "scripts")
+EPI_WORKFLOW = os.path.join(REPO_ROOT, "phylogenetic", "workflows", "bdbv-2026-epi")
+
+# The scripts import their siblings (e.g. cross_reference_fauna imports cross_reference_inrb)
+for _path in (INGEST_SCRIPTS, PHYLOGENETIC_SCRIPTS):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+CASES = {}
+
+
+class Benchmark:
+    def __init__(self, run, setup=None):
+        self.run = run
+        self.setup = setup
+
+
+def case(name, max_size=None):
+    """Register a case, which is skipped for datasets larger than *max_size*"""
+    def register(fn):
+        fn.max_size = max_size
+        CASES[name] = fn
+        return fn
+    return register
+
+
+def load_script(directory, name):
+    """Import a script by file name (many aren't valid module names, e.g. collect-cases.py)"""
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(directory, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def deep_copier(*args):
+    """A setup function returning fresh (deep) copies of *args*"""
+    return lambda: copy.deepcopy(args)
+
+
+@case("spike_in_ncbi_data")
+def spike_in_ncbi_data(data):
+    import pandas as pd
+    script = load_script(INGEST_SCRIPTS, "spike_in_ncbi_data")
+    ppx = pd.read_csv(os.path.join(data, "ppx", "metadata_ppx.tsv"), sep="\t")
+    ncbi = pd.read_csv(os.path.join(data, "entrez", "metadata_ncbi_entrez.tsv"), sep="\t")
+    return Benchmark(lambda: script.spike_in_ncbi_data(ppx, ncbi, ["title", "note"]))
+
+
+@case("cross_reference_inrb.spike_in_inrb_data")
+def spike_in_inrb_data(data):
+    script = load_script(INGEST_SCRIPTS, "cross_reference_inrb")
+    metadata = script.parse_tsv(os.path.join(data, "ppx", "metadata_ppx.tsv"), id="accession")
+    nord_kivu = script.parse_tsv(os.path.join(data, "inrb", "nord-kivu-metadata.tsv"), id="strain")
+    inrb_name_map = script.ppx_to_inrb_names(metadata)
+    return Benchmark(script.spike_in_inrb_data, setup=deep_copier(metadata, nord_kivu, inrb_name_map))
+
+
+@case("cross_reference_fauna.spike_in_fauna")
+def spike_in_fauna(data):
+    script = load_script(INGEST_SCRIPTS, "cross_reference_fauna")
+    metadata = script.parse_tsv(os.path.join(data, "ppx", "metadata_ppx.tsv"), id="accession")
+    fauna = script.parse_tsv(os.path.join(data, "fauna", "west-africa-2013-metadata.tsv"), id="accession")
+    return Benchmark(lambda metadata, fauna: script.spike_in_fauna(metadata, fauna, insdc_id="insdcAccessionBase"),
+                     setup=deep_copier(metadata, fauna))
+
+
+@case("extract_from_strain.extract_info")
+def extract_info(data):
+    script = load_script(INGEST_SCRIPTS, "extract_from_strain")
+    with open(os.path.join(data, "entrez", "ncbi_entrez.ndjson")) as fh:
+        records = [json.loads(line) for line in fh]
+    # the Entrez records don't have dates, so borrow the PPX ones
+    dates = load_script(INGEST_SCRIPTS, "cross_reference_inrb").parse_tsv(
+        os.path.join(data, "ppx", "metadata_ppx.tsv"), id="insdcAccessionBase")
+    for record in records:
+        record["strain"] = record["strain"] or dates[record["accession"]]["strain"]
+        record["date"] = dates[record["accession"]]["date"]
+
+    def run(records):
+        for record in records:
+            script.extract_info(record)
+    return Benchmark(run, setup=deep_copier(records))
+
+
+@case("lab_hosts.is_lab_host")
+def is_lab_host(data):
+    import pandas as pd
+    script = load_script(INGEST_SCRIPTS, "lab_hosts")
+    ppx = pd.read_csv(os.path.join(data, "ppx", "metadata_ppx.tsv"), sep="\t")
+    ncbi = pd.read_csv(os.path.join(data, "entrez", "metadata_ncbi_entrez.tsv"), sep="\t")
+    metadata = load_script(INGEST_SCRIPTS, "spike_in_ncbi_data").spike_in_ncbi_data(ppx, ncbi, ["title", "note"])
+
+    def setup():
+        for rows in script.excluded.values():
+            rows.clear()
+        return ()
+    return Benchmark(lambda: metadata.apply(script.is_lab_host, axis=1), setup=setup)
+
+
+@case("check_lat_longs.find_uncovered")
+def find_uncovered(data):
+    script = load_script(INGEST_SCRIPTS, "check_lat_longs")
+    known = script.read_lat_long_places(os.path.join(data, "geo", "lat_longs.tsv"))
+    rows, _fieldnames = script.read_metadata(os.path.join(data, "ppx", "metadata_ppx.tsv"), "accession")
+
+    def run():
+        for field in script.GEOGRAPHIC_FIELDS:
+            script.find_uncovered(rows, field, known[field])
+    return Benchmark(run)
+
+
+@case("dev_format-lat-longs.find_similar_clusters")
+def find_similar_clusters(data):
+    script = load_script(PHYLOGENETIC_SCRIPTS, "dev_format-lat-longs")
+    # As in the script, locations are clustered within their (country, division)
+    # group, and divisions within their country.
+    groups = {}
+    with open(os.path.join(data, "ppx", "metadata_ppx.tsv")) as fh:
+        header = fh.readline().rstrip("\n").split("\t")
+        country, division, location = (header.index(c) for c in ("country", "division", "location"))
+        for line in fh:
+            row = line.rstrip("\n").split("\t")
+            if row[division]:
+                groups.setdefault((row[country],), set()).add(row[division])
+            if row[location]:
+                groups.setdefault((row[country], row[division]), set()).add(row[location])
+
+    def run():
+        for names in groups.values():
+            script.find_similar_clusters(names)
+    return Benchmark(run)
+
+
+@case("dev_collect-geographies.centroid")
+def centroid(data):
+    script = load_script(INGEST_SCRIPTS, "dev_collect-geographies")
+    with open(os.path.join(data, "sitrep", "build", "drc_health_zones.geojson")) as fh:
+        features = json.load(fh)["features"]
+    return Benchmark(lambda: [script.centroid(feature["geometry"]) for feature in features])
+
+
+@case("collect-cases.compute_clamped")
+def compute_clamped(data):
+    script = load_script(EPI_WORKFLOW, "collect-cases")
+    table = script.collect(os.path.join(data, "sitrep"))
+    return Benchmark(lambda: script.compute_clamped(table))
+
+
+@case("make-tree.build_children")
+def build_children(data):
+    collect_cases = load_script(EPI_WORKFLOW, "collect-cases")
+    script = load_script(EPI_WORKFLOW, "make-tree")
+    repo = os.path.join(data, "sitrep")
+    cases_path = os.path.join(data, "sitrep", "cases.tsv")
+    with open(cases_path, "w", newline="", encoding="utf-8") as fh:
+        collect_cases.write_tsv(collect_cases.collect(repo), collect_cases.load_provinces(repo), fh)
+    return Benchmark(lambda: script.build_children(cases_path, script.DEFAULT_COUNT, script.DEFAULT_LAG))
+
+
+# Quadratic in the number of tips (Bio.Phylo's common_ancestor searches the
+# whole tree for each strain), so larger sizes take too long to be useful.
+@case("label_outbreaks", max_size=5000)
+def label_outbreaks(data):
+    from Bio import Phylo
+    from metadata_columns import read_metadata_columns
+    script = load_script(PHYLOGENETIC_SCRIPTS, "label_outbreaks")
+    tree = Phylo.read(os.path.join(data, "tree", "tree.nwk"), "newick")
+    metadata = read_metadata_columns(os.path.join(data, "tree", "metadata.tsv"), ["outbreak"])
+    return Benchmark(lambda: script.label_outbreaks(tree, metadata))
+
+
+@case("collect-mutations.count_mutations")
+def count_mutations(data):
+    script = load_script(PHYLOGENETIC_SCRIPTS, "collect-mutations")
+    with open(os.path.join(data, "tree", "muts.json")) as fh:
+        nodes = json.load(fh)["nodes"]
+    cds = ["NP", "VP35", "VP40", "GP", "VP30", "VP24", "L"]
+    ranges = script.parse_counts("0,1,2,3,4,5,6,7+")
+    return Benchmark(lambda: script.count_mutations(nodes, cds, ranges))
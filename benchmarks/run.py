@@ -0,0 +1,198 @@
+#! /usr/bin/env python3
+
+"""
+Runs the benchmark cases (see cases.py) over synthetic datasets of several
+sizes, recording the time and peak memory of each, and optionally compares them
+against a baseline.
+
+For each case and size, the time is the fastest (and median) of up to --repeat
+runs (fewer, but at least one, if they exceed --max-time in total),
+and the peak memory is the peak of Python allocations (as traced by
+`tracemalloc`, which includes numpy/pandas buffers) made during a separate,
+untimed run. Setup work (reading inputs etc.) is excluded from both.
+
+Datasets are generated on first use (with synthetic_data.py) under --data-dir
+and reused thereafter.
+
+    # record a baseline
+    python benchmarks/run.py --output baseline.json
+
+    # compare a branch against it, failing on >25% slowdowns / memory growth
+    python benchmarks/run.py --baseline baseline.json --threshold 0.25 --output results.json
+
+Exits with status 1 if any case regressed beyond the threshold.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from cases import CASES  # noqa: E402
+import synthetic_data  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_DATA_DIR = os.path.join(synthetic_data.REPO_ROOT, "synthetic", "benchmarks")
+
+# Differences below these are noise, never regressions
+MIN_TIME_DELTA = 0.001  # seconds
+MIN_MEMORY_DELTA = 64 * 1024  # bytes
+
+
+def dataset(data_dir, size, seed):
+    """The directory of the synthetic dataset of *size* records, generating it if needed"""
+    path = os.path.join(data_dir, f"seed{seed}-{size}")
+    marker = os.path.join(path, ".complete")
+    if not os.path.exists(marker):
+        print(f"Generating synthetic dataset of {size} records in {path!r}", file=sys.stderr)
+        # No case reads the sequences, so keep them small
+        synthetic_data.generate(path, size, seed=seed, genome_length=100)
+        open(marker, "w").close()
+    return path
+
+
+@contextlib.contextmanager
+def quiet():
+    """Discard the (often copious) output of the scripts' functions"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def measure(benchmark, repeat, max_time):
+    """Returns (times, peak memory) of *benchmark*"""
+    times = []
+    with quiet():
+        while len(times) < repeat and sum(times) < max_time:
+            args = benchmark.setup() if benchmark.setup else ()
+            gc.collect()
+            start = time.perf_counter()
+            benchmark.run(*args)
+            times.append(time.perf_counter() - start)
+
+        args = benchmark.setup() if benchmark.setup else ()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            benchmark.run(*args)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+
+def run(case_names, sizes, repeat, max_time, data_dir, seed):
+    results = []
+    for size in sizes:
+        data = dataset(data_dir, size, seed)
+        for name in case_names:
+            if CASES[name].max_size and size > CASES[name].max_size:
+                print(f"{name:<45} {size:>8}  skipped (max size {CASES[name].max_size})", file=sys.stderr)
+                continue
+            with quiet():
+                benchmark = CASES[name](data)
+            times, peak = measure(benchmark, repeat, max_time)
+            result = {
+                "case": name,
+                "size": size,
+                "time": min(times),
+                "time_median": statistics.median(times),
+                "repeat": len(times),
+                "peak_memory": peak,
+            }
+            print(f"{name:<45} {size:>8}  {format_time(result['time']):>10}  {format_bytes(peak):>10}", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """
+    Returns a list of (case, size, metric, baseline value, value, ratio,
+    regressed) for the results which are also in *baseline*.
+    """
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    comparisons = []
+    for result in results:
+        if (base := previous.get((result["case"], result["size"]))) is None:
+            continue
+        for metric, limit, floor in [("time", threshold, MIN_TIME_DELTA),
+                                     ("peak_memory", memory_threshold, MIN_MEMORY_DELTA)]:
+            old, new = base[metric], result[metric]
+            ratio = new / old if old else float("inf") if new else 1.0
+            regressed = ratio > 1 + limit and new - old > floor
+            comparisons.append((result["case"], result["size"], metric, old, new, ratio, regressed))
+    return comparisons
+
+
+def format_time(seconds):
+    return f"{seconds * 1000:.2f} ms" if seconds < 1 else f"{seconds:.3f} s"
+
+
+def format_bytes(n):
+    for unit in ["B", "KiB", "MiB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def print_comparisons(comparisons):
+    print(f"{'case':<45} {'size':>8}  {'metric':<11} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, size, metric, old, new, ratio, regressed in comparisons:
+        fmt = format_time if metric == "time" else format_bytes
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<45} {size:>8}  {metric:<11} {fmt(old):>10} {fmt(new):>10} {ratio:>6.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", metavar="CASE",
+                        help=f"Cases to run (default: all). One or more of: {', '.join(CASES)}")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help="Dataset sizes (number of records) to run each case at (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case and size (default: %(default)s)")
+    parser.add_argument("--max-time", type=float, default=10,
+                        help="Stop repeating a case once its runs have taken this many seconds (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic dataset seed (default: %(default)s)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where to keep the synthetic datasets")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON results (from --output) to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Fail if a case is more than this fraction slower than the baseline (default: %(default)s)")
+    parser.add_argument("--memory-threshold", type=float,
+                        help="Fail if a case's peak memory grows by more than this fraction (default: --threshold)")
+    args = parser.parse_args()
+
+    if unknown := [c for c in args.cases or [] if c not in CASES]:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    results = run(args.cases or list(CASES), args.sizes, args.repeat, args.max_time, args.data_dir, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "results": results,
+            }, fh, indent=2)
+            fh.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        memory_threshold = args.threshold if args.memory_threshold is None else args.memory_threshold
+        comparisons = compare(results, baseline, args.threshold, memory_threshold)
+        print_comparisons(comparisons)
+        if n_regressed := sum(1 for c in comparisons if c[-1]):
+            print(f"\n{n_regressed} regression(s) beyond the threshold", file=sys.stderr)
+            sys.exit(1)
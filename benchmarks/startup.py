@@ -0,0 +1,146 @@
+#! /usr/bin/env python3
+
+"""
+Measures the startup cost of the workflows' scripts: the time spent importing
+modules before a script's `if __name__ == "__main__":` block runs, which every
+job pays (and which dominates the tiny per-build annotation jobs).
+
+Each script's module body is run (via `runpy`, so not its main block) in a
+fresh interpreter under `python -X importtime`, and the cumulative times of its
+top-level imports are summed, excluding those of modules the interpreter
+imports by itself. The minimum over --repeat runs is compared against the
+script's budget (see BUDGETS), and the heaviest imports are listed to show
+where the time goes:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --scripts phylogenetic/scripts/get_year.py --top 10
+
+Heavy dependencies (augur, pandas, Bio, numpy...) should be imported inside the
+functions which need them, so that they're only paid for when they're used.
+
+Exits with status 1 if any script is over its budget.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIRS = ["ingest/scripts", "phylogenetic/scripts", "shared/scripts"]
+
+DEFAULT_BUDGET = 1.0  # seconds
+
+# Scripts which run many times per workflow (e.g. per build) have tighter
+# budgets. Budgets are generous multiples of the times on a laptop, as import
+# times vary between machines.
+BUDGETS = {
+    "phylogenetic/scripts/annotate.py": 0.2,
+    "phylogenetic/scripts/get_year.py": 0.2,
+    "phylogenetic/scripts/label_outbreaks.py": 0.2,
+    "phylogenetic/scripts/collect-mutations.py": 0.1,
+    "phylogenetic/scripts/metadata_columns.py": 0.1,
+    "phylogenetic/scripts/palettes.py": 0.05,
+    "phylogenetic/scripts/add_nextclade_columns.py": 0.1,
+    "shared/scripts/file_io.py": 0.05,
+    "shared/scripts/input_cache.py": 0.1,
+    "shared/scripts/instrument.py": 0.05,
+    "shared/scripts/s3_upload.py": 0.1,
+}
+
+# Imports the module body of a script (without running its main block), with its
+# directory on sys.path as when it's run.
+RUN_MODULE = "import runpy, sys; sys.path.insert(0, sys.argv[1]); runpy.run_path(sys.argv[2])"
+
+
+def parse_importtime(stderr):
+    """
+    Returns {module: cumulative seconds} of the top-level imports in the
+    `-X importtime` output *stderr*.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip() == "cumulative":  # header
+            continue
+        # nested imports are indented beyond the single space of top-level ones
+        if not name.startswith("  "):
+            imports[name.strip()] = int(cumulative) / 1e6
+    return imports
+
+
+def importtime(args):
+    """Returns {module: seconds} of the top-level imports of `python -X importtime *args*`"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True,
+                          env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit status {proc.returncode}")
+    return parse_importtime(proc.stderr)
+
+
+def measure(script, baseline, repeat):
+    """
+    Returns (seconds, {module: seconds}) of the fastest of *repeat* imports of
+    *script* (a path relative to the repo root), excluding *baseline* modules.
+    """
+    path = os.path.join(REPO_ROOT, script)
+    best = None
+    for _ in range(repeat):
+        imports = {name: t for name, t in importtime(["-c", RUN_MODULE, os.path.dirname(path), path]).items()
+                   if name not in baseline}
+        if best is None or sum(imports.values()) < sum(best.values()):
+            best = imports
+    return sum(best.values()), best
+
+
+def default_scripts():
+    return sorted(os.path.relpath(path, REPO_ROOT)
+                  for directory in SCRIPT_DIRS
+                  for path in glob.glob(os.path.join(REPO_ROOT, directory, "*.py")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", nargs="+", metavar="PATH",
+                        help=f"Scripts to measure, relative to the repo root (default: all in {', '.join(SCRIPT_DIRS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per script (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest imports to list per script (default: %(default)s)")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    # What the interpreter (and runpy) import by themselves
+    with tempfile.TemporaryDirectory() as tmpdir:
+        empty = os.path.join(tmpdir, "empty.py")
+        open(empty, "w").close()
+        baseline = set(importtime(["-c", RUN_MODULE, tmpdir, empty]))
+    results = []
+    for script in args.scripts or default_scripts():
+        budget = BUDGETS.get(script, DEFAULT_BUDGET)
+        try:
+            seconds, imports = measure(script, baseline, args.repeat)
+        except RuntimeError as e:
+            print(f"ERROR: importing {script} failed: {e}", file=sys.stderr)
+            sys.exit(2)
+        heaviest = sorted(imports.items(), key=lambda item: -item[1])[:args.top]
+        over = seconds > budget
+        print(f"{script:<50} {seconds * 1000:>7.0f} ms  (budget {budget * 1000:.0f} ms){'  OVER BUDGET' if over else ''}")
+        for name, t in heaviest:
+            print(f"    {name:<46} {t * 1000:>7.0f} ms")
+        results.append({"script": script, "seconds": seconds, "budget": budget, "over_budget": over,
+                        "imports": dict(heaviest)})
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"python": sys.version.split()[0], "results": results}, fh, indent=2)
+            fh.write("\n")
+
+    if n_over := sum(1 for r in results if r["over_budget"]):
+        print(f"\n{n_over} script(s) over their startup budget", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,600 @@
+#! /usr/bin/env python3
+
+"""
+Generate a synthetic, internally consistent set of ingest & phylogenetic inputs
+at a configurable scale, for benchmarking the workflows' scripts offline.
+
+The output directory is laid out as:
+
+    ppx/ppx_metadata.csv              Pathoplexus metadata CSV (config.ppx_metadata_fields)
+    ppx/ppx_sequences.fasta           Pathoplexus sequences (named by accessionVersion)
+    ppx/metadata_ppx.tsv              the same records after `curate_ppx` (field-mapped TSV)
+    entrez/ncbi_entrez.ndjson         Entrez records keyed by the PPX insdcAccessionBase
+    entrez/metadata_ncbi_entrez.tsv   the same records as a TSV (`curate_ncbi_entrez`)
+    inrb/nord-kivu-metadata.tsv       INRB table keyed by strain names embedded in PPX strains
+    fauna/west-africa-2013-metadata.tsv   fauna table keyed by PPX insdcAccessionBase
+    geo/lat_longs.tsv                 Augur lat-longs (most, but not all, places covered)
+    geo/geolocation_rules.tsv         rules mapping misspelt places to their canonical names
+    geo/canonical-drc-geo.tsv         canonical DRC divisions / locations (dev_format-lat-longs.py)
+    tree/tree.nwk                     a tree whose tips are (a subset of) the PPX accessions
+    tree/muts.json                    `augur ancestral`-shaped node-data for every node
+    tree/metadata.tsv                 tip metadata with Nextclade-style `outbreak` labels
+    sitrep/                           an INRB-UMIE/Ebola_DRC_2026-shaped repo for
+                                      collect-cases.py and dev_collect-geographies.py:
+                                      data/insp_sitrep/processed/insp_sitrep__<metric>__daily.csv,
+                                      data/aliases.csv and build/drc_health_zones.geojson
+
+Everything is derived from --seed: the same seed and sizes always produce the
+same files, and each component uses its own random stream so generating a subset
+(--only) produces identical files to generating everything.
+
+    python benchmarks/synthetic_data.py --records 100000 --output-dir synthetic/100k
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGEST_CONFIG = os.path.join(REPO_ROOT, "ingest", "defaults", "config.yaml")
+sys.path.insert(0, os.path.join(REPO_ROOT, "ingest", "scripts"))
+
+COMPONENTS = ["ppx", "entrez", "inrb", "fauna", "geo", "tree", "sitrep"]
+
+# (country, ISO3) - the PPX strain names embed the ISO code
+COUNTRIES = [
+    ("Democratic Republic of the Congo", "COD"),
+    ("Uganda", "UGA"),
+    ("Guinea", "GIN"),
+    ("Sierra Leone", "SLE"),
+    ("Liberia", "LBR"),
+    ("Gabon", "GAB"),
+    ("Republic of the Congo", "COG"),
+    ("South Sudan", "SSD"),
+]
+DRC = COUNTRIES[0][0]
+REGION = "Africa"
+
+# Outbreak names as assigned by the Nextclade datasets (see label_outbreaks.geographic)
+OUTBREAKS = [
+    "Ebov-1976", "Ebov-1995", "Ebov-2007", "Ebov-2013", "Ebov-2013/r2021", "Ebov-2014",
+    "Ebov-2018a", "Ebov-2018b", "Ebov-2020", "Ebov-2022", "Ebov-2025", "unassigned",
+]
+CDS = ["NP", "VP35", "VP40", "GP", "VP30", "VP24", "L"]
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+SITREP_METRICS = ["new_confirmed_cases", "new_suspected_cases", "cumulative_confirmed_cases", "cumulative_suspected_cases"]
+SYLLABLES = ["ba", "be", "bo", "bu", "ka", "ki", "ko", "ku", "la", "le", "li", "lu", "ma", "mba", "mbo",
+             "na", "ndu", "ngo", "nya", "sa", "se", "si", "ta", "tu", "wa", "ya", "za", "zi", "go", "ri"]
+DEFAULT_GENOME_LENGTH = 18959
+NUCLEOTIDES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+def rng_for(seed, component):
+    """An independent random generator for each *component*, derived from *seed*"""
+    return np.random.default_rng([seed, COMPONENTS.index(component)])
+
+
+def place_names(rng, n, prefix=""):
+    """*n* distinct, pronounceable place names"""
+    names, seen = [], set()
+    while len(names) < n:
+        k = int(rng.integers(2, 5))
+        name = prefix + "".join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), k)).capitalize()
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def misspell(rng, name):
+    """A single-character edit of *name* (see dev_format-lat-longs.names_similar)"""
+    i = int(rng.integers(1, len(name)))
+    edit = int(rng.integers(0, 3))
+    if edit == 0:
+        return name[:i] + name[i + 1:]
+    letter = chr(ord("a") + int(rng.integers(0, 26)))
+    if edit == 1:
+        return name[:i] + letter + name[i:]
+    return name[:i] + letter + name[i + 1:]
+
+
+def write_tsv(path, header, rows, delimiter="\t"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh, delimiter=delimiter, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+class Geography:
+    """
+    A synthetic geography: countries -> divisions -> locations, each with a
+    coordinate, plus misspelt variants of some places (as seen in metadata).
+    """
+    def __init__(self, seed, n_records):
+        rng = np.random.default_rng([seed, len(COMPONENTS)])  # shared by all components
+        n_divisions = int(np.clip(n_records // 200, 12, 2000))
+        n_locations = int(np.clip(n_records // 20, 40, 20000))
+        self.countries = [name for name, _iso in COUNTRIES]
+        self.iso = dict(COUNTRIES)
+        # DRC has the lion's share of divisions (as in the real data)
+        weights = np.array([8] + [1] * (len(COUNTRIES) - 1), dtype=float)
+        division_country = rng.choice(len(COUNTRIES), size=n_divisions, p=weights / weights.sum())
+        division_country[:len(COUNTRIES)] = np.arange(len(COUNTRIES))  # every country has a division
+        self.divisions = place_names(rng, n_divisions)
+        self.division_country = [self.countries[i] for i in division_country]
+        location_division = rng.integers(0, n_divisions, size=n_locations)
+        location_division[:n_divisions] = np.arange(n_divisions)  # every division has a location
+        self.locations = place_names(rng, n_locations)
+        self.location_division = [self.divisions[i] for i in location_division]
+        centres = {c: (float(rng.uniform(-8, 12)), float(rng.uniform(-14, 32))) for c in self.countries}
+        self.coords = {
+            "region": {REGION: (4.07, 21.82)},
+            "country": centres,
+            "division": {d: self._near(rng, centres[c], 3) for d, c in zip(self.divisions, self.division_country)},
+        }
+        self.coords["location"] = {
+            location: self._near(rng, self.coords["division"][division], 1)
+            for location, division in zip(self.locations, self.location_division)
+        }
+        # ~5% of locations are also seen misspelt in the metadata
+        self.variants = {}
+        for location in self.locations:
+            if rng.random() < 0.05:
+                variant = misspell(rng, location)
+                if variant not in self.coords["location"]:
+                    self.variants[variant] = location
+        # ~3% of locations are missing from the lat-longs file
+        self.uncovered = {location for location in self.locations if rng.random() < 0.03}
+
+    @staticmethod
+    def _near(rng, centre, spread):
+        return (round(centre[0] + float(rng.normal(0, spread)), 6), round(centre[1] + float(rng.normal(0, spread)), 6))
+
+    def sample(self, rng, n):
+        """(country, division, location) for *n* records, with some blanks & misspellings"""
+        variant_of = {location: variant for variant, location in self.variants.items()}
+        country_of = dict(zip(self.divisions, self.division_country))
+        idx = rng.integers(0, len(self.locations), size=n)
+        blank = rng.random(size=(n, 2))
+        misspelt = rng.random(size=n) < 0.5
+        for i in range(n):
+            location = self.locations[idx[i]]
+            division = self.location_division[idx[i]]
+            country = country_of[division]
+            if location in variant_of and misspelt[i]:
+                location = variant_of[location]
+            if blank[i, 0] < 0.1:
+                division, location = "", ""
+            elif blank[i, 1] < 0.2:
+                location = ""
+            yield country, division, location
+
+
+def _day(date):
+    """Days since the epoch of an ISO date"""
+    return int(np.datetime64(date, "D").astype(int))
+
+
+# The phylogenetic workflow's sampling-year colouring (get_year.py) has colours for at
+# most 36 distinct years (see palettes.py), so the default range is kept within that
+def random_dates(rng, n, start_year=1995, end_year=2026):
+    """ISO dates (~40% within the 2018-2020 Nord-Kivu epidemic), ~10% only to year and ~10% only to month"""
+    ordinal = np.where(rng.random(size=n) < 0.4,
+                       rng.integers(_day("2018-08-01"), _day("2020-06-25"), size=n),
+                       rng.integers(_day(f"{start_year}-01-01"), _day(f"{end_year}-06-30"), size=n))
+    dates = np.datetime_as_string(ordinal.astype("datetime64[D]"))
+    precision = rng.random(size=n)
+    return [d[:4] if p < 0.1 else d[:7] if p < 0.2 else str(d) for d, p in zip(dates, precision)]
+
+
+def ppx_records(seed, n, geo):
+    """
+    The core PPX records (dicts with curated field names), shared by several
+    components. ~80% have an INSDC accession; ~60% of DRC 2018-2020 records
+    have an INRB-style strain name; ~30% have a `.../H.sapiens-wt/<ISO>/<year>/...`
+    strain name (see extract_from_strain.py).
+    """
+    rng = np.random.default_rng([seed, len(COMPONENTS) + 1])
+    dates = random_dates(rng, n)
+    has_insdc = rng.random(size=n) < 0.8
+    strain_kind = rng.random(size=n)
+    restricted = rng.random(size=n) < 0.1
+    lab_host = rng.random(size=n) < 0.01
+    records = []
+    for i, (country, division, location) in enumerate(geo.sample(rng, n)):
+        accession = f"PP_{i:07d}"
+        year = dates[i][:4]
+        iso = geo.iso[country]
+        if country == DRC and year in ("2018", "2019", "2020") and strain_kind[i] < 0.6:
+            strain = f"Ebola virus/H.sapiens-wt/COD/{year}/{division or 'Ituri'}-BTB{i:06d}"
+        elif strain_kind[i] < 0.3:
+            strain = f"Ebola virus/H.sapiens-wt/{iso}/{year}/Makona-{i:07d}"
+        else:
+            strain = f"{iso}-{year}-{i:07d}"
+        records.append({
+            "accession": accession,
+            "PPX_accession": f"{accession}.1",
+            "version": "1",
+            "insdcAccessionBase": f"SY{i:07d}" if has_insdc[i] else "",
+            "INSDC_accession": f"SY{i:07d}.1" if has_insdc[i] else "",
+            "strain": strain,
+            "date": dates[i],
+            "region": REGION,
+            "country": country,
+            "division": division,
+            "location": location,
+            "host": "" if i % 3 else "Homo sapiens",
+            "is_lab_host": "true" if lab_host[i] else "",
+            "dataUseTerms": "RESTRICTED" if restricted[i] else "OPEN",
+            "date_submitted": dates[i][:4] + "-12-31",
+            "full_authors": f"Author{i % 97}, A.; Author{i % 89}, B.",
+        })
+    return records
+
+
+def write_ppx(seed, outdir, records, genome_length):
+    import yaml
+    rng = rng_for(seed, "ppx")
+    with open(INGEST_CONFIG) as fh:
+        ingest_config = yaml.safe_load(fh)
+    fields = ingest_config["ppx_metadata_fields"]
+    field_map = ingest_config["curate"]["field_map"]  # PPX name -> curated name
+    curated = {v: k for k, v in field_map.items()}     # curated name -> PPX name
+
+    def ppx_row(record):
+        row = dict.fromkeys(fields, "")
+        for key, value in record.items():
+            row[curated.get(key, key)] = value
+        row["accessionVersion"] = record["PPX_accession"]
+        row["isLabHost"] = record["is_lab_host"]
+        row["length"] = str(genome_length)
+        return row
+
+    os.makedirs(os.path.join(outdir, "ppx"), exist_ok=True)
+    with open(os.path.join(outdir, "ppx", "ppx_metadata.csv"), "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fields, lineterminator="\n", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(ppx_row(r) for r in records)
+
+    columns = ["accession", "PPX_accession", "insdcAccessionBase", "INSDC_accession", "strain", "date",
+               "region", "country", "division", "location", "host", "is_lab_host", "dataUseTerms",
+               "date_submitted", "full_authors"]
+    write_tsv(os.path.join(outdir, "ppx", "metadata_ppx.tsv"), columns,
+              ([r[c] for c in columns] for r in records))
+
+    # Sequences are a common ancestor with ~0.5% divergence, variable ends and some N runs
+    reference = NUCLEOTIDES[rng.integers(0, 4, size=genome_length)]
+    with open(os.path.join(outdir, "ppx", "ppx_sequences.fasta"), "wb") as fh:
+        for record in records:
+            seq = reference.copy()
+            sites = rng.integers(0, genome_length, size=rng.poisson(genome_length * 0.005))
+            seq[sites] = NUCLEOTIDES[rng.integers(0, 4, size=len(sites))]
+            if rng.random() < 0.2:
+                start = int(rng.integers(0, genome_length))
+                seq[start:start + int(rng.integers(10, 2000))] = ord("N")
+            start, end = int(rng.integers(0, 60)), genome_length - int(rng.integers(0, 60))
+            fh.write(b">%s\n%s\n" % (record["PPX_accession"].encode(), seq[start:end].tobytes()))
+
+
+def write_entrez(seed, outdir, records):
+    from lab_hosts import LAB_TITLES, NOTES
+    rng = rng_for(seed, "entrez")
+    titles, notes = sorted(LAB_TITLES), sorted(NOTES)
+    rows = []
+    for record in records:
+        if not record["insdcAccessionBase"]:
+            continue
+        r = rng.random(size=4)
+        rows.append({
+            "accession": record["insdcAccessionBase"],
+            "strain": record["strain"] if r[0] < 0.5 else "",
+            "isolate": f"isolate-{record['accession']}" if r[1] < 0.5 else "",
+            "host": "Homo sapiens" if r[2] < 0.7 else "",
+            "title": titles[int(rng.integers(0, len(titles)))] if r[3] < 0.01 else f"Genomic surveillance {record['date'][:4]}",
+            "note": notes[int(rng.integers(0, len(notes)))] if r[3] > 0.995 else "",
+        })
+    os.makedirs(os.path.join(outdir, "entrez"), exist_ok=True)
+    with open(os.path.join(outdir, "entrez", "ncbi_entrez.ndjson"), "w", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(row) + "\n")
+    columns = ["accession", "strain", "isolate", "host", "title", "note"]
+    write_tsv(os.path.join(outdir, "entrez", "metadata_ncbi_entrez.tsv"), columns, ([r[c] for c in columns] for r in rows))
+
+
+def write_inrb(seed, outdir, records, geo):
+    """INRB rows for ~90% of the INRB-style PPX strains, plus some which aren't in PPX"""
+    rng = rng_for(seed, "inrb")
+    rows = []
+    for record in records:
+        if "-BTB" in record["strain"] and rng.random() < 0.9:
+            inrb_strain = record["strain"].rsplit("-", 1)[1]
+            rows.append([inrb_strain, DRC.replace(" ", "_"), record["division"] or "Nord-Kivu",
+                         record["location"], record["date"] if rng.random() < 0.8 else ""])
+    drc_divisions = [d for d, c in zip(geo.divisions, geo.division_country) if c == DRC]
+    for i in range(max(1, len(rows) // 10)):
+        rows.append([f"BTX{i:06d}", DRC.replace(" ", "_"), drc_divisions[i % len(drc_divisions)], "", "2019-01-01"])
+    write_tsv(os.path.join(outdir, "inrb", "nord-kivu-metadata.tsv"),
+              ["strain", "country", "province", "health_zone", "date"], rows)
+
+
+def write_fauna(seed, outdir, records):
+    """Fauna rows for ~half of the West African (2013-2016) records with INSDC accessions"""
+    rng = rng_for(seed, "fauna")
+    rows = []
+    for record in records:
+        if record["insdcAccessionBase"] and record["country"] in ("Guinea", "Sierra Leone", "Liberia") \
+                and rng.random() < 0.5:
+            rows.append([f"EM_{record['accession'][3:]}", record["insdcAccessionBase"], record["date"],
+                         "Subsaharan Africa", record["country"], record["division"] or "?", record["location"] or "?"])
+    for i in range(max(1, len(rows) // 20)):  # not in PPX
+        rows.append([f"EM_X{i:06d}", f"FX{i:07d}", "2014-10-01", "Subsaharan Africa", "Guinea", "?", "?"])
+    write_tsv(os.path.join(outdir, "fauna", "west-africa-2013-metadata.tsv"),
+              ["strain", "accession", "date", "region", "country", "division", "city"], rows)
+
+
+def write_geo(seed, outdir, geo):
+    rng = rng_for(seed, "geo")
+    os.makedirs(os.path.join(outdir, "geo"), exist_ok=True)
+    with open(os.path.join(outdir, "geo", "lat_longs.tsv"), "w", encoding="utf-8") as fh:
+        for resolution in ["region", "country", "division", "location"]:
+            fh.write(f"\n# {resolution}\n")
+            for place, (lat, lon) in geo.coords[resolution].items():
+                if resolution == "location" and place in geo.uncovered:
+                    continue
+                fh.write(f"{resolution}\t{place}\t{lat}\t{lon}\n")
+                if rng.random() < 0.01:  # an (exact or differing) duplicate
+                    fh.write(f"{resolution}\t{place}\t{lat}\t{round(lon + float(rng.choice([0, 0.5])), 6)}\n")
+    rules = [["# raw", "annotated"]]
+    country_of = dict(zip(geo.divisions, geo.division_country))
+    for variant, location in geo.variants.items():
+        division = geo.location_division[geo.locations.index(location)]
+        rules.append([f"{REGION}/{country_of[division]}/{division}/{variant}",
+                      f"{REGION}/{country_of[division]}/{division}/{location}"])
+    write_tsv(os.path.join(outdir, "geo", "geolocation_rules.tsv"), rules[0], rules[1:])
+
+    # Canonical DRC table, in the layout of dev_collect-geographies.py's output
+    with open(os.path.join(outdir, "geo", "canonical-drc-geo.tsv"), "w", encoding="utf-8") as fh:
+        fh.write("# DRC provinces\n")
+        drc_divisions = sorted(d for d, c in zip(geo.divisions, geo.division_country) if c == DRC)
+        for division in drc_divisions:
+            lat, lon = geo.coords["division"][division]
+            fh.write(f"division\t{division}\t{lat}\t{lon}\n")
+        for division in drc_divisions:
+            fh.write(f"# DRC, {division}\n")
+            for location, d in sorted(zip(geo.locations, geo.location_division)):
+                if d == division:
+                    lat, lon = geo.coords["location"][location]
+                    # some coordinates disagree with lat_longs.tsv by more than the threshold
+                    if rng.random() < 0.05:
+                        lat = round(lat + 0.5, 6)
+                    fh.write(f"location\t{location}\t{lat}\t{lon}\n")
+
+
+def random_tree(rng, tips, outbreaks):
+    """
+    A random binary tree (as nested lists of [name, branch_length, children])
+    over *tips*, where the tips of each outbreak form a clade. Built iteratively,
+    so it scales to very large trees.
+    """
+    counter = iter(range(len(tips) * 2))
+    # one split point & branch length per node, drawn up front
+    split_points = rng.random(size=len(tips) * 2).tolist()
+    branch_lengths = rng.exponential(0.001, size=len(tips) * 2).round(6).tolist()
+
+    def clade(members):
+        # split ranges at random points, top-down via an explicit stack
+        root = [None, 0.0, []]
+        stack = [(root, members)]
+        while stack:
+            node, group = stack.pop()
+            i = next(counter)
+            node[0], node[1] = f"NODE_{i:07d}", branch_lengths[i]
+            if len(group) == 1:
+                node[0], node[2] = group[0], []
+                continue
+            split = 1 + int(split_points[i] * (len(group) - 1))
+            for part in (group[:split], group[split:]):
+                child = [None, 0.0, []]
+                node[2].append(child)
+                stack.append((child, part))
+        return root
+
+    by_outbreak = {}
+    for tip, outbreak in zip(tips, outbreaks):
+        by_outbreak.setdefault(outbreak, []).append(tip)
+    # outbreak clades are joined by a ladder-like backbone
+    subtrees = [clade(members) for members in by_outbreak.values()]
+    root = subtrees[0]
+    for subtree in subtrees[1:]:
+        root = [f"NODE_{next(counter):07d}", 0.0, [root, subtree]]
+    root[1] = 0.0
+    return root
+
+
+def iter_nodes(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node[2]))
+
+
+def to_newick(root):
+    """Newick string for a tree of [name, branch_length, children] (iterative)"""
+    parts = []
+    stack = [root]  # nodes to open, or strings to emit
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        name, length, children = item
+        label = f"{name}:{length:.6f}"
+        if not children:
+            parts.append(label)
+            continue
+        parts.append("(")
+        stack.append(")" + label)
+        for i, child in enumerate(reversed(children)):
+            if i:
+                stack.append(",")
+            stack.append(child)
+    return "".join(parts) + ";"
+
+
+def write_tree(seed, outdir, records, n_tips):
+    rng = rng_for(seed, "tree")
+    tips = [r["accession"] for r in records[:n_tips]]
+    outbreak_weights = rng.dirichlet(np.ones(len(OUTBREAKS)))
+    outbreaks = [OUTBREAKS[i] for i in rng.choice(len(OUTBREAKS), size=len(tips), p=outbreak_weights)]
+    root = random_tree(rng, tips, outbreaks)
+
+    os.makedirs(os.path.join(outdir, "tree"), exist_ok=True)
+    with open(os.path.join(outdir, "tree", "tree.nwk"), "w") as fh:
+        fh.write(to_newick(root) + "\n")
+
+    write_tsv(os.path.join(outdir, "tree", "metadata.tsv"), ["accession", "date", "outbreak"],
+              ([r["accession"], r["date"], o] for r, o in zip(records, outbreaks)))
+
+    # augur ancestral node-data: nucleotide & amino-acid mutations on every branch
+    names = [name for name, _length, _children in iter_nodes(root)]
+    genome_length = DEFAULT_GENOME_LENGTH
+    n_muts = rng.poisson(2, size=len(names))
+    positions = rng.integers(1, genome_length + 1, size=n_muts.sum())
+    ancestral = rng.integers(0, 4, size=n_muts.sum())
+    derived = (ancestral + rng.integers(1, 4, size=n_muts.sum())) % 4
+    muts = [f"{'ACGT'[a]}{p}{'ACGT'[d]}" for a, p, d in zip(ancestral.tolist(), positions.tolist(), derived.tolist())]
+    n_aa_muts = rng.poisson(0.3, size=(len(names), len(CDS)))
+    total = int(n_aa_muts.sum())
+    aa_muts = [f"{AMINO_ACIDS[a]}{p}{AMINO_ACIDS[b]}" for a, p, b in zip(
+        rng.integers(0, 20, total).tolist(), rng.integers(1, 700, total).tolist(), rng.integers(0, 20, total).tolist())]
+    mut_offsets = np.concatenate([[0], np.cumsum(n_muts)]).tolist()
+    aa_offsets = np.concatenate([[0], np.cumsum(n_aa_muts.ravel())]).tolist()
+
+    with open(os.path.join(outdir, "tree", "muts.json"), "w") as fh:
+        fh.write('{\n  "generated_by": {"program": "augur", "version": "synthetic"},\n  "nodes": {')
+        for i, name in enumerate(names):
+            node_muts = muts[mut_offsets[i]:mut_offsets[i + 1]]
+            node_muts.sort(key=lambda m: int(m[1:-1]))
+            node_aa_muts = {}
+            for j, cds in enumerate(CDS):
+                k = i * len(CDS) + j
+                node_aa_muts[cds] = aa_muts[aa_offsets[k]:aa_offsets[k + 1]]
+            node = {"muts": node_muts, "aa_muts": node_aa_muts}
+            fh.write(("," if i else "") + f"\n    {json.dumps(name)}: {json.dumps(node)}")
+        fh.write('\n  },\n  "reference": {"nuc": "' + "N" * 60 + '"}\n}\n')
+
+
+def write_sitrep(seed, outdir, geo, n_records):
+    """
+    An INRB-UMIE/Ebola_DRC_2026-shaped repo: per-metric daily CSVs (with ND cells,
+    gaps and downward revisions), an aliases CSV and a health-zone geojson.
+    """
+    rng = rng_for(seed, "sitrep")
+    repo = os.path.join(outdir, "sitrep")
+    country_of = dict(zip(geo.divisions, geo.division_country))
+    zones = [(location, division) for location, division in zip(geo.locations, geo.location_division)
+             if country_of[division] == DRC][:2000]
+    n_days = int(np.clip(n_records // max(1, len(zones)), 30, 2000))
+    days = np.datetime_as_string(np.datetime64("2026-05-01") + np.arange(n_days))
+
+    # aliases: observed (misspelt) -> canonical
+    aliases = {misspell(rng, zone): zone for zone, _division in zones if rng.random() < 0.05}
+    observed_names = {zone: [zone, *[a for a, c in aliases.items() if c == zone]] for zone, _division in zones}
+    write_tsv(os.path.join(repo, "data", "aliases.csv"), ["observed_name", "canonical_nom", "source_dataset"],
+              ([a, c, "insp_sitrep"] for a, c in aliases.items()), delimiter=",")
+
+    processed = os.path.join(repo, "data", "insp_sitrep", "processed")
+    os.makedirs(processed, exist_ok=True)
+    handles = {m: open(os.path.join(processed, f"insp_sitrep__{m}__daily.csv"), "w", newline="") for m in SITREP_METRICS}
+    try:
+        writers = {m: csv.writer(fh, lineterminator="\n") for m, fh in handles.items()}
+        for metric, writer in writers.items():
+            writer.writerow(["nom", "date", metric])
+        for zone, _division in zones:
+            active = rng.random(size=n_days) < 0.7
+            new_confirmed = rng.poisson(1.5, size=n_days) * active
+            new_suspected = rng.poisson(3, size=n_days) * active
+            cumulative_confirmed = np.cumsum(new_confirmed)
+            revisions = rng.random(size=n_days) < 0.02  # occasional downward revisions
+            cumulative_confirmed[revisions] = np.maximum(cumulative_confirmed[revisions] - rng.integers(1, 5), 0)
+            cumulative_suspected = np.cumsum(new_suspected)
+            suspected_ends = int(rng.integers(n_days // 2, n_days + 1))  # suspected series end early
+            nd = rng.random(size=(n_days, len(SITREP_METRICS))) < 0.02
+            names = observed_names[zone]
+            for d in range(n_days):
+                if not active[d]:
+                    continue
+                nom = names[int(rng.integers(0, len(names)))]
+                values = [new_confirmed[d], new_suspected[d], cumulative_confirmed[d], cumulative_suspected[d]]
+                for m, (metric, value) in enumerate(zip(SITREP_METRICS, values)):
+                    if "suspected" in metric and d >= suspected_ends:
+                        continue
+                    writers[metric].writerow([nom, days[d], "ND" if nd[d, m] else int(value)])
+    finally:
+        for fh in handles.values():
+            fh.close()
+
+    features = []
+    for zone, division in zones:
+        lat, lon = geo.coords["location"][zone]
+        parts = [regular_polygon(rng, lon, lat) for _ in range(1 if rng.random() < 0.9 else 2)]
+        geometry = {"type": "Polygon", "coordinates": parts[0]} if len(parts) == 1 \
+            else {"type": "MultiPolygon", "coordinates": parts}
+        features.append({"type": "Feature", "properties": {"nom": zone, "province": division}, "geometry": geometry})
+    os.makedirs(os.path.join(repo, "build"), exist_ok=True)
+    with open(os.path.join(repo, "build", "drc_health_zones.geojson"), "w") as fh:
+        json.dump({"type": "FeatureCollection", "features": features}, fh)
+
+
+def regular_polygon(rng, cx, cy, max_vertices=200):
+    """A closed, star-shaped (lon, lat) ring around (cx, cy), as [exterior]"""
+    n = int(rng.integers(8, max_vertices))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, size=n))
+    radii = rng.uniform(0.05, 0.3, size=n)
+    ring = np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)]).round(6).tolist()
+    return [ring + [ring[0]]]
+
+
+def generate(outdir, n_records, seed=0, genome_length=DEFAULT_GENOME_LENGTH, tree_tips=None, only=None):
+    components = only or COMPONENTS
+    geo = Geography(seed, n_records)
+    records = ppx_records(seed, n_records, geo) if set(components) - {"geo", "sitrep"} else []
+    for component in components:
+        print(f"Generating {component} ({n_records} records, seed {seed})", file=sys.stderr)
+        if component == "ppx":
+            write_ppx(seed, outdir, records, genome_length)
+        elif component == "entrez":
+            write_entrez(seed, outdir, records)
+        elif component == "inrb":
+            write_inrb(seed, outdir, records, geo)
+        elif component == "fauna":
+            write_fauna(seed, outdir, records)
+        elif component == "geo":
+            write_geo(seed, outdir, geo)
+        elif component == "tree":
+            write_tree(seed, outdir, records, tree_tips or n_records)
+        elif component == "sitrep":
+            write_sitrep(seed, outdir, geo, n_records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1000, help="Number of PPX records (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    parser.add_argument("--genome-length", type=int, default=DEFAULT_GENOME_LENGTH,
+                        help="Length of the synthetic genomes (default: %(default)s)")
+    parser.add_argument("--tree-tips", type=int, help="Number of tree tips (default: all records)")
+    parser.add_argument("--only", nargs="+", choices=COMPONENTS, help="Only generate these components")
+    parser.add_argument("--output-dir", required=True, help="Directory to write to")
+    args = parser.parse_args()
+
+    if args.tree_tips and args.tree_tips > args.records:
+        parser.error("--tree-tips can't be more than --records")
+    generate(args.output_dir, args.records, seed=args.seed, genome_length=args.genome_length,
+             tree_tips=args.tree_tips, only=args.only)
@@ -0,0 +1,439 @@
+#! /usr/bin/env python3
+
+"""
+Collects the Snakemake benchmark files (`benchmark:` directives) of workflow
+runs into a single history, and reports where a run spent its time and what got
+slower.
+
+    # after a run, from the workflow directory (e.g. ingest/ or phylogenetic/)
+    python ../benchmarks/workflow_report.py collect --history benchmark-history.tsv \\
+        --inputs data/*.tsv
+
+    # report on the latest run in the history
+    snakemake --rulegraph > rulegraph.dot
+    python ../benchmarks/workflow_report.py report --history benchmark-history.tsv \\
+        --rulegraph rulegraph.dot --output report.html
+
+`collect` appends a row per job to the history TSV (one row per job and run,
+tagged with the run id, commit, workflow and input sizes). Each benchmark file
+is attributed to its rule (and wildcards) by matching it against the
+`benchmark:` paths of the workflow's rules.
+
+`report` ranks the rules of a run by wall time and peak RSS and compares each
+job with its median over the previous runs (--window), flagging regressions
+beyond --threshold. With a --rulegraph (from `snakemake --rulegraph`) it also
+computes the critical path: the chain of dependent jobs with the greatest total
+wall time, i.e. the shortest the run could have taken with unlimited cores. Jobs
+are connected when their rules are, and they agree on the wildcards they share.
+The report is HTML if --output ends in .html, else Markdown.
+"""
+import argparse
+import csv
+import glob
+import html
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Columns of Snakemake's benchmark files (h:m:s is redundant with s)
+METRICS = ["s", "max_rss", "max_vms", "max_uss", "max_pss", "io_in", "io_out", "mean_load", "cpu_time"]
+HISTORY_COLUMNS = ["run_id", "timestamp", "commit", "workflow", "input_bytes", "inputs",
+                   "rule", "wildcards", "job", *METRICS]
+
+# Differences below these are noise, never regressions
+MIN_SECONDS_DELTA = 5
+MIN_RSS_DELTA = 50  # MB
+
+RULE = re.compile(r'^\s*(?:rule|checkpoint)\s+(\w+)\s*:', re.MULTILINE)
+BENCHMARK = re.compile(r'^\s*benchmark:\s*(?:\n\s*)?[rf]?"([^"]+)"', re.MULTILINE)
+WILDCARD = re.compile(r'\{(\w+)(?:,[^}]*)?\}')
+
+
+class ReportError(Exception):
+    pass
+
+
+def benchmark_templates(workflow_dir):
+    """
+    Returns [(rule, compiled regex of its benchmark path, number of literal
+    characters)] for the rules in the workflow's Snakefiles and .smk files.
+    """
+    templates = []
+    paths = glob.glob(os.path.join(workflow_dir, "**", "*.smk"), recursive=True) + \
+        glob.glob(os.path.join(workflow_dir, "**", "Snakefile*"), recursive=True)
+    for path in sorted(paths):
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+        rules = list(RULE.finditer(text))
+        for i, rule in enumerate(rules):
+            block = text[rule.end():rules[i + 1].start() if i + 1 < len(rules) else len(text)]
+            if match := BENCHMARK.search(block):
+                template = match.group(1)
+                pattern, literal, pos = "", 0, 0
+                for wildcard in WILDCARD.finditer(template):
+                    pattern += re.escape(template[pos:wildcard.start()])
+                    literal += wildcard.start() - pos
+                    # a repeated wildcard must match the same value
+                    name = wildcard.group(1)
+                    pattern += f"(?P={name})" if f"(?P<{name}>" in pattern else f"(?P<{name}>.+)"
+                    pos = wildcard.end()
+                pattern += re.escape(template[pos:])
+                literal += len(template) - pos
+                templates.append((rule.group(1), re.compile(pattern), literal))
+    return templates
+
+
+def attribute(path, templates):
+    """(rule, wildcards) of the benchmark file *path* (relative to the workflow directory)"""
+    matches = [(literal, rule, m.groupdict()) for rule, regex, literal in templates if (m := regex.fullmatch(path))]
+    if not matches:
+        # unknown rule (e.g. defined outside the workflow directory): fall back to the file name
+        return os.path.splitext(os.path.basename(path))[0], {}
+    # the most specific template wins
+    _literal, rule, wildcards = max(matches, key=lambda m: m[0])
+    return rule, wildcards
+
+
+def read_benchmark(path):
+    """The mean of each metric over the (repeated) runs in a Snakemake benchmark file"""
+    with open(path, newline="") as fh:
+        rows = list(csv.DictReader(fh, delimiter="\t"))
+    values = {}
+    for metric in METRICS:
+        numbers = []
+        for row in rows:
+            try:
+                numbers.append(float(row.get(metric, "")))
+            except (TypeError, ValueError):
+                continue  # e.g. "NA" or "-" where a measurement wasn't available
+        values[metric] = round(statistics.fmean(numbers), 4) if numbers else ""
+    return values
+
+
+def format_wildcards(wildcards):
+    return ";".join(f"{k}={v}" for k, v in sorted(wildcards.items()))
+
+
+def parse_wildcards(text):
+    return dict(item.split("=", 1) for item in text.split(";") if item)
+
+
+def git_commit(directory):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=directory, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def collect(workflow_dir, history, run_id=None, commit=None, workflow=None, inputs=()):
+    """Append a row per benchmark file of *workflow_dir* to the *history* TSV. Returns the number of rows."""
+    templates = benchmark_templates(workflow_dir)
+    timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    commit = commit if commit is not None else git_commit(workflow_dir)
+    run_id = run_id or f"{timestamp}-{commit or 'unknown'}"
+    input_sizes = {path: os.path.getsize(path) for path in inputs}
+    run = {
+        "run_id": run_id,
+        "timestamp": timestamp,
+        "commit": commit,
+        "workflow": workflow or os.path.basename(os.path.abspath(workflow_dir)),
+        "input_bytes": sum(input_sizes.values()),
+        "inputs": ";".join(f"{path}={size}" for path, size in input_sizes.items()),
+    }
+    if run_id in {row["run_id"] for row in read_history(history) if row["workflow"] == run["workflow"]}:
+        raise ReportError(f"Run {run_id!r} of {run['workflow']!r} is already in {history!r}")
+
+    rows = []
+    benchmarks_dir = os.path.join(workflow_dir, "benchmarks")
+    for path in sorted(glob.glob(os.path.join(benchmarks_dir, "**", "*.txt"), recursive=True)):
+        job = os.path.relpath(path, workflow_dir)
+        rule, wildcards = attribute(job, templates)
+        rows.append({**run, "rule": rule, "wildcards": format_wildcards(wildcards), "job": job,
+                     **read_benchmark(path)})
+    if not rows:
+        raise ReportError(f"No benchmark files found in {benchmarks_dir!r}")
+
+    new = not os.path.exists(history) or os.path.getsize(history) == 0
+    with open(history, "a", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=HISTORY_COLUMNS, delimiter="\t", lineterminator="\n")
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def read_history(history):
+    """The rows of the history TSV, with numeric metrics (None where missing)"""
+    if not os.path.exists(history):
+        return []
+    with open(history, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh, delimiter="\t"))
+    for row in rows:
+        for metric in METRICS:
+            row[metric] = float(row[metric]) if row[metric] not in ("", None) else None
+    return rows
+
+
+def read_rulegraph(path):
+    """Returns {rule: {upstream rules}} from `snakemake --rulegraph` (DOT) output"""
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    labels = {node: label.split("\\n")[0] for node, label in
+              re.findall(r'^\s*(\w+)\s*\[\s*label\s*=\s*"([^"]*)"', text, re.MULTILINE)}
+    upstream = defaultdict(set)
+    for source, target in re.findall(r'^\s*(\w+)\s*->\s*(\w+)', text, re.MULTILINE):
+        upstream[labels[target]].add(labels[source])
+    return upstream
+
+
+def compatible(a, b):
+    """Whether two jobs' wildcards agree wherever they share a wildcard"""
+    return all(b[key] == value for key, value in a.items() if key in b)
+
+
+def critical_path(jobs, upstream):
+    """
+    Returns (total seconds, [job rows]) of the longest (by wall time) chain of
+    dependent *jobs* given the rule graph *upstream*.
+    """
+    by_rule = defaultdict(list)
+    for job in jobs:
+        by_rule[job["rule"]].append(job)
+    wildcards = {id(job): parse_wildcards(job["wildcards"]) for job in jobs}
+
+    finish, previous = {}, {}
+
+    def visit(job, visiting=()):
+        # finish time of *job* if every job started as soon as its inputs were ready
+        key = id(job)
+        if key in finish:
+            return finish[key]
+        if key in visiting:
+            raise ReportError(f"The rule graph has a cycle through {job['rule']!r}")
+        start, before = 0.0, None
+        for rule in upstream.get(job["rule"], ()):
+            for dependency in by_rule.get(rule, ()):
+                if compatible(wildcards[key], wildcards[id(dependency)]):
+                    if (end := visit(dependency, (*visiting, key))) > start:
+                        start, before = end, dependency
+        finish[key], previous[key] = start + (job["s"] or 0), before
+        return finish[key]
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * len(jobs) + 100))
+    if not jobs:
+        return 0.0, []
+    last = max(jobs, key=visit)
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[id(last)]
+    return finish[id(path[0])], path[::-1]
+
+
+def regressions(jobs, previous_runs, window, threshold):
+    """
+    Compare each job with its median over the last *window* previous runs. Returns
+    [(job, metric, median, value, ratio)] for those beyond *threshold*.
+    """
+    history = defaultdict(list)
+    for run in previous_runs[-window:]:
+        for row in run:
+            history[(row["rule"], row["wildcards"])].append(row)
+    flagged = []
+    for job in jobs:
+        before = history.get((job["rule"], job["wildcards"]), [])
+        for metric, floor in [("s", MIN_SECONDS_DELTA), ("max_rss", MIN_RSS_DELTA)]:
+            values = [row[metric] for row in before if row[metric] is not None]
+            if not values or job[metric] is None:
+                continue
+            median = statistics.median(values)
+            ratio = job[metric] / median if median else float("inf")
+            if ratio > 1 + threshold and job[metric] - median > floor:
+                flagged.append((job, metric, median, job[metric], ratio))
+    return flagged
+
+
+def format_seconds(s):
+    if s is None:
+        return "-"
+    if s < 60:
+        return f"{s:.1f}s"
+    if s < 3600:
+        minutes, seconds = divmod(round(s), 60)
+        return f"{minutes}m{seconds:02d}s"
+    return f"{s / 3600:.2f}h"
+
+
+def format_mb(mb):
+    return "-" if mb is None else f"{mb:.0f} MB" if mb < 1024 else f"{mb / 1024:.2f} GB"
+
+
+def job_label(job):
+    return f"{job['rule']} ({job['wildcards'].replace(';', ', ')})" if job["wildcards"] else job["rule"]
+
+
+def rule_summary(jobs):
+    """Per-rule [rule, jobs, total s, max s, max RSS], by total wall time"""
+    rules = defaultdict(list)
+    for job in jobs:
+        rules[job["rule"]].append(job)
+    summary = []
+    for rule, rule_jobs in rules.items():
+        seconds = [j["s"] or 0 for j in rule_jobs]
+        rss = [j["max_rss"] for j in rule_jobs if j["max_rss"] is not None]
+        summary.append((rule, len(rule_jobs), sum(seconds), max(seconds), max(rss) if rss else None))
+    return sorted(summary, key=lambda r: -r[2])
+
+
+def build_report(rows, run_id=None, workflow=None, upstream=None, window=5, threshold=0.2, top=20):
+    """Returns the report as (title, [(heading, text, header, rows)]) sections"""
+    if workflow:
+        rows = [row for row in rows if row["workflow"] == workflow]
+    runs = list(dict.fromkeys(row["run_id"] for row in rows))  # in history (i.e. collection) order
+    if not runs:
+        raise ReportError("No runs in the history" + (f" for workflow {workflow!r}" if workflow else ""))
+    run_id = run_id or runs[-1]
+    if run_id not in runs:
+        raise ReportError(f"Run {run_id!r} isn't in the history")
+    jobs = [row for row in rows if row["run_id"] == run_id]
+    previous_runs = [[row for row in rows if row["run_id"] == r] for r in runs[:runs.index(run_id)]]
+
+    first = jobs[0]
+    total = sum(j["s"] or 0 for j in jobs)
+    cpu = sum(j["cpu_time"] or 0 for j in jobs)
+    rss = [j["max_rss"] for j in jobs if j["max_rss"] is not None]
+    summary = [
+        ["Workflow", first["workflow"]],
+        ["Commit", first["commit"] or "-"],
+        ["Collected", first["timestamp"]],
+        ["Input size", format_mb(int(first["input_bytes"] or 0) / 1e6)],
+        ["Jobs", str(len(jobs))],
+        ["Total wall time (sum over jobs)", format_seconds(total)],
+        ["Total CPU time", format_seconds(cpu)],
+        ["Largest job RSS", format_mb(max(rss) if rss else None)],
+    ]
+    sections = []
+    path = []
+    if upstream is not None:
+        length, path = critical_path(jobs, upstream)
+        summary.append(["Critical path", f"{format_seconds(length)} ({len(path)} jobs)"])
+    sections.append(("Summary", "", ["", ""], summary))
+
+    by_rule = rule_summary(jobs)
+    sections.append((f"Rules by wall time (top {top})", "", ["Rule", "Jobs", "Total", "Max", "Share"],
+                     [[rule, str(n), format_seconds(s), format_seconds(longest), f"{100 * s / total:.1f}%" if total else "-"]
+                      for rule, n, s, longest, _rss in by_rule[:top]]))
+    sections.append((f"Jobs by peak RSS (top {top})", "", ["Job", "Max RSS", "Wall time"],
+                     [[job_label(j), format_mb(j["max_rss"]), format_seconds(j["s"])]
+                      for j in sorted(jobs, key=lambda j: -(j["max_rss"] or 0))[:top]]))
+    if path:
+        elapsed, rows_ = 0.0, []
+        for job in path:
+            elapsed += job["s"] or 0
+            rows_.append([job_label(job), format_seconds(job["s"]), format_seconds(elapsed)])
+        sections.append(("Critical path", "The dependent jobs which determine the minimum run time.",
+                         ["Job", "Wall time", "Cumulative"], rows_))
+
+    if previous_runs:
+        flagged = regressions(jobs, previous_runs, window, threshold)
+        text = (f"Jobs more than {threshold:.0%} slower (or larger) than their median over the previous "
+                f"{min(window, len(previous_runs))} run(s).")
+        sections.append(("Regressions", text if flagged else text + " None found.", ["Job", "Metric", "Previous", "This run", "Change"],
+                         [[job_label(job), "wall time" if metric == "s" else "max RSS",
+                           (format_seconds if metric == "s" else format_mb)(median),
+                           (format_seconds if metric == "s" else format_mb)(value), f"{ratio:.2f}x"]
+                          for job, metric, median, value, ratio in sorted(flagged, key=lambda f: -f[4])]))
+        trend = []
+        for run_rows in [*previous_runs[-window:], jobs]:
+            trend.append([run_rows[0]["run_id"], run_rows[0]["commit"] or "-", str(len(run_rows)),
+                          format_seconds(sum(r["s"] or 0 for r in run_rows)),
+                          format_mb(int(run_rows[0]["input_bytes"] or 0) / 1e6)])
+        sections.append(("Recent runs", "", ["Run", "Commit", "Jobs", "Total wall time", "Input size"], trend))
+
+    return f"Workflow benchmark report: {run_id}", sections
+
+
+def render_markdown(title, sections):
+    lines = [f"# {title}", ""]
+    for heading, text, header, rows in sections:
+        lines += [f"## {heading}", ""]
+        if text:
+            lines += [text, ""]
+        if rows:
+            lines.append("| " + " | ".join(header) + " |")
+            lines.append("|" + "|".join("---" for _ in header) + "|")
+            lines += ["| " + " | ".join(cell.replace("|", "\\|") for cell in row) + " |" for row in rows]
+            lines.append("")
+    return "\n".join(lines)
+
+
+def render_html(title, sections):
+    e = html.escape
+    parts = [f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{e(title)}</title>",
+             "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+             "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}th{background:#eee}</style>",
+             f"</head><body><h1>{e(title)}</h1>"]
+    for heading, text, header, rows in sections:
+        parts.append(f"<h2>{e(heading)}</h2>")
+        if text:
+            parts.append(f"<p>{e(text)}</p>")
+        if rows:
+            parts.append("<table><tr>" + "".join(f"<th>{e(h)}</th>" for h in header) + "</tr>")
+            parts += ["<tr>" + "".join(f"<td>{e(cell)}</td>" for cell in row) + "</tr>" for row in rows]
+            parts.append("</table>")
+    parts.append("</body></html>\n")
+    return "\n".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    collect_parser = subparsers.add_parser("collect", help="Add a run's benchmark files to the history")
+    collect_parser.add_argument("--workflow-dir", default=".", help="Workflow directory (default: %(default)s)")
+    collect_parser.add_argument("--history", required=True, help="History TSV (created if it doesn't exist)")
+    collect_parser.add_argument("--run-id", help="Run identifier (default: the time and commit)")
+    collect_parser.add_argument("--commit", help="Commit of the run (default: the workflow directory's git HEAD)")
+    collect_parser.add_argument("--workflow", help="Workflow name (default: the name of the workflow directory)")
+    collect_parser.add_argument("--inputs", nargs="+", default=[], help="Input files whose sizes to record")
+
+    report_parser = subparsers.add_parser("report", help="Report on a run in the history")
+    report_parser.add_argument("--history", required=True, help="History TSV")
+    report_parser.add_argument("--run-id", help="Run to report on (default: the latest)")
+    report_parser.add_argument("--workflow", help="Only consider runs of this workflow")
+    report_parser.add_argument("--rulegraph", help="Output of `snakemake --rulegraph`, for the critical path")
+    report_parser.add_argument("--window", type=int, default=5,
+                               help="Number of previous runs to compare against (default: %(default)s)")
+    report_parser.add_argument("--threshold", type=float, default=0.2,
+                               help="Flag jobs which are more than this fraction slower / larger (default: %(default)s)")
+    report_parser.add_argument("--top", type=int, default=20, help="Rows in the ranking tables (default: %(default)s)")
+    report_parser.add_argument("--output", help="Report file (.html or .md; default: Markdown to stdout)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "collect":
+            n = collect(args.workflow_dir, args.history, run_id=args.run_id, commit=args.commit,
+                        workflow=args.workflow, inputs=args.inputs)
+            print(f"Added {n} jobs to {args.history!r}")
+        else:
+            upstream = read_rulegraph(args.rulegraph) if args.rulegraph else None
+            title, sections = build_report(read_history(args.history), run_id=args.run_id, workflow=args.workflow,
+                                           upstream=upstream, window=args.window, threshold=args.threshold,
+                                           top=args.top)
+            if args.output and args.output.endswith(".html"):
+                report = render_html(title, sections)
+            else:
+                report = render_markdown(title, sections)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as fh:
+                    fh.write(report)
+            else:
+                print(report)
+    except ReportError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
@@ -5,8 +5,11 @@ Files to upload must be defined in the `files_to_upload` config param, where
 the keys are the remote files and the values are the local filepaths
 relative to the ingest directory.
 
-Produces a single file for each uploaded file:
-    "results/upload/{remote_file}.upload"
+All files are uploaded by a single job (see shared/scripts/s3_upload.py),
+which skips those whose content is unchanged, uploads the rest concurrently and
+makes a single CloudFront invalidation of them. It produces a report of each
+file's outcome:
+    "results/upload/report.json"
 
 The rule `upload_all` can be used as a target to upload all files.
 """
@@ -20,35 +23,39 @@ send_notifications = (
 
 rule upload_to_s3:
     input:
-        file_to_upload=lambda wildcards: config["files_to_upload"][wildcards.remote_file],
+        files_to_upload=list(config["files_to_upload"].values()),
     output:
-        touch("results/upload/{remote_file}.upload"),
+        report="results/upload/report.json",
     params:
+        files=[f"{local}={remote}" for remote, local in config["files_to_upload"].items()],
         quiet="" if send_notifications else "--quiet",
         s3_dst=config["s3_dst"],
         cloudfront_domain=config["cloudfront_domain"],
-        current_basedir = str(workflow.current_basedir),
+        # Not an output, so that it's kept between runs
+        manifest="results/upload/manifest.json",
+        script=os.path.join(str(workflow.current_basedir), "..", "..", "..", "shared", "scripts", "s3_upload.py"),
+    threads: 4
     benchmark:
-        "benchmarks/upload_to_s3/{remote_file}.txt"
+        "benchmarks/upload_to_s3.txt"
     log:
-        "logs/upload_to_s3/{remote_file}.txt"
+        "logs/upload_to_s3.txt"
     shell:
         r"""
         exec &> >(tee {log:q})
 
-        {params.current_basedir}/../../../shared/vendored/scripts/upload-to-s3 \
-            {params.quiet:q} \
-            {input.file_to_upload:q} \
-            {params.s3_dst:q}/{wildcards.remote_file:q} \
-            {params.cloudfront_domain:q}
+        python {params.script:q} \
+            {params.quiet} \
+            --s3-dst {params.s3_dst:q} \
+            --cloudfront-domain {params.cloudfront_domain:q} \
+            --manifest {params.manifest:q} \
+            --jobs {threads} \
+            --report {output.report:q} \
+            {params.files:q}
         """
 
 
 rule upload_all:
     input:
-        uploads=[
-            f"results/upload/{remote_file}.upload"
-            for remote_file in config["files_to_upload"].keys()
-        ],
+        report="results/upload/report.json",
     output:
         touch("results/upload_all.done")
@@ -301,62 +301,60 @@ rule subset_metadata:
             {input.metadata:q} > {output.subset_metadata:q}
         """
 
-rule subset_to_open_data:
+rule partition_by_data_use:
+    """
+    Split the curated data into open and RESTRICTED subsets, in a single pass
+    over the metadata and sequences
+    """
     input:
         metadata = "data/{species}/metadata.tsv",
         sequences = "data/{species}/sequences.fasta",
     output:
-        metadata = "results/{species}/metadata_open.tsv",
-        sequences = "results/{species}/sequences_open.fasta",
+        metadata_open = "results/{species}/metadata_open.tsv",
+        sequences_open = "results/{species}/sequences_open.fasta",
+        metadata_restricted = "results/{species}/metadata_restricted.tsv",
+        sequences_restricted = "results/{species}/sequences_restricted.fasta",
     benchmark:
-        "benchmarks/{species}/subset_to_open_data.txt"
+        "benchmarks/{species}/partition_by_data_use.txt"
     log:
-        "logs/{species}/subset_to_open_data.txt"
+        "logs/{species}/partition_by_data_use.txt"
     shell:
         r"""
         exec &> >(tee {log:q})
 
-        augur filter \
+        # Species with no RESTRICTED records get header-only restricted metadata
+        # and an empty restricted FASTA, so downstream rules see valid files.
+        scripts/partition_by_data_use.py \
             --metadata {input.metadata:q} \
             --sequences {input.sequences:q} \
-            --metadata-id-columns accession \
-            --exclude-where "dataUseTerms=RESTRICTED" \
-            --output-metadata {output.metadata:q} \
-            --output-sequences {output.sequences:q}
+            --id-column accession \
+            --data-use-column dataUseTerms \
+            --output-metadata-open {output.metadata_open:q} \
+            --output-sequences-open {output.sequences_open:q} \
+            --output-metadata-restricted {output.metadata_restricted:q} \
+            --output-sequences-restricted {output.sequences_restricted:q}
         """
 
 
-rule subset_to_restricted_data:
+rule sequence_stats:
+    """
+    Per-accession sequence statistics (length, ACGT / N / ambiguous / gap counts
+    and a content hash) published alongside the open sequences
+    """
     input:
-        metadata = "data/{species}/metadata.tsv",
-        sequences = "data/{species}/sequences.fasta",
+        sequences = "results/{species}/sequences_open.fasta",
     output:
-        metadata = "results/{species}/metadata_restricted.tsv",
-        sequences = "results/{species}/sequences_restricted.fasta",
+        stats = "results/{species}/sequence_stats_open.tsv",
     benchmark:
-        "benchmarks/{species}/subset_to_restricted_data.txt"
+        "benchmarks/{species}/sequence_stats.txt"
     log:
-        "logs/{species}/subset_to_restricted_data.txt"
+        "logs/{species}/sequence_stats.txt"
     shell:
         r"""
         exec &> >(tee {log:q})
 
-        # Some species have no RESTRICTED records at all, in which case augur
-        # filter would error ("All samples have been dropped!"). Check for the
-        # presence of any RESTRICTED record first, and only run augur filter
-        # when there's something to extract; otherwise write header-only
-        # metadata and an empty FASTA so downstream rules see valid files.
-        if csvtk cut -t -f dataUseTerms {input.metadata:q} | grep -qw RESTRICTED; then
-            augur filter \
-                --metadata {input.metadata:q} \
-                --sequences {input.sequences:q} \
-                --metadata-id-columns accession \
-                --exclude-where "dataUseTerms!=RESTRICTED" \
-                --output-metadata {output.metadata:q} \
-                --output-sequences {output.sequences:q}
-        else
-            echo "No RESTRICTED records found; writing empty outputs."
-            head -n 1 {input.metadata:q} > {output.metadata:q}
-            : > {output.sequences:q}
-        fi
+        python3 {workflow.basedir}/../shared/scripts/sequence_stats.py \
+            --sequences {input.sequences:q} \
+            --id-column accession \
+            --output {output.stats:q}
         """
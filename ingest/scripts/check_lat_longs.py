@@ -35,6 +35,10 @@ import sys
 from collections import defaultdict
 from importlib.resources import files
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
 # Metadata columns to check, in report order, each keyed to its lat-longs resolution.
 GEOGRAPHIC_FIELDS = ["region", "country", "division", "location"]
 
@@ -68,7 +72,7 @@ def augur_default_lat_longs():
 
 def read_metadata(path, id_column):
     """Return (rows, fieldnames) for a metadata TSV read as dicts."""
-    with open(path, encoding="utf-8", newline="") as fh:
+    with open_file(path, newline="") as fh:
         reader = csv.DictReader(fh, delimiter="\t")
         fieldnames = reader.fieldnames or []
         if id_column not in fieldnames:
@@ -113,38 +117,44 @@ def main():
     )
     parser.add_argument("--output", help="Report path (default: stdout)")
     args = parser.parse_args()
+    instrument.start()
 
     # A value counts as covered if it's in the provided file or augur's default,
     # since augur consults the default as a fallback at build time.
-    known = read_lat_long_places(args.lat_longs)
-    for resolution, places in read_lat_long_places(augur_default_lat_longs()).items():
-        known[resolution] |= places
+    with instrument.phase("read"):
+        known = read_lat_long_places(args.lat_longs)
+        for resolution, places in read_lat_long_places(augur_default_lat_longs()).items():
+            known[resolution] |= places
 
-    rows, fieldnames = read_metadata(args.metadata, args.id_column)
+        rows, fieldnames = read_metadata(args.metadata, args.id_column)
+    instrument.count("records_in", len(rows))
 
     lines = []
     n_values = 0
-    for field in GEOGRAPHIC_FIELDS:
-        if field not in fieldnames:
-            print(f"Skipping {field!r}: not a column in {args.metadata}", file=sys.stderr)
-            continue
-        uncovered = find_uncovered(rows, field, known.get(field, set()))
-        n_values += len(uncovered)
-        # Most-common values first, then alphabetically, so the report is stable.
-        for value, matched in sorted(uncovered.items(), key=lambda kv: (-len(kv[1]), kv[0])):
-            accessions = [row.get(args.id_column, "") for row in matched]
-            lines.append(
-                f"{field.capitalize()} {value} (n={len(accessions)}) "
-                f"not found in lat-longs (found in accessions {', '.join(accessions)})"
-            )
-            for tup, count in context_tuples(matched):
-                lines.append(f"    (country, division, location) = ({', '.join(tup)})   n={count}")
+    with instrument.phase("check"):
+        for field in GEOGRAPHIC_FIELDS:
+            if field not in fieldnames:
+                print(f"Skipping {field!r}: not a column in {args.metadata}", file=sys.stderr)
+                continue
+            uncovered = find_uncovered(rows, field, known.get(field, set()))
+            n_values += len(uncovered)
+            # Most-common values first, then alphabetically, so the report is stable.
+            for value, matched in sorted(uncovered.items(), key=lambda kv: (-len(kv[1]), kv[0])):
+                accessions = [row.get(args.id_column, "") for row in matched]
+                lines.append(
+                    f"{field.capitalize()} {value} (n={len(accessions)}) "
+                    f"not found in lat-longs (found in accessions {', '.join(accessions)})"
+                )
+                for tup, count in context_tuples(matched):
+                    lines.append(f"    (country, division, location) = ({', '.join(tup)})   n={count}")
 
     # write output to args.output AND stdout
-    if args.output:
-        with open(args.output, "w", encoding="utf-8") as fh:
-            fh.write("\n".join(lines) + "\n")
-    print("\n".join(lines) + "\n")
+    with instrument.phase("write"):
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+        print("\n".join(lines) + "\n")
+    instrument.count("uncovered_values", n_values)
 
     print(
         f"{n_values} geographic value(s) not found in {args.lat_longs}",
@@ -8,8 +8,11 @@ unversioned) accession as the matching ID.
 
 import argparse
 from collections import defaultdict
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
 from cross_reference_inrb import parse_tsv, write_tsv
 
+import instrument
+
 def spike_in_fauna(metadata, fauna, insdc_id):
     """
     Modifies `metadata` in place
@@ -72,12 +75,18 @@ if __name__ == "__main__":
     parser.add_argument("--output", help="Updated metadata")
 
     args = parser.parse_args()
+    instrument.start()
 
-    metadata = parse_tsv(args.metadata, id='accession')
-    fauna = parse_tsv(args.fauna_metadata, id='accession')
+    with instrument.phase("read"):
+        metadata = parse_tsv(args.metadata, id='accession')
+        fauna = parse_tsv(args.fauna_metadata, id='accession')
+    instrument.count("records_in", len(metadata))
 
-    spike_in_fauna(metadata, fauna, insdc_id='insdcAccessionBase')
+    with instrument.phase("join"):
+        spike_in_fauna(metadata, fauna, insdc_id='insdcAccessionBase')
 
     log_missing_fauna_samples(metadata, fauna, insdc_id='insdcAccessionBase')
 
-    write_tsv(metadata, args.output)
+    with instrument.phase("write"):
+        write_tsv(metadata, args.output)
+    instrument.count("records_out", len(metadata))
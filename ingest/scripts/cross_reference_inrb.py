@@ -11,9 +11,13 @@ import csv
 import re
 from collections import defaultdict
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
 def parse_tsv(tsv_filename, id):
     result = {}
-    with open(tsv_filename, 'r', newline='', encoding='utf-8') as file:
+    with open_file(tsv_filename, newline='') as file:
         reader = csv.DictReader(file, delimiter='\t')
         for row in reader:
             if id not in row:
@@ -29,7 +33,7 @@ def write_tsv(data, fname):
             if key not in header:
                 header.append(key)
 
-    with open(fname, 'w', newline='', encoding='utf-8') as file:
+    with open_file(fname, 'w', newline='') as file:
         writer = csv.DictWriter(file, fieldnames=header, delimiter='\t')
         writer.writeheader()
         for row in data.values():
@@ -120,13 +124,19 @@ if __name__ == "__main__":
     parser.add_argument("--output", help="Updated metadata")
 
     args = parser.parse_args()
+    instrument.start()
 
-    metadata = parse_tsv(args.metadata, id='accession')
-    nord_kivu = parse_tsv(args.nord_kivu_metadata, id='strain')
+    with instrument.phase("read"):
+        metadata = parse_tsv(args.metadata, id='accession')
+        nord_kivu = parse_tsv(args.nord_kivu_metadata, id='strain')
+    instrument.count("records_in", len(metadata))
 
-    inrb_name_map = ppx_to_inrb_names(metadata)
-    spike_in_inrb_data(metadata, nord_kivu, inrb_name_map)
+    with instrument.phase("join"):
+        inrb_name_map = ppx_to_inrb_names(metadata)
+        spike_in_inrb_data(metadata, nord_kivu, inrb_name_map)
 
     log_missing_inrb_samples(nord_kivu, inrb_name_map)
 
-    write_tsv(metadata, args.output)
+    with instrument.phase("write"):
+        write_tsv(metadata, args.output)
+    instrument.count("records_out", len(metadata))
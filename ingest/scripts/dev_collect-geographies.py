@@ -35,6 +35,9 @@ import csv
 import json
 import sys
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+
 DEFAULT_REPO = "/Users/naboo/github/INRB-UMIE/Ebola_DRC_2026"
 GEOJSON_SUBPATH = "build/drc_health_zones.geojson"
 ALIASES_SUBPATH = "data/aliases.csv"
@@ -157,10 +160,11 @@ if __name__ == "__main__":
         f"{ALIASES_SUBPATH} (resolution, alias name, canonical name)",
     )
     args = parser.parse_args()
+    instrument.start()
 
     path = f"{args.repo}/{GEOJSON_SUBPATH}"
     try:
-        with open(path, encoding="utf-8") as fh:
+        with instrument.phase("read"), open(path, encoding="utf-8") as fh:
             fc = json.load(fh)
     except FileNotFoundError:
         sys.exit(
@@ -168,24 +172,26 @@ if __name__ == "__main__":
             "Is --repo pointing at a clone of INRB-UMIE/Ebola_DRC_2026 with a built "
             f"{GEOJSON_SUBPATH}?"
         )
+    instrument.count("records_in", len(fc["features"]))
 
     rows = []
     province_moments = {}  # province -> [total, wx, wy] accumulated across its zones
-    for feat in fc["features"]:
-        props = feat["properties"]
-        province = props.get("province", "")
-        lon, lat = centroid(feat["geometry"])
-        rows.append(
-            {
-                "nom": props.get("nom", ""),
-                "province": province,
-                "lat": f"{lat:.6f}",
-                "lon": f"{lon:.6f}",
-            }
-        )
-        # A province is the union of its zones, so its centroid is the
-        # area-weighted centroid across every ring of every zone within it.
-        accumulate(feat["geometry"], province_moments.setdefault(province, [0.0, 0.0, 0.0]))
+    with instrument.phase("centroids"):
+        for feat in fc["features"]:
+            props = feat["properties"]
+            province = props.get("province", "")
+            lon, lat = centroid(feat["geometry"])
+            rows.append(
+                {
+                    "nom": props.get("nom", ""),
+                    "province": province,
+                    "lat": f"{lat:.6f}",
+                    "lon": f"{lon:.6f}",
+                }
+            )
+            # A province is the union of its zones, so its centroid is the
+            # area-weighted centroid across every ring of every zone within it.
+            accumulate(feat["geometry"], province_moments.setdefault(province, [0.0, 0.0, 0.0]))
 
     # Group by province (header row per group), zones sorted within each.
     rows.sort(key=lambda r: (r["province"], r["nom"]))
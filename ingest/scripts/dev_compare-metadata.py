@@ -28,6 +28,10 @@ import csv
 import sys
 from pathlib import Path
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
 METADATA_SUBPATH = "{species}/metadata.tsv"
 ID_FIELD = "accession"
 EMPTY = "<empty>"
@@ -35,7 +39,7 @@ EMPTY = "<empty>"
 
 def read_metadata(path):
     """Return (rows_by_accession, fieldnames) for one metadata.tsv."""
-    with open(path, encoding="utf-8", newline="") as fh:
+    with open_file(path, newline="") as fh:
         reader = csv.DictReader(fh, delimiter="\t")
         fieldnames = reader.fieldnames or []
         rows = {}
@@ -128,6 +132,7 @@ if __name__ == "__main__":
         help="Field(s) to skip when diffing (e.g. volatile __url columns)",
     )
     args = parser.parse_args()
+    instrument.start()
 
     for d in (args.old_dir, args.new_dir):
         if not d.is_dir():
@@ -149,7 +154,8 @@ if __name__ == "__main__":
 
     any_changes = False
     for species in species_list:
-        lines = compare_species(args.old_dir, args.new_dir, species, set(args.ignore_fields))
+        with instrument.phase(species):
+            lines = compare_species(args.old_dir, args.new_dir, species, set(args.ignore_fields))
         if lines:
             any_changes = True
             print(f"species={species}")
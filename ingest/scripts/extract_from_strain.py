@@ -7,12 +7,21 @@ import json
 import re
 from sys import stdin, stderr
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+
 
 def main():
-    for line in stdin:
-        record = json.loads(line)
-        record = extract_info(record)
-        print(json.dumps(record))
+    instrument.start()
+    n = 0
+    with instrument.phase("extract"):
+        for line in stdin:
+            record = json.loads(line)
+            record = extract_info(record)
+            print(json.dumps(record))
+            n += 1
+    instrument.count("records_in", n)
+    instrument.count("records_out", n)
 
 
 patterns = (
@@ -11,6 +11,9 @@ import argparse
 import pandas as pd
 from collections import defaultdict
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+
 # Set of NCBI titles via `jq -r '.title' data/ncbi_entrez.ndjson | sort -u`
 LAB_TITLES = set([
     'A replication inhibitor of Filoviridae virus',
@@ -128,11 +131,15 @@ if __name__ == "__main__":
     parser.add_argument("--metadata", required=True, help="Input metadata TSV file")
     parser.add_argument("--output", required=True, help="Output metadata TSV file")
     args = parser.parse_args()
+    instrument.start()
 
-    metadata = pd.read_csv(args.metadata, sep='\t')
+    with instrument.phase("read"):
+        metadata = pd.read_csv(args.metadata, sep='\t')
+    instrument.count("records_in", len(metadata))
 
     n = 0
-    metadata['is_lab_host'] = metadata.apply(is_lab_host, axis=1)
+    with instrument.phase("label"):
+        metadata['is_lab_host'] = metadata.apply(is_lab_host, axis=1)
     for reason in excluded.keys():
         for value,rows in excluded[reason].items():
             print(f"{len(rows)} strains set as 'is_lab_host=True' due to \"{reason}\"=\"{value}\"")
@@ -141,7 +148,9 @@ if __name__ == "__main__":
                 n+=1
     print('-'*80 + f"\nMarked {n} strains as lab host due to metadata matches\n" + '-'*80)
 
-    metadata.to_csv(args.output, sep='\t', index=False)
+    with instrument.phase("write"):
+        metadata.to_csv(args.output, sep='\t', index=False)
+    instrument.count("records_out", len(metadata))
 
 
 
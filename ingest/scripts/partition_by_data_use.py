@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+
+"""
+Splits the curated metadata & sequences into open and restricted subsets by their
+`dataUseTerms`, reading each input once and writing all four outputs together.
+
+This is equivalent to running `augur filter` twice (with
+`--exclude-where "dataUseTerms=RESTRICTED"` and `"dataUseTerms!=RESTRICTED"`):
+records are only kept if they have both metadata and a sequence, the comparison
+is case-insensitive, and metadata / sequences are written in input order.
+Sequences are copied through unchanged (not rewrapped). An empty partition
+(e.g. a species with no RESTRICTED records) results in header-only metadata and
+an empty FASTA rather than an error.
+"""
+
+import argparse
+import csv
+import sys
+
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
+PARTITIONS = ("open", "restricted")
+
+
+def read_metadata(fname, id_column, data_use_column):
+    """
+    Returns the header and a dict of id -> (partition, row) of the metadata TSV,
+    in file order.
+    """
+    records = {}
+    with open_file(fname, newline='') as fh:
+        reader = csv.reader(fh, delimiter='\t')
+        header = next(reader, [])
+        for column in (id_column, data_use_column):
+            if column not in header:
+                raise Exception(f"Metadata parsing error. Column {column!r} not found in {fname!r}")
+        id_idx, terms_idx = header.index(id_column), header.index(data_use_column)
+        for row in reader:
+            if not row:
+                continue
+            if row[id_idx] in records:
+                raise Exception(f"Duplicate id {row[id_idx]!r} in {fname!r}")
+            partition = "restricted" if row[terms_idx].lower() == "restricted" else "open"
+            records[row[id_idx]] = (partition, row)
+    return header, records
+
+
+def partition_sequences(fname, records, outputs):
+    """
+    Copy each record of the FASTA *fname* to the file of its metadata's
+    partition (dropping those without metadata). Returns the set of ids written.
+    """
+    written = set()
+    handles = {partition: open_file(outputs[partition], 'wb') for partition in PARTITIONS}
+    try:
+        out = None
+        with open_file(fname, 'rb') as fh:
+            for line in fh:
+                if line.startswith(b'>'):
+                    parts = line[1:].split(maxsplit=1)
+                    name = parts[0].decode() if parts else ''
+                    if name in written:
+                        raise Exception(f"Duplicate sequence id {name!r} in {fname!r}")
+                    out = handles[records[name][0]] if name in records else None
+                    if out:
+                        written.add(name)
+                if out:
+                    out.write(line)
+    finally:
+        for fh in handles.values():
+            fh.close()
+    return written
+
+
+def write_metadata(header, records, keep, outputs):
+    """Write the rows of *records* whose ids are in *keep* to their partition's TSV"""
+    counts = dict.fromkeys(PARTITIONS, 0)
+    handles = {partition: open_file(outputs[partition], 'w', newline='') for partition in PARTITIONS}
+    try:
+        writers = {partition: csv.writer(fh, delimiter='\t', lineterminator='\n') for partition, fh in handles.items()}
+        for writer in writers.values():
+            writer.writerow(header)
+        for name, (partition, row) in records.items():
+            if name in keep:
+                writers[partition].writerow(row)
+                counts[partition] += 1
+    finally:
+        for fh in handles.values():
+            fh.close()
+    return counts
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--metadata', required=True, help="Metadata TSV")
+    parser.add_argument('--sequences', required=True, help="FASTA of sequences")
+    parser.add_argument('--id-column', default='accession', help="Metadata ID column (matching the FASTA names)")
+    parser.add_argument('--data-use-column', default='dataUseTerms', help="Metadata column with the data use terms")
+    parser.add_argument('--output-metadata-open', required=True)
+    parser.add_argument('--output-sequences-open', required=True)
+    parser.add_argument('--output-metadata-restricted', required=True)
+    parser.add_argument('--output-sequences-restricted', required=True)
+    args = parser.parse_args()
+    instrument.start()
+
+    with instrument.phase("read_metadata"):
+        header, records = read_metadata(args.metadata, args.id_column, args.data_use_column)
+    instrument.count("records_in", len(records))
+    with instrument.phase("partition_sequences"):
+        written = partition_sequences(args.sequences, records, {
+            "open": args.output_sequences_open,
+            "restricted": args.output_sequences_restricted,
+        })
+    with instrument.phase("write_metadata"):
+        counts = write_metadata(header, records, written, {
+            "open": args.output_metadata_open,
+            "restricted": args.output_metadata_restricted,
+        })
+    instrument.count("records_out", sum(counts.values()))
+
+    if n_no_sequence := len(records) - len(written):
+        print(f"Dropped {n_no_sequence} metadata records without a sequence", file=sys.stderr)
+    for partition in PARTITIONS:
+        print(f"Wrote {counts[partition]} {partition} records")
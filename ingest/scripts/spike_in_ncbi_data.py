@@ -16,6 +16,9 @@ Goal: merge the two inputs, joining on 'ppx.insdcAccessionBase' and
 import argparse
 import pandas as pd
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+
 def update_strain(row):
     """
     Apply strain preference hierarchy for rows that have a match.
@@ -41,20 +44,14 @@ def update_host(row):
     return ''
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("--metadata-ppx", required=True, help="PPX metadata TSV file")
-    parser.add_argument("--metadata-ncbi-entrez", required=True, help="NCBI Entrez metadata TSV file")
-    parser.add_argument("--output", required=True, help="Output merged metadata TSV file")
-    parser.add_argument("--add-fields", required=False, nargs="+", help="Columns in the NCBI table to add to the output")
-
-    args = parser.parse_args()
-
-    ppx = pd.read_csv(args.metadata_ppx, sep='\t')
-    ncbi = pd.read_csv(args.metadata_ncbi_entrez, sep='\t')
-
+def spike_in_ncbi_data(ppx, ncbi, add_fields=None):
+    """
+    Returns the *ppx* metadata (DataFrame) left-joined with the *ncbi* Entrez
+    metadata, with strain & host updated and only the NCBI columns in
+    *add_fields* kept.
+    """
     # rename NCBI columns so we can track attribution
-    ncbi.columns = ncbi.columns + '_ncbi'
+    ncbi = ncbi.add_suffix('_ncbi')
 
     # Keep all ppx rows, including those with empty insdcAccessionBase
     merged = ppx.merge(ncbi, left_on='insdcAccessionBase', right_on='accession_ncbi', how='left', suffixes=('', ''))
@@ -65,10 +62,29 @@ if __name__ == "__main__":
     # Apply host preference hierarchy for rows that have a match
     merged['host'] = merged.apply(update_host, axis=1)
 
-    # Remove all ncbi columns from the merge unless they're in `--add-fields`, in which case keep them!
-    if len(args.add_fields):
-        merged = merged.rename(columns={x+"_ncbi":x for x in args.add_fields})
-    merged = merged.drop(columns=[x for x in merged.columns if x.endswith('_ncbi')])
+    # Remove all ncbi columns from the merge unless they're in `add_fields`, in which case keep them!
+    if add_fields:
+        merged = merged.rename(columns={x+"_ncbi":x for x in add_fields})
+    return merged.drop(columns=[x for x in merged.columns if x.endswith('_ncbi')])
+
 
-    merged.to_csv(args.output, sep='\t', index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--metadata-ppx", required=True, help="PPX metadata TSV file")
+    parser.add_argument("--metadata-ncbi-entrez", required=True, help="NCBI Entrez metadata TSV file")
+    parser.add_argument("--output", required=True, help="Output merged metadata TSV file")
+    parser.add_argument("--add-fields", required=False, nargs="+", help="Columns in the NCBI table to add to the output")
 
+    args = parser.parse_args()
+    instrument.start()
+
+    with instrument.phase("read"):
+        ppx = pd.read_csv(args.metadata_ppx, sep='\t')
+        ncbi = pd.read_csv(args.metadata_ncbi_entrez, sep='\t')
+    instrument.count("records_in", len(ppx))
+
+    with instrument.phase("join"):
+        merged = spike_in_ncbi_data(ppx, ncbi, args.add_fields)
+    with instrument.phase("write"):
+        merged.to_csv(args.output, sep='\t', index=False)
+    instrument.count("records_out", len(merged))
@@ -6,11 +6,14 @@ OR
 Summarise the changes in geo values across 2 metadata TSVs
 """
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
 from cross_reference_inrb import parse_tsv
 import argparse
 from collections import Counter, defaultdict
 import sys
 
+import instrument
+
 
 def extract_geography_counts(metadata):
     """Extract geography tuples and return Counter object with occurrences and dict mapping tuples to sets of keys."""
@@ -114,8 +117,11 @@ if __name__ == "__main__":
     parser.add_argument("--alphabetical", action='store_true', help="Sort tables alphabetically. Only works for single metadata file at the moment.")
     parser.add_argument("--include-lab-hosts", action='store_false', help="By default we'll drop rows where `is_lab_host==True`. Add this flag to not drop any rows.")
     args = parser.parse_args()
+    instrument.start()
 
-    m1 = parse_tsv(args.m1, id='accession')
+    with instrument.phase("read"):
+        m1 = parse_tsv(args.m1, id='accession')
+    instrument.count("records_in", len(m1))
     if (args.include_lab_hosts):
         m1 = prune_lab_hosts(m1)
     counts1, keys1 = extract_geography_counts(m1)
@@ -126,7 +132,9 @@ if __name__ == "__main__":
         sys.exit(0)
 
     # otherwise parse the second metadata file and generate a diff
-    m2 = parse_tsv(args.m2, id='accession')
+    with instrument.phase("read"):
+        m2 = parse_tsv(args.m2, id='accession')
+    instrument.count("records_in", len(m2))
     if (args.include_lab_hosts):
         m2 = prune_lab_hosts(m2)
     counts2, keys2 = extract_geography_counts(m2)
@@ -97,13 +97,19 @@ rule align:
         aligned_sequences = "results/{build}/aligned.fasta",
     params:
         translations = lambda w: f"results/{w.build}/{{cds}}_translations.fasta",
+        script = "../shared/scripts/nextclade_sharded.py",
+        shards = config.get("nextclade_shards", 1),
+    threads: 4
     shell:
         """
-        nextclade run --input-ref {input.reference} \
+        python {params.script} \
+        --executable nextclade \
+        --shards {params.shards} \
+        --threads {threads} \
+        --input-ref {input.reference} \
         --input-pathogen-json {input.pathogen_json} \
         --input-annotation {input.annotation} \
         --output-fasta {output.aligned_sequences} \
         --output-translations {params.translations} \
-        --jobs 4 \
         {input.filtered_sequences}
         """
@@ -4,8 +4,7 @@ def _root_seq(wildcards):
     arguments for `augur ancestral`. Since we resolve file paths the files must exist
     which avoids the need to use Snakemake's input functionaly.
     """
-    if p:=config['ancestral'][f"{wildcards.species}/{wildcards.build}"].get('root-sequence', False):
-        resolved = resolve_config_path(p)({})
+    if resolved := build_spec(wildcards).root_sequence:
         return ['--root-sequence', resolved]
     return []
 
@@ -15,7 +14,7 @@ rule ancestral:
     input:
         tree = "results/{species}/{build}/tree.nwk",
         alignment = "results/{species}/{build}/subsampled.fasta", # unmasked
-        annotation = lambda w: resolve_config_path(config['ancestral'][f"{w.species}/{w.build}"]['annotation'])({}),
+        annotation = lambda w: build_spec(w).ancestral_annotation,
     output:
         node_data = "results/{species}/{build}/muts.json"
     params:
@@ -42,25 +41,6 @@ rule ancestral:
             --output-node-data {output.node_data:q}
         """
 
-rule count_mutations:
-    """Count the nucleotide and amino-acid mutations per node"""
-    input:
-        node_data = "results/{species}/{build}/muts.json"
-    output:
-        node_data = "results/{species}/{build}/muts-counts.json"
-    params:
-        script = os.path.join(workflow.basedir, "scripts", "collect-mutations.py"),
-        cds = lambda w: config['count_mutations'][f"{w.species}/{w.build}"].get('cds', []),
-        counts = lambda w: config['count_mutations'][f"{w.species}/{w.build}"].get('counts', ''),
-    shell:
-        r"""
-        python {params.script} \
-            --muts {input.node_data:q} \
-            --cds {params.cds} \
-            --counts {params.counts} \
-            --output {output.node_data:q}
-        """
-
 rule traits:
     input:
         tree = "results/{species}/{build}/tree.nwk",
@@ -89,50 +69,68 @@ rule traits:
         """
 
 
+def _annotations(wildcards):
+    """
+    Returns the annotators (see `scripts/annotate.py`) configured for this build,
+    as a dict of annotator name to its config value.
+    """
+    return build_spec(wildcards).annotations
 
-rule sampling_year:
-    input:
-        metadata = "results/{species}/{build}/metadata.tsv",
-    output:
-        node_data = "results/{species}/{build}/sampling-year.json",
-        config_block = "results/{species}/{build}/sampling-year.config.json",
-    params:
-        id_field = config['strain_id_field'],
-        script = os.path.join(workflow.basedir, "scripts", "get_year.py"),
-    shell:
-        r"""
-        exec &> >(tee {log:q})
-
-        python {params.script} \
-            --id-columns {params.id_field:q} \
-            --metadata {input.metadata:q} \
-            --output {output.node_data:q} \
-            --output-config {output.config_block:q}
-        """
+def _annotate_inputs(wildcards):
+    annotators = _annotations(wildcards)
+    count_options = annotators.get('count_mutations') or {}
+    inputs = {}
+    if 'sampling_year' in annotators or 'label_outbreaks' in annotators:
+        inputs['metadata'] = f"results/{wildcards.species}/{wildcards.build}/metadata.tsv"
+    if 'label_outbreaks' in annotators or count_options.get('cumulative') or count_options.get('from_outbreak'):
+        inputs['tree'] = f"results/{wildcards.species}/{wildcards.build}/tree.nwk"
+    if count_options:
+        inputs['muts'] = f"results/{wildcards.species}/{wildcards.build}/muts.json"
+    return inputs
 
+def _annotate_args(wildcards, input):
+    """Command line arguments for `scripts/annotate.py` (excluding outputs)"""
+    annotators = _annotations(wildcards)
+    args = []
+    for name in ['metadata', 'tree', 'muts']:
+        if name in input.keys():
+            args.extend([f"--{name}", input[name]])
+    for name in annotators:
+        args.append(f"--{name.replace('_', '-')}")
+    if count_options := annotators.get('count_mutations'):
+        args.extend(conditional('--cds', count_options.get('cds', [])) or [])
+        args.extend(conditional('--counts', count_options.get('counts', False)) or [])
+        args.extend(conditional('--cumulative', count_options.get('cumulative', False)) or [])
+        args.extend(conditional('--from-outbreak', count_options.get('from_outbreak', False)) or [])
+        args.extend(conditional('--cumulative-counts', count_options.get('cumulative_counts', False)) or [])
+    return args
 
-rule label_outbreaks:
+rule annotate:
+    """
+    Run the configured annotators (sampling year, outbreak labels, mutation counts)
+    in a single process, producing one node-data JSON and the corresponding
+    auspice-config colorings
+    """
     input:
-        metadata = "results/{species}/{build}/metadata.tsv",
-        tree = "results/{species}/{build}/tree.nwk",
+        unpack(_annotate_inputs),
     output:
-        node_data = "results/{species}/{build}/outbreaks.json"
+        node_data = "results/{species}/{build}/annotations.json",
+        config_block = "results/{species}/{build}/annotations.config.json",
     params:
-        script = os.path.join(workflow.basedir, "scripts", "label_outbreaks.py"),
+        id_field = config['strain_id_field'],
+        script = os.path.join(workflow.basedir, "scripts", "annotate.py"),
+        args = _annotate_args,
     benchmark:
-        "benchmarks/{species}/{build}/label_outbreaks.txt"
+        "benchmarks/{species}/{build}/annotate.txt"
     log:
-        "logs/{species}/{build}/label_outbreaks.txt"
-    wildcard_constraints:
-        # these could be relaxed if we generalised the script
-        species="ebov",
-        build="all-outbreaks",
+        "logs/{species}/{build}/annotate.txt"
     shell:
         r"""
         exec &> >(tee {log:q})
 
         python {params.script} \
-            --metadata {input.metadata:q} \
-            --tree {input.tree:q} \
-            --output {output.node_data:q}
+            --id-columns {params.id_field:q} \
+            {params.args:q} \
+            --output {output.node_data:q} \
+            --output-config {output.config_block:q}
         """
@@ -1,3 +1,11 @@
+import functools
+import hashlib
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
+
 def conditional(option, argument):
     """Used for config-defined arguments whose presence necessitates a command-line option
     (e.g. --foo) prepended and whose absence should result in no option/arguments in the CLI command.
@@ -34,7 +42,159 @@ def validate_config():
         raise InvalidConfigError("Each value in config.builds must have the format {species}/{build}, e.g. 'ebov/all-outbreaks'")
 
 def write_subsample_configs():
+    """
+    Write each build's section of config.subsample for `augur subsample`. Files
+    are only rewritten if their content has changed, as they're an input of rule
+    subsample (and so of everything downstream of it).
+    """
+    import yaml
     for build_pair in config["builds"]:
         species, build = build_pair.split('/')
-        write_config(f"results/{species}/{build}/subsample_config.yaml", section=["subsample", build_pair])
+        section = config.get('subsample', {}).get(build_pair)
+        if not isinstance(section, dict):
+            raise InvalidConfigError(f"config.subsample.{build_pair} must be a mapping of `augur subsample` config")
+        path = f"results/{species}/{build}/subsample_config.yaml"
+        content = yaml.dump(section, sort_keys=False, Dumper=NoAliasDumper)
+        if write_if_changed(path, content):
+            print(f"Saved 'config.subsample.{build_pair}' to {path!r}.", file=sys.stderr)
+        record_fingerprint(path, {'fingerprint': f"sha256:{hashlib.sha256(content.encode()).hexdigest()}"})
+
+
+
+def write_if_changed(path, content):
+    """
+    Write the string *content* to *path*, unless the file already has exactly
+    that content. Leaving an unchanged file alone keeps its mtime, so Snakemake
+    doesn't re-run the rules which use it. Returns True if the file was written.
+    """
+    try:
+        with open(path) as fh:
+            if fh.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w') as fh:
+        fh.write(content)
+    os.replace(f"{path}.tmp", path)
+    return True
+
+
+@dataclass(frozen=True)
+class BuildSpec:
+    """
+    The validated config of a single {species}/{build}, with config-provided
+    paths resolved. Use `build_spec(wildcards)` to get one.
+    """
+    species: str
+    build: str
+    annotations: Mapping          # annotator name -> its (truthy) config value
+    ancestral_annotation: str     # resolved paths, or None if not configured
+    root_sequence: str
+    mask_sites: tuple             # 1-based
+    mask_files: tuple             # resolved paths
+    collapse_identical: object    # False, or a dict of options
+    auspice_configs: tuple        # resolved paths / generated files
+    node_data_files: tuple
+    warning: tuple                # arguments for `augur export v2`
+    description: tuple
+    colors: tuple
+
+
+def build_spec(wildcards):
+    """
+    The BuildSpec of the wildcards' {species}/{build}. Snakemake calls input
+    functions many times while building the DAG, so each build's config is
+    validated (and its paths resolved) only the first time it's asked for. This
+    has no side effects: files derived from the config are written by rules.
+    """
+    return _build_spec(wildcards.species, wildcards.build)
+
+
+@functools.cache
+def _build_spec(species, build):
+    build_pair = f"{species}/{build}"
+    results = f"results/{species}/{build}"
+    wildcards = {"species": species, "build": build}
+
+    annotators = {
+        'sampling_year': config['sampling_year_coloring'].get(build_pair, False),
+        'label_outbreaks': config['label_outbreaks'].get(build_pair, False),
+        'count_mutations': config['count_mutations'].get(build_pair, False),
+    }
+    if count_options := annotators['count_mutations']:
+        if not isinstance(count_options, dict):
+            raise InvalidConfigError(f"config.count_mutations.{build_pair} must be a dictionary")
+        if count_options.get('from_outbreak') and not annotators['label_outbreaks']:
+            raise InvalidConfigError(f"config.count_mutations.{build_pair}.from_outbreak requires config.label_outbreaks.{build_pair}")
+    annotations = MappingProxyType({name: options for name, options in annotators.items() if options})
+
+    ancestral = config['ancestral'].get(build_pair, False)
+    ancestral_annotation = resolve_config_path(ancestral['annotation'])({}) if ancestral else None
+    root_sequence = resolve_config_path(ancestral['root-sequence'])({}) \
+        if ancestral and ancestral.get('root-sequence', False) else None
+
+    mask_options = config.get('mask', {}).get(build_pair) or {}
+    sites = mask_options.get('sites')
+    if not sites:
+        mask_sites = ()
+    elif isinstance(sites, int):
+        mask_sites = (sites,)
+    elif isinstance(sites, str):
+        mask_sites = tuple(int(site) for site in sites.split())
+    elif isinstance(sites, list):
+        mask_sites = tuple(int(site) for site in sites)
+    else:
+        raise InvalidConfigError(f"config.mask.{build_pair}.sites must be an integer, a string or a list")
+    bed = mask_options.get('bed', [])
+    mask_files = tuple(resolve_config_path(f)(wildcards) for f in ([bed] if isinstance(bed, str) else bed))
+
+    collapse_identical = config.get('collapse_identical', {}).get(build_pair, False)
+    if collapse_identical is True:
+        collapse_identical = {}
+    elif not (collapse_identical is False or isinstance(collapse_identical, dict)):
+        raise InvalidConfigError(f"config.collapse_identical.{build_pair} must be a boolean or a dictionary")
+
+    export = config['export'][build_pair]
+    auspice_configs = [resolve_config_path(export['auspice_config'])({})]
+    if 'sampling_year' in annotations:
+        auspice_configs.append(f"{results}/annotations.config.json")
+    if overlay := export.get('auspice_config_overlay'):
+        if not isinstance(overlay, dict):
+            raise InvalidConfigError(f"config.export.<build_pair>.auspice_config_overlay must be a dictionary; use auspice_config to provide the base JSON")
+        # written by rule auspice_config_overlay
+        auspice_configs.append(f"{results}/auspice_config_overlay.json")
+
+    node_data_files = [f"{results}/branch_lengths.json"]
+    if ancestral:
+        node_data_files.append(f"{results}/muts.json")
+    if config['traits'].get(build_pair, False):
+        node_data_files.append(f"{results}/traits.json")
+    if annotations:
+        node_data_files.append(f"{results}/annotations.json")
+
+    # The 'warning' key takes precedence over 'warning_file'
+    if export.get('warning'):
+        warning = ('--warning', export['warning'])
+    elif export.get('warning_file'):
+        warning = ('--warning', resolve_config_path(export['warning_file'])({}))
+    else:
+        warning = ()
+    description = ('--description', resolve_config_path(export['description'])({})) if export.get('description') else ()
+    colors = ('--colors', resolve_config_path(export['colors'])({})) if export.get('colors') else ()
 
+    return BuildSpec(
+        species=species,
+        build=build,
+        annotations=annotations,
+        ancestral_annotation=ancestral_annotation,
+        root_sequence=root_sequence,
+        mask_sites=mask_sites,
+        mask_files=mask_files,
+        collapse_identical=collapse_identical,
+        auspice_configs=tuple(auspice_configs),
+        node_data_files=tuple(node_data_files),
+        warning=warning,
+        description=description,
+        colors=colors,
+    )
@@ -1,47 +1,77 @@
 
+def outgroup_files(wildcards):
+    """Outgroup FASTA(s) for this build, from config as a path or list of paths"""
+    files = config['outgroup'][f"{wildcards.species}/{wildcards.build}"]
+    if isinstance(files, str):
+        files = [files]
+    return files
+
 # Outgroup sequences don't need corresponding metadata as they are intended to be removed by
 # either `augur refine` or the `reroot_tree` rule
 rule add_outgroup_sequence:
     input:
         sequences = "results/{species}/{build}/subsampled.fasta",
-        outgroup = lambda w: config['outgroup'][f"{w.species}/{w.build}"],
+        outgroup = outgroup_files,
     output:
         sequences = "results/{species}/{build}/subsampled-plus-outgroup.fasta",
-    run:
-        from Bio import SeqIO
-        records = [record for path in [input.sequences, input.outgroup] for record in SeqIO.parse(path, "fasta")]
-        lengths = {len(record.seq) for record in records}
-        assert len(lengths) == 1, f"Sequences (incl. outgroup) must all be the same length, but found lengths {sorted(lengths)}"
-        names = [record.name for record in records]
-        duplicates = sorted({name for name in names if names.count(name) > 1})
-        assert not duplicates, f"Sequence names (incl. outgroup) must be unique, but these are duplicated: {duplicates}"
-        SeqIO.write(records, output.sequences, "fasta")
+    params:
+        script = os.path.join(workflow.basedir, "scripts", "add_outgroup_sequence.py"),
+    benchmark:
+        "benchmarks/{species}/{build}/add_outgroup_sequence.txt"
+    log:
+        "logs/{species}/{build}/add_outgroup_sequence.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} \
+            --sequences {input.sequences:q} \
+            --outgroup {input.outgroup:q} \
+            --output {output.sequences:q}
+        """
+
+def _mask_options(wildcards):
+    return config['mask'][f"{wildcards.species}/{wildcards.build}"]
 
 def sites_to_mask(wildcards):
-    build_options = config['mask'][f"{wildcards.species}/{wildcards.build}"]
-    sites = build_options.get('sites')
-    if sites:
-        return f'--mask-sites {sites}'
-    return ""
+    """1-based sites to mask, from config as an int, a space-separated string or a list"""
+    return list(build_spec(wildcards).mask_sites)
+
+def mask_files(wildcards):
+    """BED (or augur mask) files of sites to mask, from config as a path or list of paths"""
+    return list(build_spec(wildcards).mask_files)
 
 rule mask:
     input:
         alignment=lambda w: f"results/{w.species}/{w.build}/subsampled-plus-outgroup.fasta" \
             if config.get('outgroup', {}).get(f"{w.species}/{w.build}", False) \
             else f"results/{w.species}/{w.build}/subsampled.fasta",
+        mask_files=mask_files,
     output:
         alignment="results/{species}/{build}/masked.fasta",
+        report="results/{species}/{build}/mask_report.tsv",
     params:
-        mask_beginning=lambda w: config['mask'][f"{w.species}/{w.build}"]['beginning'],
-        mask_end=lambda w: config['mask'][f"{w.species}/{w.build}"]['end'],
-        mask_sites =sites_to_mask
+        script=os.path.join(workflow.basedir, "scripts", "mask.py"),
+        mask_beginning=lambda w: _mask_options(w).get('beginning', 0),
+        mask_end=lambda w: _mask_options(w).get('end', 0),
+        mask_sites=lambda w: conditional('--mask-sites', sites_to_mask(w)),
+        mask_files=lambda w, input: conditional('--mask', list(input.mask_files)),
+    benchmark:
+        "benchmarks/{species}/{build}/mask.txt"
+    log:
+        "logs/{species}/{build}/mask.txt"
     shell:
         r"""
-        augur mask --sequences {input.alignment} \
-                    --mask-from-beginning {params.mask_beginning} \
-                    --mask-from-end {params.mask_end} \
-                    {params.mask_sites} \
-                    --output {output.alignment}
+        exec &> >(tee {log:q})
+
+        python {params.script} \
+            --alignment {input.alignment:q} \
+            --mask-from-beginning {params.mask_beginning} \
+            --mask-from-end {params.mask_end} \
+            {params.mask_sites} \
+            {params.mask_files} \
+            --output {output.alignment:q} \
+            --output-report {output.report:q}
         """
 
 
@@ -54,6 +84,38 @@ def alignment_for_tree(wildcards):
     return f"results/{wildcards.species}/{wildcards.build}/subsampled.fasta",
 
 
+def _collapse_identical(wildcards):
+    """Config for collapsing identical sequences before tree building (False if not enabled)"""
+    return build_spec(wildcards).collapse_identical
+
+rule collapse_identical:
+    """Collapse identical sequences into a single representative for tree building"""
+    input:
+        alignment = alignment_for_tree,
+    output:
+        alignment = "results/{species}/{build}/collapsed.fasta",
+        map = "results/{species}/{build}/collapsed.tsv",
+    params:
+        script = os.path.join(workflow.basedir, "scripts", "collapse_identical.py"),
+        keep = lambda w: conditional('--keep', config.get('reroot_tree', {}).get(f"{w.species}/{w.build}", {}).get('strains', [])),
+        ignore_ambiguous = lambda w: conditional('--ignore-ambiguous', _collapse_identical(w).get('ignore_ambiguous', False)),
+    benchmark:
+        "benchmarks/{species}/{build}/collapse_identical.txt"
+    log:
+        "logs/{species}/{build}/collapse_identical.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} collapse \
+            --alignment {input.alignment:q} \
+            {params.keep} \
+            {params.ignore_ambiguous} \
+            --output {output.alignment:q} \
+            --output-map {output.map:q}
+        """
+
+
 def args_for_tree(wildcards):
     build_options = config['tree'].get(f"{wildcards.species}/{wildcards.build}",False)
     if build_options:
@@ -63,7 +125,9 @@ def args_for_tree(wildcards):
 rule tree:
     """Building tree"""
     input:
-        alignment = alignment_for_tree,
+        alignment = lambda w: f"results/{w.species}/{w.build}/collapsed.fasta" \
+            if _collapse_identical(w) is not False \
+            else alignment_for_tree(w),
     output:
         tree = "results/{species}/{build}/tree_raw.nwk"
     params:
@@ -84,26 +148,59 @@ rule tree:
             --nthreads {threads:q} 
         """
 
+rule expand_identical:
+    """Re-expand collapsed sequences as zero-length polytomies"""
+    input:
+        tree = "results/{species}/{build}/tree_raw.nwk",
+        map = "results/{species}/{build}/collapsed.tsv",
+    output:
+        tree = "results/{species}/{build}/tree_raw_expanded.nwk",
+    params:
+        script = os.path.join(workflow.basedir, "scripts", "collapse_identical.py"),
+    benchmark:
+        "benchmarks/{species}/{build}/expand_identical.txt"
+    log:
+        "logs/{species}/{build}/expand_identical.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} expand \
+            --tree {input.tree:q} \
+            --map {input.map:q} \
+            --output {output.tree:q}
+        """
+
+
+def unrooted_tree(wildcards):
+    """The tree from rule tree (augur tree), with any collapsed sequences re-expanded"""
+    if _collapse_identical(wildcards) is not False:
+        return f"results/{wildcards.species}/{wildcards.build}/tree_raw_expanded.nwk"
+    return f"results/{wildcards.species}/{wildcards.build}/tree_raw.nwk"
+
 rule reroot_tree:
     input:
-        tree = "results/{species}/{build}/tree_raw.nwk"
+        tree = unrooted_tree,
     output:
         tree = "results/{species}/{build}/tree_raw_rooted.nwk"
     params:
+        script = os.path.join(workflow.basedir, "scripts", "reroot_tree.py"),
         strains = lambda w: config['reroot_tree'][f"{w.species}/{w.build}"]['strains'],
-        remove_outgroup = lambda w: config['reroot_tree'][f"{w.species}/{w.build}"].get('remove_outgroup',False)
-    run:
-        from Bio import Phylo
-        T = Phylo.read(input.tree, "newick")
-        T.root_at_midpoint()
-        strains = params.strains
-        print("Rooting tree using the common ancestor of these strains as the outgroup:", strains)
-        ca = T.common_ancestor(strains)
-        T.root_with_outgroup(ca)
-        if params.remove_outgroup:
-            for strain in strains:
-                T.prune(strain)
-        Phylo.write(T, output.tree, "newick")
+        remove_outgroup = lambda w: conditional('--remove-outgroup', config['reroot_tree'][f"{w.species}/{w.build}"].get('remove_outgroup', False)),
+    benchmark:
+        "benchmarks/{species}/{build}/reroot_tree.txt"
+    log:
+        "logs/{species}/{build}/reroot_tree.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} \
+            --tree {input.tree:q} \
+            --strains {params.strains:q} \
+            {params.remove_outgroup} \
+            --output {output.tree:q}
+        """
 
 
 def tree_for_refine(wildcards):
@@ -113,7 +210,7 @@ def tree_for_refine(wildcards):
     """
     if config.get('reroot_tree', {}).get(f"{wildcards.species}/{wildcards.build}", False):
         return f"results/{wildcards.species}/{wildcards.build}/tree_raw_rooted.nwk",
-    return f"results/{wildcards.species}/{wildcards.build}/tree_raw.nwk",
+    return unrooted_tree(wildcards)
 
 
 rule refine:
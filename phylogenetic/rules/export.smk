@@ -1,22 +1,6 @@
 
-def _uses_sampling_year(wildcards):
-    return bool(config['sampling_year_coloring'].get(f"{wildcards.species}/{wildcards.build}"))
-
 def node_data_files(wildcards):
-    build_pair = f"{wildcards.species}/{wildcards.build}"
-    files = [
-        f"results/{wildcards.species}/{wildcards.build}/branch_lengths.json",
-    ]
-    if config['ancestral'].get(build_pair, False):
-        files.append(f"results/{wildcards.species}/{wildcards.build}/muts.json")
-    if config['traits'].get(build_pair, False):
-        files.append(f"results/{wildcards.species}/{wildcards.build}/traits.json")
-    if _uses_sampling_year(wildcards):
-        files.append(f"results/{wildcards.species}/{wildcards.build}/sampling-year.json")
-    if config['count_mutations'].get(build_pair, False):
-        files.append(f"results/{wildcards.species}/{wildcards.build}/muts-counts.json")
-    if config['label_outbreaks'].get(build_pair, False):
-        files.append(f"results/{wildcards.species}/{wildcards.build}/outbreaks.json")
+    files = list(build_spec(wildcards).node_data_files)
 
     # TODO: allow a way for configs to define custom rules which produce node-data JSONs
     # and have this function return the JSONs so the custom rule becomes part of the DAG
@@ -35,12 +19,7 @@ def _warning(wildcards):
     is resolved (and thus must exist).
     The 'warning' key takes precidence.
     """
-    block = config['export'][f"{wildcards.species}/{wildcards.build}"]
-    if warning:=block.get('warning'):
-        return ['--warning', warning]
-    if warning_file:=block.get('warning_file'):
-        return ['--warning', resolve_config_path(warning_file)({})]
-    return []
+    return list(build_spec(wildcards).warning)
 
 
 def _description(wildcards):
@@ -49,18 +28,14 @@ def _description(wildcards):
     A config-specified 'description' key is expected to be a markdown file and the file
     is resolved (and thus must exist).
     """
-    if fname:=config['export'][f"{wildcards.species}/{wildcards.build}"].get('description'):
-        return ['--description', resolve_config_path(fname)({})]
-    return []
+    return list(build_spec(wildcards).description)
 
 def _colors(wildcards):
     """
     Returns a list of arguments to be supplied to `augur export v2` for custom, per-dataset
     colors (if defined in config).
     """
-    if fname:=config['export'][f"{wildcards.species}/{wildcards.build}"].get('colors'):
-        return ['--colors', resolve_config_path(fname)({})]
-    return []
+    return list(build_spec(wildcards).colors)
 
 
 BASE_LAT_LONGS = os.path.join(workflow.basedir, 'defaults', 'lat_longs.tsv')
@@ -75,26 +50,32 @@ rule concatenate_lat_longs:
     shell:
         """cat {input.base} {input.user} > {output.lat_longs}"""
 
+rule auspice_config_overlay:
+    """
+    Write config.export.<build_pair>.auspice_config_overlay as its own auspice config JSON.
+    It's passed as a param, so a change to it (and only that) re-runs this rule and the export.
+    """
+    output:
+        overlay = "results/{species}/{build}/auspice_config_overlay.json",
+    params:
+        overlay = lambda w: json.dumps(config['export'][f"{w.species}/{w.build}"]['auspice_config_overlay'], indent=2),
+    benchmark:
+        "benchmarks/{species}/{build}/auspice_config_overlay.txt"
+    log:
+        "logs/{species}/{build}/auspice_config_overlay.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        printf '%s\n' {params.overlay:q} > {output.overlay:q}
+        """
+
 def _auspice_configs(wildcards):
     """returns a list of JSON files for consumption by `augur export v2`. If the config defines
-    'auspice_config_overlay' then this config section is written into its own config JSON
-    and that file is part of the returned list of files.
+    'auspice_config_overlay' then this config section is written into its own config JSON (by
+    rule auspice_config_overlay) and that file is part of the returned list of files.
     """
-    build = config['export'][f"{wildcards.species}/{wildcards.build}"]
-    jsons = [
-        resolve_config_path(build['auspice_config'])({}),
-    ]
-    if _uses_sampling_year(wildcards):
-        jsons.append(f"results/{wildcards.species}/{wildcards.build}/sampling-year.config.json")
-    if overlay:=build.get('auspice_config_overlay'):
-        if not isinstance(overlay, dict):
-            raise InvalidConfigError(f"config.export.<build_pair>.auspice_config_overlay must be a dictionary; use auspice_config to provide the base JSON")
-        import json
-        fname = f"results/{wildcards.species}/{wildcards.build}/auspice_config_overlay.json"
-        with open(fname, 'w') as fh:
-            json.dump(overlay, fh, indent=2)
-        jsons.append(fname)
-    return jsons
+    return list(build_spec(wildcards).auspice_configs)
 
 
 rule export:
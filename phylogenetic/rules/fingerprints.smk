@@ -0,0 +1,127 @@
+"""
+Content fingerprints of the workflow's inputs and generated config files.
+
+Snakemake re-runs a rule when an input's modification time is newer than its
+outputs, but the daily inputs are often re-downloaded (or re-created by ingest)
+with identical content, and so would re-run subsampling, tree building etc. for
+nothing. Instead, rules can depend on a small local file holding an input's
+fingerprint, which is only rewritten when the fingerprint changes, with the
+input itself marked `ancient` (see `fingerprinted_input`).
+
+Fingerprints are the sha256sum which `upload-to-s3` records on S3 objects, or
+else their ETag, for remote files, and the sha256 of local files. They are
+recorded in FINGERPRINT_MANIFEST, as are those of the config files the workflow
+writes (which are likewise only rewritten when their content changes, see
+`write_if_changed`). Local files are only re-hashed if their size or mtime
+differs from the manifest's.
+"""
+import hashlib
+from urllib.parse import urlparse
+
+FINGERPRINT_MANIFEST = "results/fingerprints.json"
+
+_fingerprint_manifest = None  # loaded on first use
+
+
+def _fingerprints():
+    global _fingerprint_manifest
+    if _fingerprint_manifest is None:
+        try:
+            with open(FINGERPRINT_MANIFEST) as fh:
+                _fingerprint_manifest = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _fingerprint_manifest = {}
+    return _fingerprint_manifest
+
+
+def record_fingerprint(key, entry):
+    """Record *entry* (a dict including the 'fingerprint') for *key* (a path or URI) in the manifest"""
+    manifest = _fingerprints()
+    if manifest.get(key) != entry:
+        manifest[key] = entry
+        write_if_changed(FINGERPRINT_MANIFEST, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+
+def local_fingerprint(path):
+    """The sha256 of a local file, re-using the recorded one if the file's size and mtime are unchanged"""
+    st = os.stat(path)
+    entry = _fingerprints().get(path, {})
+    if entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+        return entry['fingerprint']
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        while chunk := fh.read(1 << 20):
+            h.update(chunk)
+    fingerprint = f"sha256:{h.hexdigest()}"
+    record_fingerprint(path, {'fingerprint': fingerprint, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns})
+    return fingerprint
+
+
+def remote_fingerprint(uri):
+    """
+    The sha256sum (as recorded by `upload-to-s3`) or else the ETag of a remote
+    S3 or HTTPS object, or None if it has neither
+    """
+    info = urlparse(uri)
+    if info.scheme == 's3':
+        import boto3
+        from botocore import UNSIGNED
+        from botocore.config import Config
+        # public buckets (e.g. nextstrain-data) don't need credentials
+        client = boto3.client('s3') if boto3.Session().get_credentials() \
+            else boto3.client('s3', config=Config(signature_version=UNSIGNED))
+        head = client.head_object(Bucket=info.netloc, Key=info.path.lstrip('/'))
+        sha256, etag = head.get('Metadata', {}).get('sha256sum'), head.get('ETag')
+    else:
+        import urllib.request
+        with urllib.request.urlopen(urllib.request.Request(uri, method='HEAD'), timeout=60) as response:
+            sha256, etag = response.headers.get('x-amz-meta-sha256sum'), response.headers.get('ETag')
+    if sha256:
+        fingerprint = f"sha256:{sha256}"
+    elif etag:
+        fingerprint = f"etag:{etag.strip(chr(34))}"
+    else:
+        return None
+    record_fingerprint(uri, {'fingerprint': fingerprint})
+    return fingerprint
+
+
+def write_fingerprint(uri, fingerprint_file):
+    """
+    Writes the fingerprint of *uri* (a local path or remote URI) to
+    *fingerprint_file* if it has changed, and returns *fingerprint_file*, or
+    None if *uri* can't be fingerprinted (e.g. a local file which doesn't exist
+    yet).
+    """
+    try:
+        if urlparse(uri).scheme == '':
+            fingerprint = local_fingerprint(uri) if os.path.isfile(uri) else None
+        else:
+            fingerprint = remote_fingerprint(uri)
+    except Exception as e:
+        print(f"WARNING: Unable to fingerprint {uri!r} ({e}); rules using it will be re-run whenever it's modified",
+              file=sys.stderr)
+        fingerprint = None
+    if fingerprint is None:
+        return None
+    write_if_changed(fingerprint_file, fingerprint + "\n")
+    return fingerprint_file
+
+
+def fingerprinted_input(uri, fingerprint_file, fetched=None):
+    """
+    Returns (input, fingerprint file) for a rule to depend on the content of
+    *uri* (a local path or remote URI) rather than its modification time: the
+    input (wrapped by `path_or_url`) is marked ancient, and *fingerprint_file*,
+    which holds its fingerprint, is only rewritten when that changes. If
+    *fetched* is given, it's the path which a rule fetches *uri* to (and which
+    depends on *fingerprint_file*), and is the (ancient) input instead.
+
+    If *uri* can't be fingerprinted then (input, None) is returned and its
+    modification time is used as usual.
+    """
+    if write_fingerprint(uri, fingerprint_file) is None:
+        return path_or_url(uri), None
+    if fetched:
+        return ancient(fetched), fingerprint_file
+    return ancient(path_or_url(uri)), fingerprint_file
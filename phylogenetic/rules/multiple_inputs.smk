@@ -1,7 +1,9 @@
+from pathlib import PurePosixPath
 
+@functools.cache
 def _gather_inputs(species):
     """Inputs ('inputs' + 'additional_inputs') are validated and collected for
-    each species independently
+    each species independently (once, as it's called by several input functions)
     """
 
     # Note: some basic checking of the expected structures done ahead-of-time in validate_config
@@ -23,28 +25,95 @@ def _gather_inputs(species):
     if any([len(set(el.keys())-available_keys)>0 for el in all_inputs]):
         raise InvalidConfigError(f"Each input (config.inputs and config.additional_inputs) can only include keys of {', '.join(available_keys)}")
 
-    return {el['name']: {k:(v if k in ['name', 'species'] else path_or_url(v)) for k,v in el.items()} for el in all_inputs}
+    return MappingProxyType({
+        el['name']: MappingProxyType({
+            k: (v if k in ['name', 'species'] else _input_file(species, el['name'], k, v))
+            for k, v in el.items()
+        })
+        for el in all_inputs
+    })
+
+
+def _input_file(species, name, kind, uri):
+    """
+    Returns (input, fingerprint file) for an input's *kind* ('metadata' or
+    'sequences') file. Each file is paired with its fingerprint file (see
+    fingerprints.smk), so that re-downloaded but unchanged files don't re-run the
+    whole workflow, and remote files are fetched via the input cache shared
+    between analysis directories (rule fetch_input) if config.input_cache is set.
+    """
+    fetched = None
+    if config.get('input_cache') and urlparse(uri).scheme:
+        suffixes = "".join(PurePosixPath(urlparse(uri).path).suffixes)
+        fetched = f"results/{species}/inputs/{name}/{kind}{suffixes}"
+    return fingerprinted_input(uri, f"results/{species}/inputs/{name}_{kind}.fingerprint", fetched=fetched)
 
 
 def _named_metadata_files(wildcards):
     inputs = _gather_inputs(wildcards.species)
-    return [(name, info['metadata']) for name, info in inputs.items() if info.get('metadata')]
+    return [(name, info['metadata'][0]) for name, info in inputs.items() if info.get('metadata')]
 
 def _named_sequence_files(wildcards):
     inputs = _gather_inputs(wildcards.species)
-    return [(name, info['sequences']) for name, info in inputs.items() if info.get('sequences')]
+    return [(name, info['sequences'][0]) for name, info in inputs.items() if info.get('sequences')]
+
+def _input_uri(wildcards):
+    return next(i[wildcards.kind] for i in [*config['inputs'], *config.get('additional_inputs', [])]
+                if i['species']==wildcards.species and i['name']==wildcards.name)
+
+def _input_fingerprints(wildcards, kind):
+    """Fingerprint files of the species' *kind* ('metadata' or 'sequences') inputs"""
+    inputs = _gather_inputs(wildcards.species)
+    return [info[kind][1] for info in inputs.values() if info.get(kind) and info[kind][1]]
+
+
+rule fetch_input:
+    """Fetch a remote input via the input cache shared between analysis directories (see config.input_cache)"""
+    input:
+        # rewritten only when the remote file's content changes
+        fingerprint = "results/{species}/inputs/{name}_{kind}.fingerprint",
+    output:
+        file = "results/{species}/inputs/{name}/{kind}{suffixes}",
+    wildcard_constraints:
+        name = "[^/]+",
+        kind = "metadata|sequences",
+    params:
+        uri = _input_uri,
+        cache_dir = config.get('input_cache', ''),
+        max_size = config.get('input_cache_max_size', ''),
+        script = os.path.join(workflow.basedir, "..", "shared", "scripts", "input_cache.py"),
+    benchmark:
+        "benchmarks/{species}/fetch_input/{name}/{kind}{suffixes}.txt"
+    log:
+        "logs/{species}/fetch_input/{name}/{kind}{suffixes}.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} \
+            --cache-dir {params.cache_dir:q} \
+            --max-size {params.max_size:q} \
+            {params.uri:q} \
+            {output.file:q}
+        """
+
 
+# The canonical per-species metadata & sequences are zstd-compressed, so that a single
+# (compressed) input is copied as-is rather than decompressed, and consumers read them via
+# streaming decompression (see shared/scripts/file_io.py).
 
 rule gather_metadata:
     """Produce a canonical (per-species) metadata table from a single input or multiple inputs"""
     input:
-        lambda w: [meta for _name, meta in _named_metadata_files(w)],
+        files = lambda w: [meta for _name, meta in _named_metadata_files(w)],
+        fingerprints = lambda w: _input_fingerprints(w, 'metadata'),
     params:
-        n = lambda w, input: len(input),
+        n = lambda w, input: len(input.files),
         pairs = lambda w: [f"{name}={meta}" for name, meta in _named_metadata_files(w)],
         id_field = config['strain_id_field'],
+        copy_script = os.path.join(workflow.basedir, "..", "shared", "scripts", "file_io.py"),
     output:
-        metadata = "results/{species}/metadata.tsv"
+        metadata = "results/{species}/metadata.tsv.zst"
     benchmark:
         "benchmarks/{species}/gather_metadata.txt"
     log:
@@ -54,7 +123,7 @@ rule gather_metadata:
         exec &> >(tee {log:q})
 
         if [[ {params.n} -eq 1 ]]; then
-            augur read-file {input:q} > {output.metadata:q}
+            python {params.copy_script} {input.files:q} {output.metadata:q}
         else
             augur merge --metadata {params.pairs:q} \
                 --metadata-id-columns {params.id_field:q} \
@@ -65,12 +134,14 @@ rule gather_metadata:
 rule gather_sequences:
     """Produce a canonical (per-species) set of sequences from a single input or multiple inputs"""
     input:
-        lambda w: [seqs for _name, seqs in _named_sequence_files(w)],
+        files = lambda w: [seqs for _name, seqs in _named_sequence_files(w)],
+        fingerprints = lambda w: _input_fingerprints(w, 'sequences'),
     params:
-        n = lambda w, input: len(input),
+        n = lambda w, input: len(input.files),
         id_field = config['strain_id_field'],
+        copy_script = os.path.join(workflow.basedir, "..", "shared", "scripts", "file_io.py"),
     output:
-        sequences = "results/{species}/sequences.fasta"
+        sequences = "results/{species}/sequences.fasta.zst"
     benchmark:
         "benchmarks/{species}/gather_sequences.txt"
     log:
@@ -80,9 +151,9 @@ rule gather_sequences:
         exec &> >(tee {log:q})
 
         if [[ {params.n} -eq 1 ]]; then
-            augur read-file {input:q} > {output.sequences:q}
+            python {params.copy_script} {input.files:q} {output.sequences:q}
         else
-            augur merge --sequences {input:q} \
+            augur merge --sequences {input.files:q} \
                 --output-sequences {output.sequences:q}
         fi
         """
@@ -20,7 +20,7 @@ rule get_nextclade_dataset:
 
 rule run_nextclade:
     input:
-        sequences="results/{species}/sequences.fasta",
+        sequences="results/{species}/sequences.fasta.zst",
         dataset="results/{species}/nextclade-dataset.zip",
     output:
         metadata="results/{species}/nextclade.tsv",
@@ -29,6 +29,12 @@ rule run_nextclade:
     params:
         translations=lambda w: f"results/{w.species}/translations/{{cds}}.fasta",
         # translations_dir = "results/{species}/translations/"
+        # Results are cached per-sequence (see scripts/nextclade_cache.py) unless config.nextclade_cache is empty
+        cache_dir=lambda w: os.path.join(config['nextclade_cache'], w.species) if config.get('nextclade_cache') else "",
+        cache_script=os.path.join(workflow.basedir, "scripts", "nextclade_cache.py"),
+        sharded_script=os.path.join(workflow.basedir, "..", "shared", "scripts", "nextclade_sharded.py"),
+        shards=config.get('nextclade_shards', 1),
+    threads: 8
     benchmark:
         "benchmarks/{species}/run_nextclade.txt"
     log:
@@ -37,28 +43,73 @@ rule run_nextclade:
         r"""
         exec &> >(tee {log:q})
 
-        nextclade3 run \
-            {input.sequences:q} \
-            --input-dataset {input.dataset:q} \
-            --output-tsv {output.metadata:q} \
-            --output-fasta {output.alignment:q} \
-            --output-translations {params.translations:q}
+        if [[ -n {params.cache_dir:q} ]]; then
+            python {params.cache_script} \
+                --cache-dir {params.cache_dir:q} \
+                --shards {params.shards} \
+                --threads {threads} \
+                --sequences {input.sequences:q} \
+                --input-dataset {input.dataset:q} \
+                --output-tsv {output.metadata:q} \
+                --output-fasta {output.alignment:q} \
+                --output-translations {params.translations:q}
+        else
+            python {params.sharded_script} \
+                {input.sequences:q} \
+                --shards {params.shards} \
+                --threads {threads} \
+                --input-dataset {input.dataset:q} \
+                --output-tsv {output.metadata:q} \
+                --output-fasta {output.alignment:q} \
+                --output-translations {params.translations:q}
+        fi
         """
 
 
+rule sequence_stats:
+    """
+    Per-sequence statistics of the alignment (ACGT / N / ambiguous / gap counts, hash; not length,
+    which is the alignment length for every sequence), plus the same counts as an `augur index`
+    sequence index of the alignment, so that subsampling doesn't need to re-scan the sequences
+    """
+    input:
+        alignment="results/{species}/alignment.fasta",
+    output:
+        stats="results/{species}/sequence_stats.tsv",
+        index="results/{species}/sequence_index.tsv",
+    params:
+        script=os.path.join(workflow.basedir, "..", "shared", "scripts", "sequence_stats.py"),
+        id_field=config['strain_id_field'],
+    benchmark:
+        "benchmarks/{species}/sequence_stats.txt"
+    log:
+        "logs/{species}/sequence_stats.txt"
+    shell:
+        r"""
+        exec &> >(tee {log:q})
+
+        python {params.script} \
+            --sequences {input.alignment:q} \
+            --aligned \
+            --id-column {params.id_field:q} \
+            --output {output.stats:q} \
+            --output-index {output.index:q}
+        """
+
 rule add_nextclade_columns:
     """
-    Merge config-defined columns from Nextclade's (verbose) TSV into our per-species metadata file
+    Merge config-defined columns from Nextclade's (verbose) TSV, and the sequence statistics,
+    into our per-species metadata file
     """
     input:
-        metadata="results/{species}/metadata.tsv",
+        metadata="results/{species}/metadata.tsv.zst",
         nextclade="results/{species}/nextclade.tsv",
+        sequence_stats="results/{species}/sequence_stats.tsv",
     output:
-        nextclade_subset=temp("results/{species}/nextclade_subset.tsv"),
         metadata="results/{species}/metadata_extended.tsv",
     params:
-        source_cols=lambda w: ",".join(['seqName', *[el[0] for el in config['nextclade'][w.species]['columns']]]),
-        dest_cols=lambda w: ",".join([config['strain_id_field'], *[el[1] for el in config['nextclade'][w.species]['columns']]]),
+        script=os.path.join(workflow.basedir, "scripts", "add_nextclade_columns.py"),
+        columns=lambda w: [f"{el[0]}={el[1]}" for el in config['nextclade'][w.species]['columns']],
         id_field = config['strain_id_field'],
     benchmark:
         "benchmarks/{species}/add_nextclade_columns.txt"
@@ -67,16 +118,13 @@ rule add_nextclade_columns:
     shell:
         r"""
         exec &> >(tee {log:q})
-    
-        cat {input.nextclade} \
-            | csvtk -t cut -f {params.source_cols} \
-            | csvtk -t rename -f {params.source_cols} -n {params.dest_cols} \
-            > {output.nextclade_subset:q}
-    
-        augur merge \
-            --metadata nextclade={output.nextclade_subset:q}  metadata={input.metadata:q} \
-            --metadata-id-columns {params.id_field} \
-            --output-metadata {output.metadata:q} \
-            --no-source-columns
+
+        python {params.script} \
+            --metadata {input.metadata:q} \
+            --metadata-id-columns {params.id_field:q} \
+            --nextclade {input.nextclade:q} \
+            --columns {params.columns:q} \
+            --sequence-stats {input.sequence_stats:q} \
+            --output {output.metadata:q}
         """
 
@@ -5,6 +5,7 @@ rule subsample:
     input:
         config = "results/{species}/{build}/subsample_config.yaml",
         sequences = "results/{species}/alignment.fasta",
+        sequence_index = "results/{species}/sequence_index.tsv",
         metadata = "results/{species}/metadata_extended.tsv",
         # note: get_referenced_files will use the env variable AUGUR_SEARCH_PATHS
         referenced_files = lambda w: get_referenced_files(f"results/{w.species}/{w.build}/subsample_config.yaml")
@@ -24,6 +25,7 @@ rule subsample:
         augur subsample \
             --config {input.config} \
             --sequences {input.sequences} \
+            --sequence-index {input.sequence_index} \
             --metadata {input.metadata} \
             --metadata-id-columns {params.id_field} \
             --output-sequences {output.sequences} \
@@ -0,0 +1,205 @@
+"""
+Adds selected (and renamed) columns from Nextclade's TSV to a metadata TSV in a
+single pass, reproducing what
+
+    csvtk cut | csvtk rename  (the Nextclade columns)
+    augur merge --metadata nextclade=<subset> metadata=<metadata> --no-source-columns
+
+produces: an outer join on the metadata ID column == Nextclade's `seqName`, with
+the ID column first, then the Nextclade columns, then the remaining metadata
+columns. Where a column is in both tables the (non-empty) metadata value wins.
+
+--sequence-stats optionally adds the columns of a per-sequence statistics TSV
+(see shared/scripts/sequence_stats.py) in the same pass, after the Nextclade
+columns.
+
+Rows are written in the same order as augur merge writes them: in Nextclade
+(i.e. FASTA) order, followed by the metadata rows without Nextclade results, in
+metadata order. Row order matters as it feeds (seeded) `augur subsample`. To do
+so only the selected Nextclade (and statistics) columns are held in memory, plus
+the byte offset of each metadata row, from which it's read back when it's
+written (from a decompressed temporary copy, if the metadata is compressed).
+"""
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import tempfile
+
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import compression, open_file
+
+
+class JoinError(Exception):
+    pass
+
+
+class _Lines:
+    """
+    Iterates over the lines of the binary file *fh* as str (e.g. for a
+    csv.reader), keeping track of the byte offset of the next line, and copying
+    each line to *copy_to* (if given).
+    """
+    def __init__(self, fh, copy_to=None):
+        self.fh = fh
+        self.copy_to = copy_to
+        self.offset = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.fh.readline()
+        if not line:
+            raise StopIteration
+        if self.copy_to:
+            self.copy_to.write(line)
+        self.offset += len(line)
+        return line.decode()
+
+
+def read_columns(fname, id_column, columns=None):
+    """
+    Returns a dict of id -> [values of *columns*] from a TSV, and the names of
+    those columns. *columns* defaults to all columns other than *id_column*.
+    """
+    with open_file(fname, newline="") as fh:
+        reader = csv.reader(fh, delimiter="\t")
+        header = next(reader, [])
+        if columns is None:
+            columns = [c for c in header if c != id_column]
+        if missing := [c for c in [id_column, *columns] if c not in header]:
+            raise JoinError(f"{fname!r} is missing column(s): {', '.join(map(repr, missing))}")
+        name_idx = header.index(id_column)
+        indices = [header.index(c) for c in columns]
+        index = {}
+        for row in reader:
+            name = row[name_idx]
+            if name in index:
+                raise JoinError(f"Sequence ids must be unique, but {name!r} is duplicated in {fname!r}")
+            index[name] = [row[i] for i in indices]
+    return index, columns
+
+
+def combine(index, n_columns, other, n_other_columns):
+    """Extend the values of *index* (in place) with those of *other*, keeping the union of ids"""
+    for name, values in index.items():
+        values.extend(other.pop(name, [""] * n_other_columns))
+    for name, values in other.items():
+        index[name] = [""] * n_columns + values
+    return index
+
+
+def join(metadata, id_columns, nextclade, columns, output, sequence_stats=None):
+    """
+    Join *columns* (a list of (nextclade column, output column) pairs) from
+    *nextclade* and all the columns of the TSV *sequence_stats* (if given) onto
+    *metadata*, and write the result to *output*.
+    Returns the (number of rows written, number of metadata rows without
+    Nextclade results).
+    """
+    index, _ = read_columns(nextclade, "seqName", [src for src, _dest in columns])
+    dest_columns = [dest for _src, dest in columns]
+    if sequence_stats:
+        with open_file(sequence_stats, newline="") as fh:
+            stats_id_column = next(csv.reader(fh, delimiter="\t"), [""])[0]
+        stats, stats_columns = read_columns(sequence_stats, stats_id_column)
+        index = combine(index, len(dest_columns), stats, len(stats_columns))
+        dest_columns += stats_columns
+    empty = [""] * len(dest_columns)
+
+    with contextlib.ExitStack() as stack:
+        in_fh = stack.enter_context(open_file(metadata, "rb"))
+        if compression(metadata) or metadata == "-":
+            rows_fh = stack.enter_context(tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output))))
+            lines = _Lines(in_fh, copy_to=rows_fh)
+        else:
+            rows_fh = stack.enter_context(open(metadata, "rb"))
+            lines = _Lines(in_fh)
+        reader = csv.reader(lines, delimiter="\t")
+        header = next(reader, [])
+        try:
+            id_column = next(c for c in id_columns if c in header)
+        except StopIteration:
+            raise JoinError(f"None of the possible id columns ({', '.join(map(repr, id_columns))}) were found in {metadata!r}")
+        if id_column in dest_columns:
+            raise JoinError(f"Nextclade column can't be renamed to the metadata id column {id_column!r}")
+        id_idx = header.index(id_column)
+        offsets = {}  # metadata id -> offset of its row in rows_fh
+        while True:
+            offset = lines.offset
+            if (row := next(reader, None)) is None:
+                break
+            if not row:
+                continue
+            if row[id_idx] in offsets:
+                raise JoinError(f"Sequence ids must be unique, but {row[id_idx]!r} is duplicated in {metadata!r}")
+            offsets[row[id_idx]] = offset
+        rows_fh.flush()
+
+        def read_row(strain):
+            offset = offsets.pop(strain)
+            rows_fh.seek(offset)
+            line = rows_fh.readline()
+            if b'"' not in line:  # the csv module is only needed for quoted fields (which may span lines)
+                return line.decode().rstrip("\r\n").split("\t")
+            rows_fh.seek(offset)
+            return next(csv.reader(_Lines(rows_fh), delimiter="\t"))
+
+        # Output columns: id, nextclade columns, then the other metadata columns.
+        # Metadata columns which share a name with a nextclade column are coalesced into it.
+        shared = {dest_columns.index(c): header.index(c) for c in header if c in dest_columns}
+        rest = [i for i, c in enumerate(header) if i != id_idx and c not in dest_columns]
+        n_rows = n_unmatched = 0
+
+        def output_row(strain, values, row):
+            if row is None:
+                return [strain, *values, *([""] * len(rest))]
+            for dest_idx, src_idx in shared.items():
+                values[dest_idx] = row[src_idx] or values[dest_idx]
+            return [strain, *values, *(row[i] for i in rest)]
+
+        with open_file(output, "w", newline="") as out_fh:
+            writer = csv.writer(out_fh, delimiter="\t", lineterminator="\n")
+            writer.writerow([id_column, *dest_columns, *(header[i] for i in rest)])
+            # Nextclade rows (with metadata, if any), in Nextclade order
+            for strain, values in index.items():
+                writer.writerow(output_row(strain, values, read_row(strain) if strain in offsets else None))
+                n_rows += 1
+            # then metadata rows without Nextclade results, in metadata order
+            for strain in list(offsets):
+                writer.writerow(output_row(strain, list(empty), read_row(strain)))
+                n_rows += 1
+                n_unmatched += 1
+
+    return n_rows, n_unmatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metadata", required=True, help="Metadata TSV")
+    parser.add_argument("--metadata-id-columns", nargs="+", default=["accession"], help="ID columns in Metadata TSV")
+    parser.add_argument("--nextclade", required=True, help="Nextclade TSV")
+    parser.add_argument("--columns", nargs="+", required=True, metavar="NEXTCLADE_COLUMN=OUTPUT_COLUMN",
+                        help="Nextclade columns to add, and the names to give them")
+    parser.add_argument("--sequence-stats", required=False,
+                        help="TSV of per-sequence statistics to add (all columns, matched on its first column)")
+    parser.add_argument("--output", required=True, help="Metadata TSV output")
+    args = parser.parse_args()
+
+    if bad := [c for c in args.columns if "=" not in c]:
+        parser.error(f"--columns must be of the form NEXTCLADE_COLUMN=OUTPUT_COLUMN, not {', '.join(bad)}")
+    columns = [tuple(c.split("=", 1)) for c in args.columns]
+    instrument.start()
+
+    try:
+        with instrument.phase("join"):
+            n_rows, n_unmatched = join(args.metadata, args.metadata_id_columns, args.nextclade, columns, args.output,
+                                       sequence_stats=args.sequence_stats)
+    except JoinError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
+    instrument.count("records_out", n_rows)
+    print(f"Wrote {n_rows} rows to {args.output!r} ({n_unmatched} metadata rows had no Nextclade results)")
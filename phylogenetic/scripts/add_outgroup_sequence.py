@@ -0,0 +1,55 @@
+"""
+Appends one or more outgroup FASTA files to an alignment, streaming each record
+straight through to the output. All sequences (incl. the outgroups) must be the
+same length and have unique names; as the output is written while reading, a
+violation is an error and the (partial) output should be discarded.
+
+Outgroup sequences don't need corresponding metadata as they are intended to be
+removed by either `augur refine` or the `reroot_tree` rule.
+"""
+import argparse
+import sys
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from alignment_store import read_fasta
+
+import instrument
+from file_io import open_file
+
+
+def append_outgroups(fnames, output):
+    """Write the records of *fnames* (in order) to the FASTA *output*, returning
+    the number of records written. Raises a ValueError for a duplicated name or
+    a sequence whose length differs from the first."""
+    seen = set()
+    length = None
+    with open_file(output, "wb") as fh:
+        for fname in fnames:
+            for name, seq in read_fasta(fname):
+                if name in seen:
+                    raise ValueError(f"Sequence names (incl. outgroup) must be unique, but {name!r} (in {fname!r}) is duplicated")
+                if length is None:
+                    length = len(seq)
+                elif len(seq) != length:
+                    raise ValueError(f"Sequences (incl. outgroup) must all be the same length, but {name!r} (in {fname!r}) "
+                                     f"has length {len(seq)} (expected {length})")
+                seen.add(name)
+                fh.write(b">%s\n%s\n" % (name.encode(), seq))
+    return len(seen)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", required=True, help="Aligned FASTA")
+    parser.add_argument("--outgroup", required=True, nargs="+", help="Aligned FASTA(s) of outgroup sequences")
+    parser.add_argument("--output", required=True, help="Aligned FASTA output")
+    args = parser.parse_args()
+    instrument.start()
+
+    try:
+        with instrument.phase("append"):
+            n = append_outgroups([args.sequences, *args.outgroup], args.output)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
+    instrument.count("records_out", n)
+    print(f"Wrote {n} sequences (incl. outgroup) to {args.output!r}")
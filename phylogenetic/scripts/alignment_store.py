@@ -0,0 +1,259 @@
+"""
+A packed, memory-mappable store for (whole-genome) alignments, so that our own
+steps can work on alignments as a NumPy matrix rather than re-parsing FASTA.
+The workflow itself streams FASTA (each of its steps reads an alignment once, in
+order, so there's nothing to gain from a store), but `mask.py` also reads stores,
+and stores allow random access to sequences & columns for ad-hoc analyses.
+
+A store is a pair of files:
+
+  <path>        an `.npy` uint8 matrix with one row per sequence. Unpacked stores
+                hold the raw (ASCII) bytes of each sequence. Packed stores hold
+                two 4-bit codes (see ALPHABET) per byte, halving the size, but
+                can only contain nucleotide IUPAC characters & gaps (case is not
+                preserved).
+  <path>.json   the sequence names (in row order), the alignment length and
+                whether the matrix is packed.
+
+Importing makes a single pass through the FASTA(s), appending each block of rows
+to the matrix as it's read (the `.npy` header, with the number of rows, is written
+at the end), so memory use doesn't grow with the size of the alignment. Sequences
+must all be the same length and names must be unique.
+
+    python alignment_store.py import --fasta aligned.fasta outgroup.fasta --output aligned.npy [--packed]
+    python alignment_store.py export --store aligned.npy --output aligned.fasta
+    python alignment_store.py info --store aligned.npy
+
+and from Python:
+
+    store = AlignmentStore("aligned.npy")
+    store["strain_a"]                # a row (as an ASCII uint8 array)
+    store[["strain_a", 3], 100:200]  # rows (by name or index) x columns
+    store.sequence("strain_a")       # a row as a str
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
+# The 16 characters a packed store can hold. Gap must be code 0 (a zero-filled
+# row is all gaps).
+ALPHABET = b"-ACGTRYSWKMBDHVN"
+
+_ENCODE = np.full(256, 255, dtype=np.uint8)
+for _code, _char in enumerate(ALPHABET):
+    _ENCODE[_char] = _code
+    _ENCODE[ord(chr(_char).lower())] = _code
+_DECODE = np.frombuffer(ALPHABET, dtype=np.uint8)
+
+DEFAULT_BLOCK_ROWS = 256
+
+# Bytes reserved for the `.npy` header while importing, which is enough for any
+# shape and keeps the matrix 64-byte aligned
+HEADER_SIZE = 128
+
+
+class AlignmentError(Exception):
+    pass
+
+
+def meta_path(path):
+    return path + ".json"
+
+
+def npy_header(shape):
+    """A version 1.0 `.npy` header for a uint8 matrix of *shape*, padded to HEADER_SIZE bytes"""
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)), "fortran_order": False, "shape": shape})
+    prefix = np.lib.format.magic(1, 0) + (HEADER_SIZE - 10).to_bytes(2, "little")
+    return prefix + header.encode().ljust(HEADER_SIZE - len(prefix) - 1) + b"\n"
+
+
+def pack(ascii_rows):
+    """Pack a 2D uint8 matrix of ASCII characters into 4-bit codes (two per byte)"""
+    codes = _ENCODE[ascii_rows]
+    if (codes == 255).any():
+        bad = sorted({chr(c) for c in np.unique(ascii_rows[codes == 255])})
+        raise AlignmentError(f"Characters {bad} can't be stored in a packed alignment (allowed: {ALPHABET.decode()})")
+    if codes.shape[1] % 2:
+        codes = np.pad(codes, ((0, 0), (0, 1)))
+    return (codes[:, 0::2] << 4) | codes[:, 1::2]
+
+
+def unpack(packed_rows, start, stop):
+    """Unpack columns [start, stop) of the alignment from the packed bytes
+    covering them (i.e. packed columns start//2 .. (stop+1)//2)"""
+    codes = np.empty((packed_rows.shape[0], packed_rows.shape[1] * 2), dtype=np.uint8)
+    codes[:, 0::2] = packed_rows >> 4
+    codes[:, 1::2] = packed_rows & 0x0F
+    offset = start - (start // 2) * 2
+    return _DECODE[codes[:, offset:offset + stop - start]]
+
+
+def read_fasta(fname, full_header=False):
+    """Yield (name, sequence bytes) for each record of a (possibly compressed)
+    FASTA file. The name is the header up to the first whitespace, as per
+    Bio.SeqIO's `record.name`, or with *full_header* the whole header line (as
+    Nextclade names sequences)."""
+    name, chunks = None, []
+    with open_file(fname, "rb") as fh:
+        for line in fh:
+            if line.startswith(b">"):
+                if name is not None:
+                    yield name, b"".join(chunks)
+                if full_header:
+                    name = line[1:].strip().decode()
+                else:
+                    header = line[1:].split(maxsplit=1)
+                    name = header[0].decode() if header else ""
+                chunks = []
+            elif name is not None:
+                chunks.append(line.strip())
+    if name is not None:
+        yield name, b"".join(chunks)
+
+
+class AlignmentStore:
+    def __init__(self, path, mode="r"):
+        self.path = path
+        with open(meta_path(path)) as fh:
+            meta = json.load(fh)
+        self.names = meta["names"]
+        self.length = meta["length"]
+        self.packed = meta["packed"]
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+        self.matrix = np.load(path, mmap_mode=mode)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _row_indices(self, rows):
+        if isinstance(rows, (str, int, np.integer)):
+            rows = [rows]
+        if isinstance(rows, slice):
+            return rows
+        try:
+            return np.array([self.index[r] if isinstance(r, str) else r for r in rows], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"Sequence {e.args[0]!r} is not in the alignment {self.path!r}") from None
+
+    def _columns(self, cols):
+        if cols is None:
+            return 0, self.length
+        start, stop, step = cols.indices(self.length)
+        if step != 1:
+            raise ValueError("Column slices must be contiguous")
+        return start, max(start, stop)
+
+    def get(self, rows=slice(None), cols=None):
+        """Rows (a name, index, slice or list of names/indices) x columns (a
+        contiguous slice) of the alignment as an ASCII uint8 matrix"""
+        rows = self._row_indices(rows)
+        start, stop = self._columns(cols)
+        if not self.packed:
+            return np.asarray(self.matrix[rows, start:stop])
+        return unpack(np.asarray(self.matrix[rows, start // 2:(stop + 1) // 2]), start, stop)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.get(*key)
+        if isinstance(key, (str, int, np.integer)):
+            return self.get(key)[0]
+        return self.get(key)
+
+    def sequence(self, name):
+        return self.get(name)[0].tobytes().decode()
+
+    def blocks(self, block_rows=DEFAULT_BLOCK_ROWS):
+        """Yield (names, ASCII uint8 matrix) for consecutive blocks of rows"""
+        for start in range(0, len(self), block_rows):
+            stop = min(start + block_rows, len(self))
+            yield self.names[start:stop], self.get(slice(start, stop))
+
+    def to_fasta(self, fname, block_rows=DEFAULT_BLOCK_ROWS):
+        """Write the alignment as (unwrapped) FASTA, one block of rows at a time"""
+        with open_file(fname, "wb") as fh:
+            for names, rows in self.blocks(block_rows):
+                fh.write(b"".join(b">%s\n%s\n" % (name.encode(), row.tobytes()) for name, row in zip(names, rows)))
+
+
+def import_fasta(fnames, output, packed=False, block_rows=DEFAULT_BLOCK_ROWS):
+    """Import the records of the FASTA files *fnames* (in order) into a new store"""
+    names, seen, length = [], set(), None
+    block = []
+    try:
+        with open(output, "wb") as fh:
+            fh.write(npy_header((0, 0)))
+
+            def flush():
+                if block:
+                    rows = np.frombuffer(b"".join(block), dtype=np.uint8).reshape(len(block), length)
+                    fh.write((pack(rows) if packed else rows).tobytes())
+                    block.clear()
+
+            for fname in fnames:
+                for name, seq in read_fasta(fname):
+                    if name in seen:
+                        raise AlignmentError(f"Sequence names must be unique, but {name!r} (in {fname!r}) is duplicated")
+                    if length is None:
+                        length = len(seq)
+                    elif len(seq) != length:
+                        raise AlignmentError(f"Sequences must all be the same length, but {name!r} (in {fname!r}) "
+                                             f"has length {len(seq)} (expected {length})")
+                    seen.add(name)
+                    names.append(name)
+                    block.append(seq)
+                    if len(block) == block_rows:
+                        flush()
+            flush()
+            length = length or 0
+            fh.seek(0)
+            fh.write(npy_header((len(names), (length + 1) // 2 if packed else length)))
+    except BaseException:
+        os.unlink(output)
+        raise
+    with open(meta_path(output), "w") as fh:
+        json.dump({"names": names, "length": length, "packed": packed}, fh)
+    return AlignmentStore(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import FASTA file(s) into a new store")
+    import_parser.add_argument("--fasta", nargs="+", required=True, help="Aligned FASTA file(s), concatenated in order")
+    import_parser.add_argument("--output", required=True, help="Store (.npy) to create")
+    import_parser.add_argument("--packed", action="store_true", help="Store 4-bit codes rather than ASCII bytes")
+
+    export_parser = subparsers.add_parser("export", help="Write a store as FASTA")
+    export_parser.add_argument("--store", required=True, help="Store (.npy)")
+    export_parser.add_argument("--output", required=True, help="FASTA output")
+
+    info_parser = subparsers.add_parser("info", help="Summarise a store")
+    info_parser.add_argument("--store", required=True, help="Store (.npy)")
+
+    args = parser.parse_args()
+    instrument.start()
+
+    try:
+        if args.command == "import":
+            with instrument.phase("import"):
+                store = import_fasta(args.fasta, args.output, packed=args.packed)
+            instrument.count("records_out", len(store))
+            print(f"Imported {len(store)} sequences of length {store.length} into {args.output!r}")
+        elif args.command == "export":
+            with instrument.phase("export"):
+                store = AlignmentStore(args.store)
+                store.to_fasta(args.output)
+            instrument.count("records_out", len(store))
+        elif args.command == "info":
+            store = AlignmentStore(args.store)
+            print(f"{args.store}: {len(store)} sequences, length {store.length}, {'packed' if store.packed else 'unpacked'}")
+    except AlignmentError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
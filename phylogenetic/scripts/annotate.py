@@ -0,0 +1,133 @@
+"""
+Runs any combination of our node-data annotators for a build, reading each of
+the metadata TSV, the tree and the `augur ancestral` node-data JSON at most once:
+
+  --sampling-year     the sampling year of each strain (see `get_year.py`)
+  --label-outbreaks   the outbreak each node belongs to (see `label_outbreaks.py`)
+  --count-mutations   per-branch and, optionally, cumulative mutation counts
+                      (see `collect-mutations.py`)
+
+The results are combined into a single node-data JSON. The auspice-config
+colorings produced by the annotators (currently only the sampling year) are
+written to --output-config, which is always written (possibly with no colorings)
+so it can be a fixed workflow output.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from get_year import sampling_years, year_colorings
+from label_outbreaks import label_outbreaks, print_suggested_colours
+from metadata_columns import read_metadata_columns
+
+import instrument
+from file_io import open_file
+
+# collect-mutations.py isn't a valid module name, so it can't be imported directly
+_spec = importlib.util.spec_from_file_location(
+    "collect_mutations", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collect-mutations.py"))
+collect_mutations = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(collect_mutations)
+
+
+def merge_node_data(node_data, addition):
+    """Merge the *addition* node-data dict into *node_data* (in-place)"""
+    for section, entries in addition.items():
+        target = node_data.setdefault(section, {})
+        for name, attrs in entries.items():
+            if name in target:
+                target[name].update(attrs)
+            else:
+                target[name] = attrs
+    return node_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metadata", required=False, help="Metadata TSV")
+    parser.add_argument("--id-columns", nargs="+", help="ID columns in Metadata TSV", default=['accession'])
+    parser.add_argument("--tree", required=False, help="Newick")
+    parser.add_argument("--muts", required=False, help="Node Data JSON from `augur ancestral`")
+
+    parser.add_argument("--sampling-year", action="store_true", help="Annotate sampling years (requires --metadata)")
+    parser.add_argument("--label-outbreaks", action="store_true", help="Label outbreaks (requires --metadata & --tree)")
+    parser.add_argument("--count-mutations", action="store_true", help="Count mutations (requires --muts)")
+
+    parser.add_argument("--cds", required=False, nargs="+", help="CDS/genes to count amino-acid mutations for")
+    parser.add_argument("--counts", required=False,
+                        help="Comma-separated inclusive ranges to bin mutation counts into, e.g. '0,1-5,6+'")
+    parser.add_argument("--cumulative", action="store_true",
+                        help="Also count mutations cumulatively from the root (requires --tree)")
+    parser.add_argument("--from-outbreak", action="store_true",
+                        help="Also count mutations cumulatively from outbreak MRCAs (requires --label-outbreaks)")
+    parser.add_argument("--cumulative-counts", required=False,
+                        help="Comma-separated inclusive ranges to bin cumulative counts into (default: same as --counts)")
+
+    parser.add_argument("--output", required=True, help="Node Data JSON output")
+    parser.add_argument("--output-config", required=False, help="JSON coloring entries for an auspice-config JSON")
+    args = parser.parse_args()
+
+    if (args.sampling_year or args.label_outbreaks) and not args.metadata:
+        parser.error("--sampling-year and --label-outbreaks require --metadata")
+    if (args.label_outbreaks or args.cumulative or args.from_outbreak) and not args.tree:
+        parser.error("--label-outbreaks, --cumulative and --from-outbreak require --tree")
+    if args.count_mutations and not args.muts:
+        parser.error("--count-mutations requires --muts")
+    if args.from_outbreak and not args.label_outbreaks:
+        parser.error("--from-outbreak requires --label-outbreaks")
+    instrument.start()
+
+    m = None
+    if args.metadata:
+        columns = [*(['date'] if args.sampling_year else []), *(['outbreak'] if args.label_outbreaks else [])]
+        with instrument.phase("read_metadata"):
+            m = read_metadata_columns(args.metadata, columns, id_columns=args.id_columns)
+        instrument.count("records_in", len(m))
+    T = None
+    if args.tree:
+        from Bio import Phylo
+        with instrument.phase("read_tree"):
+            T = Phylo.read(args.tree, "newick")
+
+    node_data = {"nodes": {}}
+    colorings = []
+
+    if args.sampling_year:
+        with instrument.phase("sampling_year"):
+            nodes = sampling_years(m)
+        merge_node_data(node_data, {"nodes": nodes})
+        colorings.extend(year_colorings(sorted({x['year'] for x in nodes.values()}))['colorings'])
+
+    mrcas = None
+    if args.label_outbreaks:
+        with instrument.phase("label_outbreaks"):
+            nodes, branches, outbreaks_nextclade, outbreaks_geo = label_outbreaks(T, m)
+        merge_node_data(node_data, {"nodes": nodes, "branches": branches})
+        print_suggested_colours(outbreaks_nextclade, outbreaks_geo)
+        mrcas = collect_mutations.outbreak_mrcas(branches) if args.from_outbreak else None
+
+    if args.count_mutations:
+        ranges = collect_mutations.parse_counts(args.counts) if args.counts else None
+        with instrument.phase("count_mutations"), open_file(args.muts) as fh:
+            nodes = collect_mutations.JSONObjectStream(fh).items('nodes')
+            if args.cumulative or args.from_outbreak:
+                node_counts = {name: collect_mutations.node_mutation_counts(node, args.cds) for name, node in nodes}
+                cumulative_ranges = collect_mutations.parse_counts(args.cumulative_counts) if args.cumulative_counts else ranges
+                fmt = collect_mutations.formatter(ranges)
+                keys = collect_mutations.count_keys(args.cds)
+                counts = {name: dict(zip(keys, map(fmt, values))) for name, values in node_counts.items()}
+                cumulative = collect_mutations.cumulative_annotations(
+                    node_counts, args.cds, T, cumulative_ranges, mrcas, from_root=args.cumulative)
+                merge_node_data(node_data, {"nodes": counts})
+                merge_node_data(node_data, {"nodes": cumulative})
+            else:
+                merge_node_data(node_data, {"nodes": dict(collect_mutations.iter_counts(nodes, args.cds, ranges))})
+
+    with instrument.phase("write"), open_file(args.output, 'w') as fh:
+        json.dump(node_data, fh)
+    instrument.count("records_out", len(node_data["nodes"]))
+
+    if args.output_config:
+        with open_file(args.output_config, 'w') as fh:
+            json.dump({"colorings": colorings}, fh, indent=2)
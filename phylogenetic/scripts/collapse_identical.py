@@ -0,0 +1,170 @@
+"""
+Collapses identical sequences before tree building and re-expands them afterwards,
+so that tree inference scales with the number of distinct haplotypes rather than
+the number of samples.
+
+    collapse  writes one representative sequence per group of identical sequences,
+              plus a TSV mapping every strain to its representative. Sequences are
+              grouped by a hash of their bytes. With --ignore-ambiguous, groups are
+              then merged when they only differ at sites where one of them is N or
+              a gap; representatives are chosen greedily, most complete first.
+              Strains given via --keep (e.g. outgroup / rerooting strains) are never
+              collapsed.
+
+    expand    turns each representative tip of a tree into a zero-length polytomy
+              of all the strains it represents.
+"""
+import argparse
+import csv
+import hashlib
+import sys
+import numpy as np
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from alignment_store import read_fasta
+
+import instrument
+from file_io import open_file
+
+AMBIGUOUS = np.zeros(256, dtype=bool)
+AMBIGUOUS[[ord("N"), ord("n"), ord("-")]] = True
+
+COLUMN_CHUNK = 1024
+
+
+def exact_groups(records, keep=()):
+    """
+    Group (name, sequence bytes) *records* by identical sequence. Returns a dict
+    of representative name (the first strain seen) to (sequence, [member names])
+    in input order. Strains in *keep* always form their own group.
+    """
+    keep = set(keep)
+    groups = {}
+    by_hash = {}
+    for name, seq in records:
+        if name in keep:
+            groups[name] = (seq, [name])
+            continue
+        digest = hashlib.blake2b(seq, digest_size=16).digest()
+        if (rep := by_hash.get(digest)) is not None:
+            groups[rep][1].append(name)
+        else:
+            by_hash[digest] = name
+            groups[name] = (seq, [name])
+    return groups
+
+
+def merge_ambiguous(groups, keep=()):
+    """
+    Merge *groups* (see `exact_groups`) whose sequences differ only at sites where
+    one of them is ambiguous (N or gap). Groups are considered in order of
+    decreasing completeness, and each joins the first compatible representative.
+    """
+    keep = set(keep)
+    names = [name for name in groups if name not in keep]
+    if not names:
+        return groups
+    matrix = np.frombuffer(b"".join(groups[name][0] for name in names), dtype=np.uint8).reshape(len(names), -1)
+    ambiguous = AMBIGUOUS[matrix]
+    order = np.argsort(ambiguous.sum(axis=1), kind="stable")
+
+    reps = []  # indices (into `names`) of representatives
+    merged = {name: groups[name] for name in groups if name in keep}
+    for idx in order:
+        candidates = np.array(reps, dtype=np.intp)
+        informative = ~ambiguous[idx]
+        # compare a chunk of columns at a time, dropping representatives as soon as they differ
+        for start in range(0, matrix.shape[1], COLUMN_CHUNK):
+            if not len(candidates):
+                break
+            cols = slice(start, start + COLUMN_CHUNK)
+            compatible = (matrix[candidates, cols] == matrix[idx, cols]) | ambiguous[candidates, cols] | ~informative[cols]
+            candidates = candidates[compatible.all(axis=1)]
+        if len(candidates):
+            merged[names[candidates[0]]][1].extend(groups[names[idx]][1])
+        else:
+            reps.append(idx)
+            merged[names[idx]] = groups[names[idx]]
+    # restore input order
+    return {name: merged[name] for name in groups if name in merged}
+
+
+def collapse(fname, output, output_map, keep=(), ignore_ambiguous=False):
+    groups = exact_groups(read_fasta(fname), keep)
+    if ignore_ambiguous:
+        groups = merge_ambiguous(groups, keep)
+    with open_file(output, "wb") as fh:
+        for rep, (seq, _members) in groups.items():
+            fh.write(b">%s\n%s\n" % (rep.encode(), seq))
+    with open_file(output_map, "w", newline="") as fh:
+        writer = csv.writer(fh, delimiter="\t", lineterminator="\n")
+        writer.writerow(["strain", "representative"])
+        for rep, (_seq, members) in groups.items():
+            writer.writerows([member, rep] for member in members)
+    return groups
+
+
+def read_map(fname):
+    """Map of representative to all the strains it represents (incl. itself)"""
+    members = {}
+    with open_file(fname, newline="") as fh:
+        for row in csv.DictReader(fh, delimiter="\t"):
+            members.setdefault(row["representative"], []).append(row["strain"])
+    return members
+
+
+def expand(tree, members):
+    """Replace (in-place) each representative tip of *tree* with a zero-length
+    polytomy of the strains it represents. Returns the number of tips added."""
+    from Bio.Phylo.BaseTree import Clade
+    added = 0
+    for tip in tree.get_terminals():
+        strains = members.get(tip.name, [])
+        if len(strains) < 2:
+            continue
+        tip.clades = [Clade(name=strain, branch_length=0.0) for strain in strains]
+        tip.name = None
+        added += len(strains) - 1
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    collapse_parser = subparsers.add_parser("collapse", help="Collapse identical sequences")
+    collapse_parser.add_argument("--alignment", required=True, help="Aligned FASTA")
+    collapse_parser.add_argument("--keep", nargs="+", default=[], help="Strains which should never be collapsed")
+    collapse_parser.add_argument("--ignore-ambiguous", action="store_true",
+                                 help="Also collapse sequences which only differ at N or gap sites")
+    collapse_parser.add_argument("--output", required=True, help="Aligned FASTA of representative sequences")
+    collapse_parser.add_argument("--output-map", required=True, help="TSV of strain -> representative")
+
+    expand_parser = subparsers.add_parser("expand", help="Re-expand collapsed strains in a tree")
+    expand_parser.add_argument("--tree", required=True, help="Newick tree of representatives")
+    expand_parser.add_argument("--map", required=True, help="TSV of strain -> representative (from `collapse`)")
+    expand_parser.add_argument("--output", required=True, help="Newick output")
+
+    args = parser.parse_args()
+    instrument.start()
+
+    if args.command == "collapse":
+        with instrument.phase("collapse"):
+            groups = collapse(args.alignment, args.output, args.output_map, keep=args.keep, ignore_ambiguous=args.ignore_ambiguous)
+        n_strains = sum(len(members) for _seq, members in groups.values())
+        instrument.count("records_in", n_strains)
+        instrument.count("records_out", len(groups))
+        print(f"Collapsed {n_strains} sequences into {len(groups)} representatives")
+    else:
+        from Bio import Phylo
+        with instrument.phase("read"):
+            T = Phylo.read(args.tree, "newick")
+            members = read_map(args.map)
+        if missing := sorted(set(members) - {tip.name for tip in T.get_terminals()}):
+            print(f"ERROR: representatives missing from the tree: {', '.join(missing)}", file=sys.stderr)
+            sys.exit(2)
+        with instrument.phase("expand"):
+            n_added = expand(T, members)
+        print(f"Added {n_added} collapsed strains back into the tree")
+        with instrument.phase("write"):
+            Phylo.write(T, args.output, "newick")
+        instrument.count("records_out", T.count_terminals())
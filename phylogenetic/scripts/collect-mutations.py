@@ -5,11 +5,30 @@ the number of amino-acid mutations (`{cds}_mut_count`), as integer strings.
 
 When `--counts` is supplied the raw counts are instead binned into the provided
 inclusive ranges and the matching range label is emitted (e.g. "0", "1-5", "6+").
+
+When `--tree` is supplied the cumulative counts along the path from the root to
+each node are also emitted (`nuc_mut_count_from_root`, `{cds}_mut_count_from_root`).
+If an `--outbreaks` node-data JSON (from `label_outbreaks.py`) is also supplied
+then counts from the MRCA of each node's outbreak are emitted as well
+(`nuc_mut_count_from_outbreak`, `{cds}_mut_count_from_outbreak`), excluding
+the mutations on the branch leading to that MRCA. These are computed with a
+single prefix-sum down the tree over per-node count arrays. Cumulative counts are
+binned by `--cumulative-counts`, which defaults to the `--counts` ranges.
+
+The input JSON is read incrementally, one node at a time, and the output JSON is
+written as each node is counted, so memory use doesn't scale with the size of
+the `augur ancestral` output (which can include full sequences for every node).
 """
 import json
 import argparse
 import re
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
 
 def parse_counts(spec):
     """Parse a comma-separated list of inclusive ranges into ordered
@@ -50,16 +69,215 @@ def bin_count(n, ranges):
     raise ValueError(f"Count {n} does not fall within any --counts range")
 
 
+def node_mutation_counts(node, cds):
+    """Raw counts of the nucleotide mutations and then the amino-acid mutations
+    in each of *cds* on the branch leading to *node*"""
+    aa_muts = node.get('aa_muts', {})
+    return [len(node.get('muts', [])), *(len(aa_muts.get(gene, [])) for gene in cds or [])]
+
+
+def count_keys(cds, suffix=''):
+    return [f'nuc_mut_count{suffix}', *(f'{gene}_mut_count{suffix}' for gene in cds or [])]
+
+
+def formatter(ranges):
+    return (lambda n: bin_count(int(n), ranges)) if ranges else (lambda n: str(int(n)))
+
+
+def iter_counts(nodes, cds, ranges):
+    """Yields (name, counts) for each (name, node) pair in *nodes*"""
+    fmt = formatter(ranges)
+    keys = count_keys(cds)
+    for name, node in nodes:
+        yield name, dict(zip(keys, map(fmt, node_mutation_counts(node, cds))))
+
+
 def count_mutations(nodes, cds, ranges):
-    fmt = (lambda n: bin_count(n, ranges)) if ranges else str
-    counts = {}
-    for name, node in nodes.items():
-        aa_muts = node.get('aa_muts', {})
-        node_counts = {'nuc_mut_count': fmt(len(node.get('muts', [])))}
-        for gene in cds or []:
-            node_counts[f'{gene}_mut_count'] = fmt(len(aa_muts.get(gene, [])))
-        counts[name] = node_counts
-    return counts
+    return dict(iter_counts(nodes.items(), cds, ranges))
+
+
+def tree_arrays(tree):
+    """
+    Returns (names, parents, depths) for the nodes of the (Bio.Phylo) tree in
+    preorder, where parents[i] is the index of node i's parent (-1 for the root)
+    and depths[i] is the number of branches between node i and the root.
+    """
+    import numpy as np
+    names, parents, depths = [], [], []
+    stack = [(tree.root, -1, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        index = len(names)
+        names.append(node.name)
+        parents.append(parent)
+        depths.append(depth)
+        stack.extend((child, index, depth+1) for child in reversed(node.clades))
+    return names, np.array(parents), np.array(depths)
+
+
+def levels(depths):
+    """Indices of the nodes at each depth (from the root downwards), excluding the root"""
+    import numpy as np
+    order = np.argsort(depths, kind='stable')
+    return np.split(order, np.flatnonzero(np.diff(depths[order])) + 1)[1:]
+
+
+def cumulative_counts(counts, parents, depths):
+    """
+    Sum the (n_nodes, k) *counts* array from the root down to each node. As
+    parents are always at the previous depth each level is a single vectorised
+    addition, so the total work is linear in the size of the tree.
+    """
+    cumulative = counts.copy()
+    for level in levels(depths):
+        cumulative[level] += cumulative[parents[level]]
+    return cumulative
+
+
+def nearest_marked_ancestor(marked, parents, depths):
+    """For each node the index of the closest node (itself included) on the path
+    to the root for which *marked* is True, or -1 if there isn't one"""
+    import numpy as np
+    ancestor = np.where(marked, np.arange(len(marked)), -1)
+    for level in levels(depths):
+        unset = level[ancestor[level] == -1]
+        ancestor[unset] = ancestor[parents[unset]]
+    return ancestor
+
+
+def outbreak_mrcas(branches):
+    """Names of the nodes labelled as an outbreak's MRCA in the node-data
+    *branches* produced by `label_outbreaks.py`"""
+    return {name for name, info in branches.items() if 'outbreak' in info.get('labels', {})}
+
+
+def cumulative_annotations(node_counts, cds, tree, ranges, mrcas=None, from_root=True):
+    """
+    Returns {name: {key: value}} of cumulative counts from the root (unless
+    *from_root* is False) and from the closest of the *mrcas* (if provided) for
+    each node in the tree.
+    *node_counts* maps node names to their (raw) `node_mutation_counts`; nodes
+    which aren't present are treated as having no mutations.
+    """
+    import numpy as np
+    names, parents, depths = tree_arrays(tree)
+    zeros = [0] * (1 + len(cds or []))
+    counts = np.array([node_counts.get(name, zeros) for name in names], dtype=np.int64)
+    cumulative = cumulative_counts(counts, parents, depths)
+
+    fmt = formatter(ranges)
+    root_keys = count_keys(cds, '_from_root')
+    annotations = {name: (dict(zip(root_keys, map(fmt, row))) if from_root else {}) for name, row in zip(names, cumulative)}
+
+    if mrcas is not None:
+        marked = np.array([name in mrcas for name in names], dtype=bool)
+        ancestor = nearest_marked_ancestor(marked, parents, depths)
+        outbreak_keys = count_keys(cds, '_from_outbreak')
+        for i in np.flatnonzero(ancestor >= 0):
+            from_mrca = cumulative[i] - cumulative[ancestor[i]]
+            annotations[names[i]].update(zip(outbreak_keys, map(fmt, from_mrca)))
+    return annotations
+
+
+class JSONObjectStream:
+    """
+    Incrementally decodes a JSON object from a file handle, one member at a
+    time, without holding the whole document in memory. Only the structural
+    tokens of the object(s) being iterated are scanned here; each member value
+    is decoded by the standard library's (C-accelerated) decoder as soon as
+    it's entirely within the buffer.
+    """
+    def __init__(self, fh, chunk_size=1<<20):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Read at least as much as we're currently holding, so that repeatedly
+        # re-trying to decode a large value is linear rather than quadratic
+        chunk = self.fh.read(max(self.chunk_size, len(self.buf) - self.pos))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+
+    def _peek(self):
+        """Skip whitespace and return the next character ('' at EOF)"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos+1]
+            self._fill()
+
+    def _expect(self, *chars):
+        char = self._peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buf, self.pos)
+        self.pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            if end == len(self.buf) and not self.eof:
+                # a number at the end of the buffer may be truncated
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def _members(self):
+        """Yield the keys of the object starting at the current position. The
+        caller must consume each member's value before requesting the next key."""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expected an object key", self.buf, self.pos)
+            self._expect(':')
+            yield key
+            if self._expect(',', '}') == '}':
+                return
+
+    def items(self, key):
+        """Yields (name, value) pairs for each member of the top-level *key* object.
+        All other top-level members are decoded and discarded."""
+        found = False
+        for top_level_key in self._members():
+            if top_level_key != key or found:
+                self._value()
+                continue
+            found = True
+            for name in self._members():
+                yield name, self._value()
+        if not found:
+            raise KeyError(f"JSON has no top-level {key!r} key")
+
+
+def write_node_data(items, fh):
+    """
+    Writes (name, attrs) pairs as a node-data JSON ({"nodes": {name: attrs}})
+    as they are produced. The output is identical to `json.dump(..., indent=2)`.
+    """
+    fh.write('{\n  "nodes": {')
+    first = True
+    for name, attrs in items:
+        value = json.dumps(attrs, indent=2).replace('\n', '\n    ')
+        fh.write(f'{"" if first else ","}\n    {json.dumps(name)}: {value}')
+        first = False
+    fh.write('}\n}' if first else '\n  }\n}')
 
 
 if __name__ == "__main__":
@@ -68,14 +286,47 @@ if __name__ == "__main__":
     parser.add_argument("--cds", required=False, nargs="+", help="CDS/genes to count amino-acid mutations for")
     parser.add_argument("--counts", required=False,
                         help="Comma-separated inclusive ranges to bin counts into, e.g. '0,1-5,6+'")
+    parser.add_argument("--tree", required=False, help="Newick tree (from `augur refine`). Enables cumulative counts.")
+    parser.add_argument("--outbreaks", required=False,
+                        help="Node Data JSON from `label_outbreaks.py`. Enables cumulative counts from outbreak MRCAs (requires --tree).")
+    parser.add_argument("--cumulative-counts", required=False,
+                        help="Comma-separated inclusive ranges to bin cumulative counts into (default: same as --counts)")
     parser.add_argument("--output", required=True, help="Node Data JSON output")
 
     args = parser.parse_args()
+    if args.outbreaks and not args.tree:
+        parser.error("--outbreaks requires --tree")
+    instrument.start()
 
     ranges = parse_counts(args.counts) if args.counts else None
+    cumulative_ranges = parse_counts(args.cumulative_counts) if args.cumulative_counts else ranges
 
-    with open(args.muts) as fh:
-        nodes = json.load(fh)['nodes']
-
-    with open(args.output, 'w') as fh:
-        json.dump({"nodes": count_mutations(nodes, args.cds, ranges)}, fh, indent=2)
+    with open_file(args.muts) as muts_fh, open_file(args.output, 'w') as fh:
+        nodes = JSONObjectStream(muts_fh).items('nodes')
+        if not args.tree:
+            # Reading, counting and writing are interleaved, so can't be told apart
+            with instrument.phase("count"):
+                write_node_data(iter_counts(nodes, args.cds, ranges), fh)
+        else:
+            # Only the raw integer counts are kept for each node, not the nodes themselves
+            with instrument.phase("count"):
+                node_counts = {name: node_mutation_counts(node, args.cds) for name, node in nodes}
+            instrument.count("records_in", len(node_counts))
+            from Bio import Phylo
+            with instrument.phase("read_tree"):
+                tree = Phylo.read(args.tree, "newick")
+            mrcas = None
+            if args.outbreaks:
+                with open_file(args.outbreaks) as outbreaks_fh:
+                    mrcas = outbreak_mrcas(json.load(outbreaks_fh).get('branches', {}))
+            with instrument.phase("cumulative"):
+                cumulative = cumulative_annotations(node_counts, args.cds, tree, cumulative_ranges, mrcas)
+            fmt = formatter(ranges)
+            keys = count_keys(args.cds)
+            with instrument.phase("write"):
+                write_node_data(
+                    ((name, {**dict(zip(keys, map(fmt, values))), **cumulative.get(name, {})})
+                     for name, values in node_counts.items()),
+                    fh,
+                )
+            instrument.count("records_out", len(node_counts))
@@ -47,6 +47,10 @@ import sys
 from collections import defaultdict
 from pathlib import Path
 
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+from file_io import open_file
+
 REPO_ROOT = Path(__file__).resolve().parents[2]
 DEFAULT_LAT_LONGS = REPO_ROOT / "phylogenetic" / "defaults" / "lat_longs.tsv"
 DEFAULT_CANONICAL = REPO_ROOT / "phylogenetic" / "defaults" / "tmp-canonical-drc-geo.tsv"
@@ -133,7 +137,7 @@ def read_metadata_associations(metadata_paths):
     division_to_countries = defaultdict(set)
     location_to_pairs = defaultdict(set)
     for path in metadata_paths:
-        with open(path, encoding="utf-8", newline="") as fh:
+        with open_file(path, newline="") as fh:
             reader = csv.DictReader(fh, delimiter="\t")
             for row in reader:
                 country = (row.get("country") or "").strip()
@@ -388,10 +392,12 @@ def main():
     for path in [args.lat_longs, args.canonical, *metadata_paths]:
         if not path.is_file():
             sys.exit(f"Not a file: {path}")
+    instrument.start()
 
-    ll_coords, duplicates = read_lat_longs(args.lat_longs)
-    canonical_coords, can_div, can_loc = read_canonical(args.canonical)
-    md_div, md_loc = read_metadata_associations(metadata_paths)
+    with instrument.phase("read"):
+        ll_coords, duplicates = read_lat_longs(args.lat_longs)
+        canonical_coords, can_div, can_loc = read_canonical(args.canonical)
+        md_div, md_loc = read_metadata_associations(metadata_paths)
 
     # Canonical associations take precedence over metadata for the same place.
     def division_matches(place):
@@ -400,16 +406,17 @@ def main():
     def location_matches(place):
         return can_loc.get(place) or md_loc.get(place, set())
 
-    division_groups = assign_groups(
-        merge_resolution("division", ll_coords, canonical_coords),
-        matches_for=division_matches,
-        render=lambda country: country or UNKNOWN,
-    )
-    location_groups = assign_groups(
-        merge_resolution("location", ll_coords, canonical_coords),
-        matches_for=location_matches,
-        render=lambda pair: f"{pair[0] or UNKNOWN} / {pair[1] or UNKNOWN}",
-    )
+    with instrument.phase("group"):
+        division_groups = assign_groups(
+            merge_resolution("division", ll_coords, canonical_coords),
+            matches_for=division_matches,
+            render=lambda country: country or UNKNOWN,
+        )
+        location_groups = assign_groups(
+            merge_resolution("location", ll_coords, canonical_coords),
+            matches_for=location_matches,
+            render=lambda pair: f"{pair[0] or UNKNOWN} / {pair[1] or UNKNOWN}",
+        )
 
     def canonical_places(resolution):
         return set(canonical_coords.get(resolution, {}))
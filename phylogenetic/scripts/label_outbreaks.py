@@ -1,11 +1,14 @@
 
 import argparse
-from Bio import Phylo
-from augur.io import read_metadata
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from metadata_columns import read_metadata_columns
 import json
-from get_year import colors
+from palettes import colors
 import re
 
+import instrument
+from file_io import open_file
+
 def geographic(nextclade_outbreak: str):
     """
     Given a nextclade outbreak name (e.g. `Ebov-2013`) returns a geographic name, largely following 
@@ -42,7 +45,7 @@ def geographic(nextclade_outbreak: str):
         if relapse:
             base_info['label'] = False
         return base_info
-    print(f"\n[ERROR]Nextclade outbreak label {outbreak_nextclade} doesn't have a geographic name set in the `geo_names` dict\n\n")
+    print(f"\n[ERROR]Nextclade outbreak label {nextclade_outbreak} doesn't have a geographic name set in the `geo_names` dict\n\n")
     return {'name': nextclade_outbreak, 'label': False}
 
 
@@ -63,17 +66,14 @@ def suggest_colours(key: str, title: str, outbreaks: set[str]):
     print(f"{TAB}{TAB}}},")
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("--tree", required=True, help="Newick")
-    parser.add_argument("--metadata", required=True, help="Metadata TSV")
-    parser.add_argument("--output", required=True, help="Node Data JSON")
-    parser.add_argument("--id-columns", nargs="+", help="ID columns in Metadata TSV", default=['accession'])
-    args = parser.parse_args()
-
-    T = Phylo.read(args.tree, "newick")
-    m = read_metadata(args.metadata, id_columns=args.id_columns)
-    outbreaks = m.groupby('outbreak').apply(lambda g: g.index.tolist()).to_dict()
+def label_outbreaks(T, m):
+    """
+    Label each node of tree *T* with the outbreak (and its geographic name) of
+    the closest MRCA of an outbreak's strains in metadata *m*. Returns
+    (nodes, branches, outbreaks_nextclade, outbreaks_geo) where *nodes* and
+    *branches* are node-data dicts.
+    """
+    outbreaks = {name: strains.tolist() for name, strains in m.index.groupby(m['outbreak']).items()}
     nodes = {}
     branches = {}
     outbreaks_nextclade = set()
@@ -106,13 +106,38 @@ if __name__ == "__main__":
             if geo['label']:
                 branches[start_node.name]['labels']['outbreak_geo'] = geo['name']
 
-    with open(args.output, 'w') as fh:
-        json.dump({"nodes": nodes, "branches": branches}, fh)
+    return nodes, branches, outbreaks_nextclade, outbreaks_geo
 
-    # Suggest a colour scale for the outbreaks
+
+def print_suggested_colours(outbreaks_nextclade, outbreaks_geo):
     print("\n---- Suggested Auspice config colourings -----\n\n")
     try:
         suggest_colours("outbreak", "Outbreak (Nextclade name)", outbreaks_nextclade)
         suggest_colours("outbreak_geo", "Outbreak (Geographic name)", outbreaks_geo)
     except Exception as e:
         print("Unexpected error", e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tree", required=True, help="Newick")
+    parser.add_argument("--metadata", required=True, help="Metadata TSV")
+    parser.add_argument("--output", required=True, help="Node Data JSON")
+    parser.add_argument("--id-columns", nargs="+", help="ID columns in Metadata TSV", default=['accession'])
+    args = parser.parse_args()
+    instrument.start()
+
+    from Bio import Phylo
+    with instrument.phase("read"):
+        T = Phylo.read(args.tree, "newick")
+        m = read_metadata_columns(args.metadata, ['outbreak'], id_columns=args.id_columns)
+    instrument.count("records_in", len(m))
+    with instrument.phase("label"):
+        nodes, branches, outbreaks_nextclade, outbreaks_geo = label_outbreaks(T, m)
+
+    with instrument.phase("write"), open_file(args.output, 'w') as fh:
+        json.dump({"nodes": nodes, "branches": branches}, fh)
+    instrument.count("records_out", len(nodes))
+
+    # Suggest a colour scale for the outbreaks
+    print_suggested_colours(outbreaks_nextclade, outbreaks_geo)
@@ -0,0 +1,132 @@
+"""
+Masks an alignment, replacing masked sites with "N". This follows `augur mask`'s
+semantics for --mask-from-beginning, --mask-from-end, --mask-sites (1-based) and
+--mask (BED or augur mask files, 0-based), but builds a single column mask and
+applies it to blocks of sequences as a NumPy column assignment, rather than
+masking each record in Python.
+
+The alignment can be a FASTA file (streamed in blocks of rows) or an alignment
+store (see `alignment_store.py`), which is memory-mapped. The masked alignment is
+written as (unwrapped) FASTA, one block at a time.
+
+--output-report writes a TSV with a row per (1-based) site of the alignment: whether
+the site was masked and the fraction of sequences which are N / gaps at that site
+after masking.
+"""
+import argparse
+import sys
+import numpy as np
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from alignment_store import AlignmentError, AlignmentStore, DEFAULT_BLOCK_ROWS, read_fasta
+
+import instrument
+from file_io import open_file
+
+N = ord("N")
+GAP = ord("-")
+
+
+def column_mask(length, beginning=0, end=0, sites=()):
+    """Boolean array of the *length* alignment columns to mask. *sites* are
+    0-based; those beyond the alignment are ignored."""
+    mask = np.zeros(length, dtype=bool)
+    if beginning + end > length:
+        beginning, end = length, 0
+    mask[:beginning] = True
+    if end:
+        mask[length - end:] = True
+    sites = np.fromiter(sites, dtype=np.int64)
+    mask[sites[(sites >= 0) & (sites < length)]] = True
+    return mask
+
+
+def fasta_blocks(fname, block_rows=DEFAULT_BLOCK_ROWS):
+    """Yield (names, ASCII uint8 matrix) for blocks of records of an aligned FASTA"""
+    length = None
+    names, seqs = [], []
+    for name, seq in read_fasta(fname):
+        if length is None:
+            length = len(seq)
+        elif len(seq) != length:
+            raise AlignmentError(f"Sequences must all be the same length, but {name!r} has length {len(seq)} (expected {length})")
+        names.append(name)
+        seqs.append(seq)
+        if len(names) == block_rows:
+            yield names, np.frombuffer(b"".join(seqs), dtype=np.uint8).reshape(len(names), length)
+            names, seqs = [], []
+    if names:
+        yield names, np.frombuffer(b"".join(seqs), dtype=np.uint8).reshape(len(names), length)
+
+
+def alignment_blocks(fname, block_rows=DEFAULT_BLOCK_ROWS):
+    if fname.endswith(".npy"):
+        return AlignmentStore(fname).blocks(block_rows)
+    return fasta_blocks(fname, block_rows)
+
+
+def mask_alignment(blocks, output, beginning=0, end=0, sites=()):
+    """
+    Mask each block of *blocks* and write them to the FASTA *output*. Returns
+    (column mask, per-site N counts, per-site gap counts, number of sequences).
+    """
+    mask = n_counts = gap_counts = None
+    n_seqs = 0
+    with open_file(output, "wb") as fh:
+        for names, rows in blocks:
+            rows = np.array(rows)  # blocks may be read-only (e.g. memory-mapped)
+            if mask is None:
+                mask = column_mask(rows.shape[1], beginning, end, sites)
+                n_counts = np.zeros(rows.shape[1], dtype=np.int64)
+                gap_counts = np.zeros(rows.shape[1], dtype=np.int64)
+            rows[:, mask] = N
+            n_counts += (rows == N).sum(axis=0)
+            gap_counts += (rows == GAP).sum(axis=0)
+            n_seqs += len(names)
+            fh.write(b"".join(b">%s\n%s\n" % (name.encode(), row.tobytes()) for name, row in zip(names, rows)))
+    return mask, n_counts, gap_counts, n_seqs
+
+
+def write_report(fname, mask, n_counts, gap_counts, n_seqs):
+    with open_file(fname, "w") as fh:
+        print("position", "masked", "n_fraction", "gap_fraction", sep="\t", file=fh)
+        if mask is None:
+            return
+        denominator = max(n_seqs, 1)
+        for idx in range(len(mask)):
+            print(idx + 1, "true" if mask[idx] else "false",
+                  f"{n_counts[idx] / denominator:.4f}", f"{gap_counts[idx] / denominator:.4f}", sep="\t", file=fh)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alignment", required=True, help="Aligned FASTA or alignment store (.npy)")
+    parser.add_argument("--mask-from-beginning", type=int, default=0, help="Number of sites to mask from the beginning")
+    parser.add_argument("--mask-from-end", type=int, default=0, help="Number of sites to mask from the end")
+    parser.add_argument("--mask-sites", type=int, nargs="+", default=[], help="1-based sites to mask")
+    parser.add_argument("--mask", nargs="+", default=[], help="BED (or augur mask) files of sites to mask")
+    parser.add_argument("--output", required=True, help="Masked FASTA output")
+    parser.add_argument("--output-report", required=False, help="Per-site TSV of masking and N/gap fractions")
+    args = parser.parse_args()
+    instrument.start()
+
+    sites = {site - 1 for site in args.mask_sites}
+    if args.mask:
+        from augur.utils import load_mask_sites
+        for fname in args.mask:
+            sites.update(load_mask_sites(fname))
+
+    try:
+        with instrument.phase("mask"):
+            mask, n_counts, gap_counts, n_seqs = mask_alignment(
+                alignment_blocks(args.alignment), args.output,
+                beginning=args.mask_from_beginning, end=args.mask_from_end, sites=sorted(sites))
+    except AlignmentError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
+    instrument.count("records_out", n_seqs)
+
+    if mask is not None:
+        print(f"Masked {int(mask.sum())} of {len(mask)} sites in {n_seqs} sequences")
+    if args.output_report:
+        with instrument.phase("write_report"):
+            write_report(args.output_report, mask, n_counts, gap_counts, n_seqs)
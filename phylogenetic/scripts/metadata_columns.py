@@ -0,0 +1,45 @@
+"""
+Column-projected metadata reading for our scripts. The build metadata is wide
+(urls, authors, titles, per-source columns...) but most scripts only need the
+ID column plus one or two others, so we only ask pandas to parse those and read
+them as strings in fixed-size chunks.
+"""
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from file_io import open_file
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def header(fname):
+    """Returns (delimiter, column names) of a (possibly compressed) metadata TSV/CSV"""
+    with open_file(fname) as fh:
+        line = fh.readline().rstrip('\r\n')
+    delimiter = '\t' if '\t' in line else ','
+    return delimiter, line.split(delimiter)
+
+
+def read_metadata_columns(fname, columns, id_columns=('accession',), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read only the first of *id_columns* present (as the index) and the requested
+    *columns* of the metadata file *fname*, with all values as strings. Columns
+    missing from the metadata are an error, as the caller needs them.
+    """
+    delimiter, names = header(fname)
+    try:
+        id_column = next(name for name in id_columns if name in names)
+    except StopIteration:
+        raise Exception(f"None of the possible id columns ({', '.join(map(repr, id_columns))}) were found in {fname!r}")
+    if missing := [name for name in columns if name not in names]:
+        raise Exception(f"Metadata {fname!r} is missing required column(s): {', '.join(map(repr, missing))}")
+
+    from augur.io import read_metadata
+    chunks = read_metadata(fname, delimiters=(delimiter,), columns=[id_column, *columns], id_columns=(id_column,),
+                           chunk_size=chunk_size, dtype="string")
+    if not chunk_size:
+        return chunks
+    import pandas as pd
+    chunks = list(chunks)
+    if not chunks:  # header-only metadata
+        return read_metadata(fname, delimiters=(delimiter,), columns=[id_column, *columns], id_columns=(id_column,),
+                             dtype="string")
+    return pd.concat(chunks)
@@ -0,0 +1,252 @@
+"""
+Runs `nextclade3 run` via a per-sequence result cache, so that only sequences
+which haven't been seen before (with this dataset & Nextclade version) are
+aligned.
+
+The cache is an SQLite database per (dataset zip SHA-256, Nextclade version) in
+--cache-dir, keyed by a hash of each sequence. It stores the sequence's Nextclade
+TSV row (minus the `index` and `seqName` columns), its aligned sequence and its
+translations. Unseen sequences are deduplicated and sent to Nextclade named by
+their hash, the results added to the cache, and then all outputs are written from
+the cache in input order, with the `index` and `seqName` columns (and the names
+of the aligned and translated sequences) filled in from the input FASTA's header
+lines:
+
+    --output-tsv            Nextclade TSV
+    --output-fasta          aligned sequences (of those which Nextclade aligned)
+    --output-translations   a path template including `{cds}`, one FASTA per CDS
+
+Nextclade is run via `shared/scripts/nextclade_sharded.py`, so --shards and
+--threads can split the unseen sequences across concurrent processes. Any
+unrecognised arguments are passed through to `nextclade3 run`.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+from alignment_store import read_fasta
+
+import instrument
+from file_io import open_file
+
+NEXTCLADE = "nextclade3"
+SHARDED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared", "scripts", "nextclade_sharded.py")
+BATCH_SIZE = 500
+
+
+def sha256sum(fname):
+    h = hashlib.sha256()
+    with open(fname, "rb") as fh:
+        while chunk := fh.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sequence_hash(seq):
+    return hashlib.blake2b(seq, digest_size=16).hexdigest()
+
+
+def nextclade_version():
+    return subprocess.run([NEXTCLADE, "--version"], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def tsv_value(value):
+    """Quote a value for a TSV field if needed (as Python's csv module would)"""
+    if not any(c in value for c in '\t\n\r"'):
+        return value
+    buf = io.StringIO()
+    csv.writer(buf, delimiter="\t", lineterminator="").writerow([value])
+    return buf.getvalue()
+
+
+class ResultCache:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS results (
+                hash TEXT PRIMARY KEY,
+                tsv TEXT NOT NULL,      -- the TSV row after the index & seqName columns
+                alignment BLOB,         -- NULL if nextclade didn't align the sequence
+                translations TEXT       -- JSON of CDS name -> translation
+            );
+        """)
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def missing(self, hashes):
+        """The subset of *hashes* not in the cache"""
+        hashes = list(hashes)
+        present = set()
+        for start in range(0, len(hashes), BATCH_SIZE):
+            batch = hashes[start:start + BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            present.update(h for (h,) in self.db.execute(f"SELECT hash FROM results WHERE hash IN ({placeholders})", batch))
+        return set(hashes) - present
+
+    def lookup(self, hashes):
+        """Map of hash -> (tsv, alignment, translations) for *hashes* (a batch)"""
+        placeholders = ",".join("?" * len(hashes))
+        return {
+            h: (tsv, alignment, json.loads(translations) if translations else {})
+            for h, tsv, alignment, translations
+            in self.db.execute(f"SELECT hash, tsv, alignment, translations FROM results WHERE hash IN ({placeholders})", list(hashes))
+        }
+
+    def add_nextclade_outputs(self, tsv, alignment, translations):
+        """
+        Add the results of a nextclade run where each sequence was named by its
+        hash. *translations* is a dict of CDS name -> FASTA path.
+        """
+        aligned = dict(read_fasta(alignment)) if os.path.exists(alignment) else {}
+        translated = {}
+        for cds, fname in translations.items():
+            for name, seq in read_fasta(fname):
+                translated.setdefault(name, {})[cds] = seq.decode()
+        with open(tsv, newline="") as fh:
+            header = fh.readline().rstrip("\r\n").split("\t")
+            if header[:2] != ["index", "seqName"]:
+                raise Exception(f"Unexpected Nextclade TSV columns {header[:2]} (expected ['index', 'seqName', ...])")
+            self.set_meta("header", header)
+            rows = []
+            for line in fh:
+                _index, name, rest = line.rstrip("\r\n").split("\t", 2)
+                rows.append((name, rest, aligned.get(name), json.dumps(translated[name]) if name in translated else None))
+        self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        if translations:
+            self.set_meta("cds", sorted(set(self.get_meta("cds", [])) | set(translations)))
+        self.db.commit()
+        return len(rows)
+
+
+def write_misses(cache, batch, fh):
+    """Write the (hash, sequence) pairs of *batch* which aren't in *cache* to *fh*"""
+    missing = cache.missing(h for h, _seq in batch) if batch else set()
+    for h, seq in batch:
+        if h in missing:
+            fh.write(b">%s\n%s\n" % (h.encode(), seq))
+    return len(missing)
+
+
+def hash_sequences(fname, cache, misses):
+    """
+    Hash each sequence of the FASTA *fname*, writing those not in *cache* to the
+    FASTA *misses* (once per distinct sequence, named by hash). Returns the
+    input order as a list of (name, hash) and the number of sequences written.
+    """
+    order, seen, written = [], set(), 0
+    with open(misses, "wb") as fh:
+        batch = []
+        # Nextclade names sequences by their whole header line (not just its first word)
+        for name, seq in read_fasta(fname, full_header=True):
+            h = sequence_hash(seq)
+            order.append((name, h))
+            if h not in seen:
+                seen.add(h)
+                batch.append((h, seq))
+            if len(batch) == BATCH_SIZE:
+                written += write_misses(cache, batch, fh)
+                batch = []
+        written += write_misses(cache, batch, fh)
+    return order, written
+
+
+def run_nextclade(sequences, dataset, workdir, extra_args, shards=1, threads=1):
+    """Run nextclade on *sequences* (via `nextclade_sharded.py`), returning
+    (tsv, alignment, {cds: translations})"""
+    tsv = os.path.join(workdir, "nextclade.tsv")
+    alignment = os.path.join(workdir, "alignment.fasta")
+    translations_dir = os.path.join(workdir, "translations")
+    os.makedirs(translations_dir)
+    subprocess.run([
+        sys.executable, SHARDED, sequences,
+        "--executable", NEXTCLADE,
+        "--shards", str(shards),
+        "--threads", str(threads),
+        "--input-dataset", dataset,
+        "--output-tsv", tsv,
+        "--output-fasta", alignment,
+        "--output-translations", os.path.join(translations_dir, "{cds}.fasta"),
+        *extra_args,
+    ], check=True)
+    translations = {fname[:-len(".fasta")]: os.path.join(translations_dir, fname)
+                    for fname in os.listdir(translations_dir) if fname.endswith(".fasta")}
+    return tsv, alignment, translations
+
+
+def write_outputs(cache, order, output_tsv, output_fasta, output_translations):
+    """Write the cached results for *order*, a list of (name, hash), in order"""
+    cds_names = cache.get_meta("cds", [])
+    header = cache.get_meta("header")
+    for cds in cds_names:
+        os.makedirs(os.path.dirname(output_translations.format(cds=cds)) or ".", exist_ok=True)
+    translation_fhs = {cds: open_file(output_translations.format(cds=cds), "w") for cds in cds_names}
+    try:
+        with open_file(output_tsv, "w") as tsv_fh, open_file(output_fasta, "wb") as fasta_fh:
+            if header:
+                print("\t".join(header), file=tsv_fh)
+            for start in range(0, len(order), BATCH_SIZE):
+                batch = order[start:start + BATCH_SIZE]
+                results = cache.lookup({h for _name, h in batch})
+                for index, (name, h) in enumerate(batch, start=start):
+                    if h not in results:
+                        raise Exception(f"No Nextclade result for sequence {name!r}")
+                    tsv, alignment, translations = results[h]
+                    print(index, tsv_value(name), tsv, sep="\t", file=tsv_fh)
+                    if alignment is not None:
+                        fasta_fh.write(b">%s\n%s\n" % (name.encode(), alignment))
+                    for cds, seq in translations.items():
+                        print(f">{name}\n{seq}", file=translation_fhs[cds])
+    finally:
+        for fh in translation_fhs.values():
+            fh.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", required=True, help="FASTA of (unaligned) sequences")
+    parser.add_argument("--input-dataset", required=True, help="Nextclade dataset (zip)")
+    parser.add_argument("--cache-dir", required=True, help="Directory of cache databases (created if needed)")
+    parser.add_argument("--output-tsv", required=True, help="Nextclade TSV output")
+    parser.add_argument("--output-fasta", required=True, help="Aligned FASTA output")
+    parser.add_argument("--output-translations", required=True, help="Translations FASTA output template (must include {cds})")
+    parser.add_argument("--shards", type=int, default=1, help="Number of concurrent nextclade processes (see nextclade_sharded.py)")
+    parser.add_argument("--threads", type=int, default=1, help="Total threads for nextclade")
+    args, extra_args = parser.parse_known_args()
+
+    if "{cds}" not in args.output_translations:
+        parser.error("--output-translations must include '{cds}'")
+
+    instrument.start()
+    key = hashlib.sha256(f"{sha256sum(args.input_dataset)}\n{nextclade_version()}".encode()).hexdigest()
+    os.makedirs(args.cache_dir, exist_ok=True)
+    cache = ResultCache(os.path.join(args.cache_dir, f"{key[:32]}.sqlite"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        misses = os.path.join(workdir, "sequences.fasta")
+        with instrument.phase("hash"):
+            order, n_misses = hash_sequences(args.sequences, cache, misses)
+        instrument.count("records_in", len(order))
+        instrument.count("cache_misses", n_misses)
+        print(f"{len(order)} sequences, {n_misses} of which need to be run through Nextclade")
+        if n_misses:
+            with instrument.phase("nextclade"):
+                n = cache.add_nextclade_outputs(*run_nextclade(misses, args.input_dataset, workdir, extra_args,
+                                                               shards=args.shards, threads=args.threads))
+            print(f"Added {n} Nextclade results to the cache")
+
+    with instrument.phase("write"):
+        write_outputs(cache, order, args.output_tsv, args.output_fasta, args.output_translations)
+    instrument.count("records_out", len(order))
@@ -0,0 +1,296 @@
+"""
+Reroots a Newick tree using the common ancestor of one or more strains as the
+outgroup, optionally removing those strains afterwards.
+
+The tree is first rooted at its midpoint so that the common ancestor of the
+outgroup strains is well defined, then rerooted on that common ancestor. This
+follows the behaviour of Bio.Phylo's `root_at_midpoint`, `root_with_outgroup`
+and `prune` (which the `reroot_tree` rule previously used), but every step here
+is linear in the size of the tree and none of them recurse:
+
+  - the midpoint is found with two farthest-tip searches (the second search
+    starts from the tip found by the first, so together they find the two most
+    distant tips) rather than by rerooting on every tip in turn;
+  - rerooting reverses the parent pointers along a single root-to-node path;
+  - all outgroup strains are removed in one postorder pass, collapsing any
+    internal node which is left with a single child.
+
+Pass `--benchmark` (optionally with tip counts) to time this implementation
+against the Bio.Phylo methods on randomly generated trees.
+"""
+import argparse
+import random
+import sys
+import time
+from Bio import Phylo
+from Bio.Phylo.BaseTree import Clade, Tree
+
+import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+import instrument
+
+
+def preorder(root):
+    """Iterative preorder traversal of the clades below (and including) *root*"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.clades))
+
+
+def parent_map(tree):
+    """Map of each (non-root) clade to its parent clade"""
+    return {child: node for node in preorder(tree.root) for child in node.clades}
+
+
+def path_from_root(node, parents):
+    """Clades from the child of the root down to (and including) *node*, i.e.
+    the same list as Bio.Phylo's `get_path`. Empty if *node* is the root."""
+    path = []
+    while node in parents:
+        path.append(node)
+        node = parents[node]
+    return path[::-1]
+
+
+def farthest_tip(start, parents):
+    """
+    Returns (tip, distance, predecessors) for the tip farthest from *start*,
+    treating the tree as unrooted. *predecessors* maps each visited clade to the
+    clade it was reached from, which allows the path back to *start* to be
+    reconstructed.
+    """
+    predecessors = {start: None}
+    best_tip, best_distance = start, 0.0
+    stack = [(start, 0.0)]
+    while stack:
+        node, distance = stack.pop()
+        if not node.clades and distance > best_distance:
+            best_tip, best_distance = node, distance
+        neighbours = [(child, child.branch_length or 0.0) for child in node.clades]
+        if node in parents:
+            neighbours.append((parents[node], node.branch_length or 0.0))
+        for neighbour, length in neighbours:
+            if neighbour not in predecessors:
+                predecessors[neighbour] = node
+                stack.append((neighbour, distance + length))
+    return best_tip, best_distance, predecessors
+
+
+def root_at_midpoint(tree):
+    """Root *tree* (in-place) at the midpoint of its two most distant tips"""
+    parents = parent_map(tree)
+    first = next(node for node in preorder(tree.root) if not node.clades)
+    tip1, _, _ = farthest_tip(first, parents)
+    tip2, max_distance, predecessors = farthest_tip(tip1, parents)
+
+    # Walk from tip2 back towards tip1 until we've covered half the distance.
+    # Each step traverses a single branch, which belongs to whichever of the
+    # two clades is the child of the other.
+    remainder = 0.5 * max_distance
+    node = tip2
+    while True:
+        previous = predecessors[node]
+        if previous is None:
+            raise ValueError("Somehow, failed to find the midpoint!")
+        child = node if parents.get(node) is previous else previous
+        length = child.branch_length or 0.0
+        if remainder <= length:
+            # the midpoint lies on the branch above `child`
+            distance_above_child = remainder if child is node else length - remainder
+            break
+        remainder -= length
+        node = previous
+
+    root_with_outgroup(tree, child, outgroup_branch_length=distance_above_child, parents=parents)
+
+
+def root_with_outgroup(tree, outgroup, outgroup_branch_length=None, parents=None):
+    """
+    Reroot *tree* (in-place) on the *outgroup* clade, following the edge cases
+    of Bio.Phylo's `root_with_outgroup`:
+      - if *outgroup* is terminal, or *outgroup_branch_length* is given, a new
+        bifurcating root is created on the branch above *outgroup*
+      - otherwise *outgroup* becomes the new (multifurcating) root
+      - an old bifurcating root is dropped, preserving total branch lengths
+    """
+    if parents is None:
+        parents = parent_map(tree)
+    outgroup_path = path_from_root(outgroup, parents)
+    if not outgroup_path:
+        return
+
+    prev_blen = outgroup.branch_length or 0.0
+    if not outgroup.clades or outgroup_branch_length is not None:
+        outgroup.branch_length = outgroup_branch_length or 0.0
+        new_root = Clade(branch_length=tree.root.branch_length, clades=[outgroup])
+        if len(outgroup_path) == 1:
+            # The remainder of the outgroup's original branch now leads to the
+            # rest of the tree. (Bio.Phylo doesn't subtract the outgroup branch
+            # length here, which is why its midpoint rooting doesn't preserve
+            # tip-to-tip distances when the midpoint lies on a root branch.)
+            prev_blen -= outgroup.branch_length
+            new_parent = new_root
+        else:
+            parent = outgroup_path.pop(-2)
+            parent.clades.remove(outgroup)
+            prev_blen, parent.branch_length = parent.branch_length, prev_blen - outgroup.branch_length
+            new_root.clades.insert(0, parent)
+            new_parent = parent
+    else:
+        new_root = outgroup
+        new_root.branch_length = tree.root.branch_length
+        new_parent = new_root
+
+    # Reverse the branches along the path to the outgroup, leaving the other
+    # descendants of each clade on that path as they are
+    for parent in outgroup_path[-2::-1]:
+        parent.clades.remove(new_parent)
+        prev_blen, parent.branch_length = parent.branch_length, prev_blen
+        new_parent.clades.insert(0, parent)
+        new_parent = parent
+
+    old_root = tree.root
+    old_root.clades.remove(outgroup if outgroup in old_root.clades else new_parent)
+    if len(old_root.clades) == 1:
+        ingroup = old_root.clades[0]
+        ingroup.branch_length = (ingroup.branch_length or 0.0) + (prev_blen or 0.0)
+        new_parent.clades.insert(0, ingroup)
+    else:
+        old_root.branch_length = prev_blen
+        new_parent.clades.insert(0, old_root)
+
+    tree.root = new_root
+    tree.rooted = True
+
+
+def find_clades_by_name(tree, names):
+    """Returns the clades with the given names (in the same order), raising a
+    ValueError if any are missing"""
+    wanted = set(names)
+    found = {node.name: node for node in preorder(tree.root) if node.name in wanted}
+    if missing := [name for name in names if name not in found]:
+        raise ValueError(f"The following strains are not in the tree: {', '.join(missing)}")
+    return [found[name] for name in names]
+
+
+def common_ancestor(tree, clades, parents=None):
+    """The most recent common ancestor of the provided *clades*"""
+    if parents is None:
+        parents = parent_map(tree)
+    paths = [[tree.root, *path_from_root(clade, parents)] for clade in clades]
+    ca = tree.root
+    for nodes in zip(*paths):
+        if any(node is not nodes[0] for node in nodes[1:]):
+            break
+        ca = nodes[0]
+    return ca
+
+
+def prune(tree, names):
+    """
+    Remove all terminal clades named in *names* from *tree* (in-place) in a
+    single postorder pass. Internal clades left without children are removed
+    and those left with a single child are collapsed into that child (summing
+    branch lengths), which is the same result as repeated calls to Bio.Phylo's
+    `prune`.
+    """
+    names = set(names)
+    removed = set()
+    for node in reversed(list(preorder(tree.root))):
+        if not node.clades:
+            if node.name in names:
+                removed.add(node)
+            continue
+        children = []
+        for child in node.clades:
+            if child in removed:
+                continue
+            if len(child.clades) == 1:
+                grandchild = child.clades[0]
+                if grandchild.branch_length is not None:
+                    grandchild.branch_length += child.branch_length or 0.0
+                child = grandchild
+            children.append(child)
+        node.clades = children
+        if not children:
+            removed.add(node)
+
+    if tree.root in removed:
+        raise ValueError("Pruning these strains would remove every tip of the tree")
+    if len(tree.root.clades) == 1:
+        child = tree.root.clades[0]
+        if child.branch_length is not None:
+            child.branch_length += tree.root.branch_length or 0.0
+        tree.root = child
+
+
+def reroot(tree, strains, remove_outgroup=False):
+    root_at_midpoint(tree)
+    print("Rooting tree using the common ancestor of these strains as the outgroup:", strains)
+    parents = parent_map(tree)
+    ca = common_ancestor(tree, find_clades_by_name(tree, strains), parents)
+    root_with_outgroup(tree, ca, parents=parents)
+    if remove_outgroup:
+        prune(tree, strains)
+    return tree
+
+
+def random_tree(n_tips, seed=0):
+    """A random (bifurcating, rooted) tree with *n_tips* tips named t0, t1, ..."""
+    rng = random.Random(seed)
+    nodes = [Clade(name=f"t{i}", branch_length=rng.expovariate(100)) for i in range(n_tips)]
+    while len(nodes) > 1:
+        a = nodes.pop(rng.randrange(len(nodes)))
+        b = nodes.pop(rng.randrange(len(nodes)))
+        nodes.append(Clade(branch_length=rng.expovariate(100), clades=[a, b]))
+    nodes[0].branch_length = None
+    return Tree(root=nodes[0], rooted=True)
+
+
+def benchmark(sizes, n_outgroup=2, bio_limit=2000):
+    """Time this implementation against Bio.Phylo on random trees of each size.
+    Bio.Phylo's midpoint rooting is quadratic so it's only run up to *bio_limit* tips."""
+    print("tips\timplementation\tseconds")
+    for n_tips in sizes:
+        strains = [f"t{i}" for i in range(n_outgroup)]
+        tree = random_tree(n_tips)
+        start = time.perf_counter()
+        reroot(tree, strains, remove_outgroup=True)
+        print(f"{n_tips}\treroot_tree.py\t{time.perf_counter() - start:.4f}")
+
+        if n_tips > bio_limit:
+            continue
+        tree = random_tree(n_tips)
+        start = time.perf_counter()
+        tree.root_at_midpoint()
+        tree.root_with_outgroup(tree.common_ancestor(strains))
+        for strain in strains:
+            tree.prune(strain)
+        print(f"{n_tips}\tBio.Phylo\t{time.perf_counter() - start:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tree", help="Newick tree")
+    parser.add_argument("--strains", nargs="+", help="Strains whose common ancestor will be used as the outgroup")
+    parser.add_argument("--remove-outgroup", action="store_true", help="Remove the outgroup strains after rerooting")
+    parser.add_argument("--output", help="Newick output")
+    parser.add_argument("--benchmark", nargs="*", type=int, metavar="N_TIPS",
+                        help="Benchmark against Bio.Phylo using random trees with these numbers of tips")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        benchmark(args.benchmark or [100, 500, 1000, 2000, 10000, 100000])
+        sys.exit(0)
+    if not (args.tree and args.strains and args.output):
+        parser.error("--tree, --strains and --output are required (unless running --benchmark)")
+
+    instrument.start()
+    with instrument.phase("read"):
+        T = Phylo.read(args.tree, "newick")
+    with instrument.phase("reroot"):
+        reroot(T, args.strains, remove_outgroup=args.remove_outgroup)
+    with instrument.phase("write"):
+        Phylo.write(T, args.output, "newick")
+    instrument.count("records_out", T.count_terminals())
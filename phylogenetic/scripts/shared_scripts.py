@@ -0,0 +1,15 @@
+"""
+Puts shared/scripts, the modules shared by the ingest and phylogenetic
+workflows' scripts (instrument, file_io etc.), on sys.path. Scripts import this
+before anything which uses those modules:
+
+    import shared_scripts  # noqa: F401 (puts shared/scripts on sys.path)
+    import instrument
+"""
+import os
+import sys
+
+SHARED_SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared", "scripts")
+
+if SHARED_SCRIPTS not in sys.path:
+    sys.path.append(SHARED_SCRIPTS)
@@ -0,0 +1,112 @@
+"""
+Streaming, transparently (de)compressing file I/O for the workflows' scripts.
+
+`open_file` opens a path like `open`, decompressing it as it's read, or
+compressing it as it's written, according to its extension:
+
+    .zst    Zstandard (via the `zstandard` module, a dependency of augur)
+    .gz     gzip
+    .xz     xz / LZMA
+    .bz2    bzip2
+
+so that compressed inputs (e.g. the workflows' .tsv.zst / .fasta.zst inputs)
+never need a decompressed copy on disk, and outputs are compressed simply by
+giving them one of these extensions. '-' is stdin / stdout. It's a lightweight
+stand-in for `augur.io.open_file`, which imports augur (and pandas etc.).
+
+Run as a script, it copies a file, re-encoding it if the input and output
+extensions' compression differs and otherwise copying its bytes:
+
+    python file_io.py metadata.tsv.zst results/metadata.tsv.zst
+"""
+import io
+import os
+import shutil
+import sys
+
+SUFFIXES = {".zst": "zst", ".gz": "gz", ".xz": "xz", ".bz2": "bz2"}
+
+# Compression levels used when writing (gzip's default of 9 is much slower, for little gain)
+LEVELS = {"zst": 3, "gz": 6, "xz": 6, "bz2": 9}
+
+CHUNK_SIZE = 1 << 20
+
+
+def compression(path):
+    """The compression of *path* according to its extension ('zst', 'gz', 'xz', 'bz2'), or None"""
+    return SUFFIXES.get(os.path.splitext(str(path))[1].lower())
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("reading or writing .zst files requires the `zstandard` Python module") from None
+    return zstandard
+
+
+def open_file(path, mode="r", *, encoding="utf-8", errors=None, newline=None, level=None):
+    """
+    Opens *path* for reading ("r", "rb") or writing ("w", "wb", "a", "ab"), as
+    `open` would, (de)compressing it according to its extension. *level* is
+    the compression level when writing (default: LEVELS).
+    """
+    binary = "b" in mode
+    base = mode.replace("b", "").replace("t", "")
+    if base not in ("r", "w", "a"):
+        raise ValueError(f"unsupported mode {mode!r}")
+    text_args = {} if binary else {"encoding": encoding, "errors": errors, "newline": newline}
+
+    if str(path) == "-":
+        return open((sys.stdin if base == "r" else sys.stdout).fileno(), mode, closefd=False, **text_args)
+
+    kind = compression(path)
+    level = LEVELS.get(kind) if level is None else level
+    if kind is None:
+        return open(path, mode, **text_args)
+    if kind == "gz":
+        import gzip
+        fh = gzip.open(path, base + "b", **({} if base == "r" else {"compresslevel": level}))
+    elif kind == "xz":
+        import lzma
+        fh = lzma.open(path, base + "b", **({} if base == "r" else {"preset": level}))
+    elif kind == "bz2":
+        import bz2
+        fh = bz2.open(path, base + "b", **({} if base == "r" else {"compresslevel": level}))
+    else:
+        zstandard = _zstandard()
+        raw = open(path, base + "b")
+        if base == "r":
+            fh = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True,
+                                                                               closefd=True),
+                                   CHUNK_SIZE)
+        else:
+            fh = io.BufferedWriter(zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True,
+                                                                                      write_return_read=True),
+                                   CHUNK_SIZE)
+    return fh if binary else io.TextIOWrapper(fh, **text_args)
+
+
+def copy(src, dst):
+    """
+    Copies *src* to *dst*, re-encoding it only if their extensions' compression
+    differs (so e.g. a .zst input is copied as-is, without decompressing it)
+    """
+    if compression(src) == compression(dst) and "-" not in (str(src), str(dst)):
+        shutil.copyfile(src, dst)
+        return
+    with open_file(src, "rb") as in_fh, open_file(dst, "wb") as out_fh:
+        shutil.copyfileobj(in_fh, out_fh, CHUNK_SIZE)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="File to copy ('-' for stdin)")
+    parser.add_argument("output", help="Path to copy it to ('-' for stdout)")
+    args = parser.parse_args()
+    try:
+        copy(args.input, args.output)
+    except (OSError, ImportError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,291 @@
+"""
+Fetches a remote file (s3://, https:// or http:// URL) via a content-addressed
+cache which is shared between analysis directories, runs and concurrent builds
+on the same host, so that the same (multi-hundred-MB) inputs aren't downloaded
+by each of them:
+
+    python input_cache.py --cache-dir ~/.cache/nextstrain/ebola/inputs --max-size 20G URL OUTPUT
+
+The cache directory holds:
+
+    blobs/<sha256>      file contents (read-only), named by their SHA-256
+    index.sqlite        URL -> ETag, SHA-256, size and when it was last used
+    locks/<hash>.lock   a lock per URL
+
+A URL which is in the cache is revalidated with a conditional request
+(If-None-Match with its ETag) and only downloaded if it has changed, and URLs
+without an ETag are always downloaded (but stored once if their content hasn't
+changed). Downloads are checked against the sha256sum which `upload-to-s3`
+records in S3 object metadata, if present. Concurrent fetches of a URL wait on
+its lock, so it's only downloaded once.
+
+OUTPUT is a reflink (copy-on-write clone) of the cached file where the
+filesystem supports it, else a copy, and its modification time is set to now (as
+Snakemake compares it against those of the rule's inputs). It's never a hardlink,
+which would share its modification time with the cached file and so with every
+other analysis directory's copy.
+
+After each fetch, the least recently used files are evicted until the cache is
+within --max-size, and files which no URL refers to any more (e.g. the previous
+content of a URL) are removed, except those used in the last EVICTION_GRACE
+seconds (which another process may be about to copy). A cached file's
+modification time is when it was last used.
+
+S3 requests are signed if AWS credentials are available, and otherwise unsigned
+(for public buckets such as nextstrain-data). Set AWS_ENDPOINT_URL to use
+another S3 implementation, e.g. MinIO or `moto_server`, for testing.
+"""
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+import instrument
+
+CHUNK_SIZE = 1 << 20
+TIMEOUT = 60  # seconds, per HTTP(S) socket operation
+EVICTION_GRACE = 600  # seconds
+FICLONE = 0x40049409  # Linux ioctl to clone (reflink) a file
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_size(value):
+    """Bytes of a size such as '500M' or '20G' (binary units), or 0 (no limit) if empty"""
+    value = value.strip().upper().removesuffix("B")
+    if not value:
+        return 0
+    unit = value[-1] if value[-1] in SIZE_UNITS else ""
+    try:
+        return int(float(value[:len(value) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {value!r} (expected e.g. 500M or 20G)") from None
+
+
+class _HashingWriter:
+    """Wraps a binary file object, hashing (and counting) what's written to it"""
+    def __init__(self, fh):
+        self.fh = fh
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fh.write(data)
+
+
+def _s3_client():
+    import boto3
+    from botocore import UNSIGNED
+    from botocore.config import Config
+    if boto3.Session().get_credentials():
+        return boto3.client("s3")
+    return boto3.client("s3", config=Config(signature_version=UNSIGNED))
+
+
+def download(url, etag, fh):
+    """
+    Writes the content of *url* to *fh*, unless its ETag is still *etag*.
+
+    Returns None if it's not modified, else (its ETag, the sha256sum in its
+    metadata), either of which may be None.
+    """
+    info = urlparse(url)
+    if info.scheme == "s3":
+        from botocore.exceptions import ClientError
+        try:
+            response = _s3_client().get_object(Bucket=info.netloc, Key=info.path.lstrip("/"),
+                                               **({"IfNoneMatch": etag} if etag else {}))
+        except ClientError as e:
+            if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+                return None
+            raise
+        shutil.copyfileobj(response["Body"], fh, CHUNK_SIZE)
+        return response.get("ETag"), response.get("Metadata", {}).get("sha256sum")
+    if info.scheme in ("http", "https"):
+        import urllib.error
+        import urllib.request
+        request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                shutil.copyfileobj(response, fh, CHUNK_SIZE)
+                return response.headers.get("ETag"), response.headers.get("x-amz-meta-sha256sum")
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+    raise ValueError(f"unsupported URL {url!r} (expected an s3://, https:// or http:// URL)")
+
+
+def _touch(path):
+    """Sets the modification time of *path* to now, returning False if it doesn't exist"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    except PermissionError:  # another user's blob
+        pass
+    return True
+
+
+class InputCache:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(path, "locks"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=60)
+        self.db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,              -- NULL if the server didn't send one
+                sha256 TEXT NOT NULL,   -- of the content, i.e. the blob's name
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+        """)
+
+    def blob(self, sha256):
+        return os.path.join(self.path, "blobs", sha256)
+
+    @contextlib.contextmanager
+    def lock(self, url):
+        """Holds an exclusive lock on *url* (released if the process dies)"""
+        name = hashlib.sha256(url.encode()).hexdigest()[:32]
+        with open(os.path.join(self.path, "locks", f"{name}.lock"), "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            yield
+
+    def fetch(self, url):
+        """
+        Returns (path of the cached content of *url*, whether it was downloaded),
+        downloading it unless the cached copy is current.
+        """
+        with self.lock(url):
+            with self.db:
+                # mark it as in use first, so it isn't evicted while it's revalidated
+                self.db.execute("UPDATE entries SET last_used = ? WHERE url = ?", (time.time(), url))
+            entry = self.db.execute("SELECT etag, sha256, size FROM entries WHERE url = ?", (url,)).fetchone()
+            if entry and not _touch(self.blob(entry[1])):
+                entry = None
+            with tempfile.NamedTemporaryFile(dir=self.path, prefix=".download-", delete=False) as fh:
+                writer = _HashingWriter(fh)
+                try:
+                    result = download(url, entry[0] if entry else None, writer)
+                except BaseException:
+                    os.unlink(fh.name)
+                    raise
+            if result is None:
+                os.unlink(fh.name)
+                etag, sha256, size = entry
+            else:
+                etag, expected = result
+                sha256, size = writer.sha256.hexdigest(), writer.size
+                if expected and expected != sha256:
+                    os.unlink(fh.name)
+                    raise ValueError(f"the SHA-256 of the downloaded content ({sha256}) doesn't match "
+                                     f"its metadata ({expected})")
+                if _touch(self.blob(sha256)):  # unchanged, or the same as another URL's
+                    os.unlink(fh.name)
+                else:
+                    os.chmod(fh.name, 0o444)
+                    os.replace(fh.name, self.blob(sha256))
+            # the previous content (if it's changed) is left for `evict` to remove
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                (url, etag, sha256, size, time.time()))
+            return self.blob(sha256), result is not None
+
+    def evict(self, max_size):
+        """
+        Removes blobs which no entry refers to, then the least recently used blobs
+        (and their entries) until the cache is within *max_size* bytes (if given).
+        Blobs used in the last EVICTION_GRACE seconds are kept. Returns the number
+        of bytes removed.
+        """
+        now = time.time()
+        removed = 0
+        referenced = {sha256 for sha256, in self.db.execute("SELECT DISTINCT sha256 FROM entries")}
+        for entry in os.scandir(os.path.join(self.path, "blobs")):
+            if entry.name in referenced:
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                stat = entry.stat()
+                if now - stat.st_mtime >= EVICTION_GRACE:
+                    os.unlink(entry.path)
+                    removed += stat.st_size
+        blobs = self.db.execute("""
+            SELECT sha256, MAX(size), MAX(last_used) FROM entries GROUP BY sha256 ORDER BY MAX(last_used)
+        """).fetchall()
+        total = sum(size for _sha256, size, _last_used in blobs)
+        for sha256, size, last_used in blobs:
+            if not max_size or total <= max_size:
+                break
+            if now - last_used < EVICTION_GRACE:
+                continue
+            with self.db:
+                self.db.execute("DELETE FROM entries WHERE sha256 = ?", (sha256,))
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.blob(sha256))
+            total -= size
+            removed += size
+        # downloads left by killed processes
+        for entry in os.scandir(self.path):
+            if entry.name.startswith(".download-") and now - entry.stat().st_mtime > 86400:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(entry.path)
+        return removed
+
+
+def materialise(blob, output):
+    """
+    Creates *output* with the content of *blob*, and a modification time of now:
+    a reflink if the filesystem supports it, else a copy. Returns which it was.
+    """
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = f"{output}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(tmp)
+    try:
+        with open(blob, "rb") as src, open(tmp, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        os.utime(tmp)  # the clone is its own inode, so this leaves the blob alone
+        method = "reflink"
+    except OSError:
+        shutil.copyfile(blob, tmp)
+        method = "copy"
+    os.replace(tmp, output)
+    return method
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", required=True, help="Cache directory (created if needed)")
+    parser.add_argument("--max-size", type=parse_size, default="",
+                        help="Evict the least recently used files beyond this total size, e.g. 20G (default: no limit)")
+    parser.add_argument("url", help="s3://, https:// or http:// URL to fetch")
+    parser.add_argument("output", help="Path to write the file to")
+    args = parser.parse_args()
+    instrument.start()
+
+    cache = InputCache(os.path.expanduser(args.cache_dir))
+    try:
+        with instrument.phase("fetch"):
+            blob, downloaded = cache.fetch(args.url)
+    except Exception as e:
+        print(f"ERROR: Unable to fetch {args.url!r}: {e}", file=sys.stderr)
+        sys.exit(2)
+    instrument.count("downloads" if downloaded else "cache_hits")
+    with instrument.phase("materialise"):
+        method = materialise(blob, args.output)
+    print(f"{'Downloaded' if downloaded else 'Using cached'} {args.url} as {args.output!r} ({method})", file=sys.stderr)
+
+    with instrument.phase("evict"):
+        if removed := cache.evict(args.max_size):
+            print(f"Evicted {removed / 2**20:.1f} MiB from the cache", file=sys.stderr)
@@ -0,0 +1,201 @@
+"""
+Structured timing & memory instrumentation for the workflows' scripts, to see
+which phase of a script (reading, joining, writing...) is hot, which Snakemake's
+whole-process benchmarks can't show.
+
+It's off unless the SCRIPT_METRICS environment variable is set to a file path,
+to which each instrumented script then appends NDJSON records:
+
+    {"event": "phase", "script": "cross_reference_inrb.py", "pid": 4242, "phase": "read",
+     "seconds": 0.41, "cpu_seconds": 0.4, "peak_rss_mb": 212.3, "counts": {"records_in": 35012}}
+    {"event": "script", "script": "cross_reference_inrb.py", "pid": 4242, "argv": [...],
+     "seconds": 1.2, "cpu_seconds": 1.1, "peak_rss_mb": 230.0, "counts": {...}}
+
+Phases nest (the "phase" of a nested record is its path, e.g. "join/update"),
+and a phase left by an exception is recorded with its "error" (type name).
+A phase's peak RSS is sampled every SCRIPT_METRICS_INTERVAL seconds (default
+0.05) where /proc is available, and is otherwise the process's high-water mark
+at the end of the phase. The "script" record is written at exit by scripts which
+call `start()`. Records are appended with one write each, so concurrent jobs
+can share a file.
+
+    import instrument
+
+    @instrument.phase("read")
+    def read_metadata(fname): ...
+
+    if __name__ == "__main__":
+        instrument.start()
+        with instrument.phase("join"):
+            ...
+        instrument.count("records_out", n)
+
+When disabled, `phase()` returns a shared no-op object (and decorating with it
+returns the function unchanged), and `count()` / `start()` return immediately.
+"""
+import os
+import sys
+
+ENV_VAR = "SCRIPT_METRICS"
+INTERVAL_ENV_VAR = "SCRIPT_METRICS_INTERVAL"
+DEFAULT_INTERVAL = 0.05  # seconds
+
+ENABLED = bool(os.environ.get(ENV_VAR))
+_recorder = None
+
+
+class _NullPhase:
+    """What `phase()` returns when instrumentation is disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, fn):
+        return fn
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _get_recorder().enter(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _get_recorder().exit(error=exc_type)
+        return False
+
+    def __call__(self, fn):
+        import functools
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Phase(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class _Recorder:
+    def __init__(self, path, interval):
+        import threading
+        import time
+        self.path = path
+        self.script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+        self.stack = []  # open phases: [name path, start time, start CPU time, peak RSS, counts]
+        self.counts = {}
+        self.started = False
+        self.start_time, self.start_cpu = time.perf_counter(), time.process_time()
+        self.statm = "/proc/self/statm" if os.path.exists("/proc/self/statm") else None
+        self.page_mb = os.sysconf("SC_PAGE_SIZE") / 2**20 if self.statm else 0
+        self.lock = threading.Lock()
+        if self.statm and interval > 0:
+            threading.Thread(target=self._sample, args=(interval,), daemon=True).start()
+
+    def rss_mb(self):
+        """Current RSS (MB), or 0 if unknown"""
+        if not self.statm:
+            return 0.0
+        with open(self.statm) as fh:
+            return int(fh.read().split()[1]) * self.page_mb
+
+    @staticmethod
+    def max_rss_mb():
+        """The process's RSS high-water mark (MB)"""
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10  # bytes on macOS, else KiB
+
+    def _sample(self, interval):
+        import time
+        while True:
+            time.sleep(interval)
+            rss = self.rss_mb()
+            with self.lock:
+                for frame in self.stack:
+                    frame[3] = max(frame[3], rss)
+
+    def enter(self, name):
+        import time
+        path = f"{self.stack[-1][0]}/{name}" if self.stack else name
+        rss = self.rss_mb()
+        with self.lock:
+            self.stack.append([path, time.perf_counter(), time.process_time(), rss, {}])
+
+    def exit(self, error=None):
+        import time
+        end, end_cpu, rss = time.perf_counter(), time.process_time(), self.rss_mb()
+        with self.lock:
+            path, start, start_cpu, peak, counts = self.stack.pop()
+        record = {
+            "phase": path,
+            "seconds": round(end - start, 6),
+            "cpu_seconds": round(end_cpu - start_cpu, 6),
+            "peak_rss_mb": round(max(peak, rss) if self.statm else self.max_rss_mb(), 1),
+        }
+        if counts:
+            record["counts"] = counts
+        if error is not None:
+            record["error"] = error.__name__
+        self.emit("phase", record)
+
+    def count(self, name, n):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+            for frame in self.stack:
+                frame[4][name] = frame[4].get(name, 0) + n
+
+    def finish(self):
+        import time
+        self.emit("script", {
+            "argv": sys.argv[1:],
+            "seconds": round(time.perf_counter() - self.start_time, 6),
+            "cpu_seconds": round(time.process_time() - self.start_cpu, 6),
+            "peak_rss_mb": round(self.max_rss_mb(), 1),
+            "counts": self.counts,
+        })
+
+    def emit(self, event, record):
+        import json
+        line = json.dumps({"event": event, "script": self.script, "pid": os.getpid(), **record}) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+
+def _get_recorder():
+    global _recorder
+    if _recorder is None:
+        interval = float(os.environ.get(INTERVAL_ENV_VAR) or DEFAULT_INTERVAL)
+        _recorder = _Recorder(os.environ[ENV_VAR], interval)
+    return _recorder
+
+
+def phase(name):
+    """
+    A context manager (or function decorator) recording the time and peak RSS
+    of the code it wraps as the phase *name*.
+    """
+    return _Phase(name) if ENABLED else _NULL_PHASE
+
+
+def count(name, n=1):
+    """Add *n* to the counter *name* (e.g. records_in / records_out)"""
+    if ENABLED:
+        _get_recorder().count(name, n)
+
+
+def start():
+    """Start instrumenting the script, writing its summary record at exit"""
+    recorder = _get_recorder() if ENABLED else None
+    if recorder and not recorder.started:
+        import atexit
+        recorder.started = True
+        atexit.register(recorder.finish)
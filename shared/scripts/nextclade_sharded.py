@@ -0,0 +1,185 @@
+"""
+Runs `nextclade run` as several concurrent processes over shards of the input
+FASTA, then merges their outputs back into the original input order.
+
+Records are assigned to the shard with the fewest bases so far, so shards are
+balanced by sequence length as well as count. Each shard is run with
+`--in-order`, which means the outputs can be merged by streaming through the
+shards' files in step with the input order (without holding any shard in memory).
+The merged TSV's `index` column is rewritten to be the position in the input.
+
+Supported outputs are --output-tsv, --output-fasta and --output-translations
+(a path template including `{cds}`). All other arguments (e.g. --input-dataset,
+or --input-ref & --input-annotation) are passed through to each `nextclade run`.
+--threads is divided between the shards via nextclade's --jobs.
+
+    python nextclade_sharded.py --shards 4 --threads 8 sequences.fasta \\
+        --input-dataset dataset.zip --output-tsv nextclade.tsv --output-fasta aligned.fasta
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from file_io import open_file
+
+
+def read_fasta(fh):
+    """Yield (header line, sequence lines) of each record of a FASTA file handle"""
+    header, lines = None, []
+    for line in fh:
+        if line.startswith(">"):
+            if header is not None:
+                yield header, lines
+            header, lines = line, []
+        elif header is not None:
+            lines.append(line)
+    if header is not None:
+        yield header, lines
+
+
+def record_name(header):
+    parts = header[1:].split(maxsplit=1)
+    return parts[0] if parts else ""
+
+
+def split_fasta(fname, shard_fnames):
+    """
+    Split the FASTA *fname* into *shard_fnames*, assigning each record to the
+    shard with the fewest bases so far. Returns the (shard index, name) of each
+    input record, in order.
+    """
+    sizes = [0] * len(shard_fnames)
+    assignment = []
+    handles = [open(f, "w") for f in shard_fnames]
+    try:
+        with open_file(fname) as fh:
+            for header, lines in read_fasta(fh):
+                shard = min(range(len(sizes)), key=sizes.__getitem__)
+                sizes[shard] += sum(len(line) for line in lines)
+                handles[shard].write(header)
+                handles[shard].writelines(lines)
+                assignment.append((shard, record_name(header)))
+    finally:
+        for fh in handles:
+            fh.close()
+    return assignment
+
+
+class PeekableFasta:
+    """Sequential access to the records of a FASTA file (or nothing, if it doesn't exist)"""
+    def __init__(self, fname):
+        self.fh = open(fname) if fname and os.path.exists(fname) else None
+        self.records = read_fasta(self.fh) if self.fh else iter(())
+        self.next = next(self.records, None)
+
+    def take(self, name):
+        """The next record if it's named *name* (advancing past it), else None"""
+        if self.next is None or record_name(self.next[0]) != name:
+            return None
+        record, self.next = self.next, next(self.records, None)
+        return record
+
+    def close(self):
+        if self.fh:
+            self.fh.close()
+
+
+def run_shards(executable, shard_dirs, extra_args, jobs):
+    """Run nextclade on each shard (in its directory) concurrently"""
+    processes = []
+    for shard_dir in shard_dirs:
+        processes.append(subprocess.Popen([
+            executable, "run", os.path.join(shard_dir, "sequences.fasta"),
+            *extra_args,
+            "--in-order",
+            "--jobs", str(jobs),
+            "--output-tsv", os.path.join(shard_dir, "nextclade.tsv"),
+            "--output-fasta", os.path.join(shard_dir, "aligned.fasta"),
+            "--output-translations", os.path.join(shard_dir, "translations", "{cds}.fasta"),
+        ]))
+    failed = [shard_dir for shard_dir, process in zip(shard_dirs, processes) if process.wait() != 0]
+    if failed:
+        raise Exception(f"nextclade failed for shard(s) {', '.join(failed)}")
+
+
+def merge_tsv(shard_dirs, assignment, output):
+    handles = {shard: open(os.path.join(shard_dirs[shard], "nextclade.tsv")) for shard in {s for s, _name in assignment}}
+    try:
+        headers = [fh.readline() for fh in handles.values()]
+        with open_file(output, "w") as out:
+            out.write(next((h for h in headers if h), ""))
+            for index, (shard, _name) in enumerate(assignment):
+                line = handles[shard].readline()
+                if not line:
+                    raise Exception(f"Shard {shard_dirs[shard]} has fewer TSV rows than sequences")
+                _index, rest = line.split("\t", 1)
+                out.write(f"{index}\t{rest}")
+    finally:
+        for fh in handles.values():
+            fh.close()
+
+
+def merge_fasta(shard_fnames, assignment, output):
+    """Merge per-shard FASTAs (each a subset of its shard's records, in order)"""
+    shards = [PeekableFasta(f) for f in shard_fnames]
+    try:
+        with open_file(output, "w") as out:
+            for shard, name in assignment:
+                if record := shards[shard].take(name):
+                    out.write(record[0])
+                    out.writelines(record[1])
+    finally:
+        for shard in shards:
+            shard.close()
+
+
+def sharded_run(executable, sequences, shards, threads, extra_args, output_tsv=None, output_fasta=None,
+                output_translations=None):
+    with tempfile.TemporaryDirectory() as workdir:
+        shard_dirs = [os.path.join(workdir, f"shard_{i}") for i in range(shards)]
+        for shard_dir in shard_dirs:
+            os.makedirs(os.path.join(shard_dir, "translations"))
+        assignment = split_fasta(sequences, [os.path.join(d, "sequences.fasta") for d in shard_dirs])
+        print(f"Running nextclade on {len(assignment)} sequences in {shards} shards")
+        # with fewer sequences than shards, some shards will be empty
+        used = sorted({shard for shard, _name in assignment})
+        run_shards(executable, [shard_dirs[i] for i in used], extra_args, jobs=max(1, threads // shards))
+
+        if output_tsv:
+            merge_tsv(shard_dirs, assignment, output_tsv)
+        if output_fasta:
+            merge_fasta([os.path.join(d, "aligned.fasta") for d in shard_dirs], assignment, output_fasta)
+        if output_translations:
+            cds_names = sorted({f[:-len(".fasta")] for d in shard_dirs
+                                for f in os.listdir(os.path.join(d, "translations")) if f.endswith(".fasta")})
+            for cds in cds_names:
+                fname = output_translations.format(cds=cds)
+                os.makedirs(os.path.dirname(fname) or ".", exist_ok=True)
+                merge_fasta([os.path.join(d, "translations", f"{cds}.fasta") for d in shard_dirs], assignment, fname)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sequences", help="FASTA of (unaligned) sequences")
+    parser.add_argument("--executable", default="nextclade3", help="Nextclade executable")
+    parser.add_argument("--shards", type=int, default=1, help="Number of concurrent nextclade processes")
+    parser.add_argument("--threads", type=int, default=1, help="Total threads, divided between the shards")
+    parser.add_argument("--output-tsv", required=False)
+    parser.add_argument("--output-fasta", required=False)
+    parser.add_argument("--output-translations", required=False, help="Path template (must include {cds})")
+    args, extra_args = parser.parse_known_args()
+
+    if args.output_translations and "{cds}" not in args.output_translations:
+        parser.error("--output-translations must include '{cds}'")
+    shards = max(1, min(args.shards, args.threads))
+
+    if shards == 1:
+        outputs = [[f"--{name.replace('_', '-')}", value] for name, value in
+                   [("output_tsv", args.output_tsv), ("output_fasta", args.output_fasta),
+                    ("output_translations", args.output_translations)] if value]
+        sys.exit(subprocess.run([args.executable, "run", args.sequences, *extra_args, "--jobs", str(args.threads),
+                                 *[arg for pair in outputs for arg in pair]]).returncode)
+
+    sharded_run(args.executable, args.sequences, shards, args.threads, extra_args,
+                output_tsv=args.output_tsv, output_fasta=args.output_fasta, output_translations=args.output_translations)
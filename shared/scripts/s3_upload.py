@@ -0,0 +1,276 @@
+"""
+Uploads a batch of files to S3, skipping those which haven't changed (as
+`shared/vendored/scripts/upload-to-s3` does for a single file):
+
+    python s3_upload.py \\
+        --s3-dst s3://nextstrain-data/files/workflows/ebola \\
+        --cloudfront-domain data.nextstrain.org \\
+        --manifest results/upload/manifest.json \\
+        results/ebov/metadata_open.tsv=ebov/metadata_open.tsv.zst ...
+
+Each file's SHA-256 (and line count) is computed from its uncompressed content,
+or taken from --manifest if the file's size and mtime are those recorded there,
+and compared with the sha256sum metadata of the remote object (which
+`upload-to-s3` also sets). Unchanged files aren't uploaded. Changed files are
+uploaded --jobs at a time, each compressed according to its remote name's
+extension (.zst, .gz or .xz) as it's streamed to a multipart upload, so no
+compressed copy is written to disk. Then a single CloudFront invalidation is
+made for all the changed paths (and waited for, unless --no-wait), and a single Slack
+notification listing them is sent, unless --quiet.
+
+--report writes each file's outcome as JSON. Exits with status 2 if any file
+couldn't be uploaded (after uploading the others, and invalidating them).
+
+Set AWS_ENDPOINT_URL to use another S3 implementation, e.g. MinIO or
+`moto_server`, for testing.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import instrument
+
+CHUNK_SIZE = 1 << 20
+MULTIPART_CHUNK_SIZE = 64 * 2**20
+NOTIFY_SLACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vendored", "scripts", "notify-slack")
+
+# As `upload-to-s3`
+CONTENT_TYPES = {
+    ".tsv": "text/tab-separated-values",
+    ".csv": "text/comma-separated-values",
+    ".ndjson": "application/x-ndjson",
+    ".gz": "application/gzip",
+    ".xz": "application/x-xz",
+    ".zst": "application/zstd",
+}
+
+
+def compressor(dst):
+    """A compressor object (with `compress` and `flush` methods) for *dst*'s extension, or None"""
+    extension = os.path.splitext(dst)[1]
+    if extension == ".zst":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3, threads=-1).compressobj()
+    if extension == ".gz":
+        import zlib
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if extension == ".xz":
+        import lzma
+        return lzma.LZMACompressor(preset=2)
+    return None
+
+
+class CompressingReader:
+    """A (non-seekable) readable stream of the compressed content of a file handle"""
+    def __init__(self, fh, compressor):
+        self.fh = fh
+        self.compressor = compressor
+        self.buffer = bytearray()
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def read(self, size=-1):
+        while not self.eof and (size is None or size < 0 or len(self.buffer) < size):
+            if chunk := self.fh.read(CHUNK_SIZE):
+                self.buffer += self.compressor.compress(chunk)
+            else:
+                self.buffer += self.compressor.flush()
+                self.eof = True
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def log(message):
+    """Prints *message* to stderr in a single write, so those of concurrent uploads don't interleave"""
+    sys.stderr.write(f"{message}\n")
+
+
+def content_hash(path):
+    """(SHA-256, number of lines) of the file *path*"""
+    h, lines = hashlib.sha256(), 0
+    with open(path, "rb") as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            h.update(chunk)
+            lines += chunk.count(b"\n")
+    return h.hexdigest(), lines
+
+
+def remote_hash(client, bucket, key):
+    """The sha256sum metadata of the S3 object, or None if it doesn't exist (or has none)"""
+    from botocore.exceptions import ClientError
+    try:
+        return client.head_object(Bucket=bucket, Key=key).get("Metadata", {}).get("sha256sum")
+    except ClientError as e:
+        # 403 rather than 404 for missing objects without s3:ListBucket permission
+        if e.response.get("Error", {}).get("Code") in ("404", "403", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def upload_file(client, src, bucket, key, sha256, lines, concurrency):
+    from boto3.s3.transfer import TransferConfig
+    extra_args = {
+        "Metadata": {"sha256sum": sha256, "recordcount": str(lines)},
+        "ContentType": CONTENT_TYPES.get(os.path.splitext(key)[1], "text/plain"),
+    }
+    config = TransferConfig(multipart_chunksize=MULTIPART_CHUNK_SIZE, max_concurrency=concurrency)
+    with open(src, "rb") as fh:
+        body = CompressingReader(fh, c) if (c := compressor(key)) else fh
+        client.upload_fileobj(body, bucket, key, ExtraArgs=extra_args, Config=config)
+
+
+class Uploader:
+    def __init__(self, client, s3_dst, manifest, concurrency):
+        self.client = client
+        info = urlparse(s3_dst)
+        self.bucket, self.prefix = info.netloc, info.path.strip("/")
+        self.manifest = manifest
+        self.concurrency = concurrency
+
+    def url(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    def hash(self, src):
+        """(SHA-256, lines) of *src*, from the manifest if its size and mtime are unchanged"""
+        st = os.stat(src)
+        entry = self.manifest.get(os.path.abspath(src), {})
+        if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry["sha256"], entry["lines"]
+        sha256, lines = content_hash(src)
+        self.manifest[os.path.abspath(src)] = {"sha256": sha256, "lines": lines, "size": st.st_size,
+                                               "mtime_ns": st.st_mtime_ns}
+        return sha256, lines
+
+    def __call__(self, src, remote):
+        """Uploads *src* to *remote* (relative to --s3-dst) if it's changed. Returns its report."""
+        key = f"{self.prefix}/{remote}" if self.prefix else remote
+        report = {"file": src, "dst": self.url(key)}
+        try:
+            sha256, lines = self.hash(src)
+            report["sha256"] = sha256
+            if remote_hash(self.client, self.bucket, key) == sha256:
+                log(f"Uploading {src} → {self.url(key)}: files are identical, skipping upload")
+                report["uploaded"] = False
+                return report
+            log(f"Uploading {src} → {self.url(key)}")
+            start = time.perf_counter()
+            upload_file(self.client, src, self.bucket, key, sha256, lines, self.concurrency)
+            report.update(uploaded=True, seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            log(f"ERROR: Uploading {src} → {self.url(key)} failed: {e}")
+            report.update(uploaded=False, error=str(e))
+        return report
+
+
+def invalidate(domain, paths, wait=True):
+    """Create a CloudFront invalidation of *paths* for the distribution of *domain*, and wait for it"""
+    import boto3
+    cloudfront = boto3.client("cloudfront")
+    distribution = next((item["Id"]
+                         for page in cloudfront.get_paginator("list_distributions").paginate()
+                         for item in page["DistributionList"].get("Items", [])
+                         if domain in item.get("Aliases", {}).get("Items", [])), None)
+    if distribution is None:
+        raise RuntimeError(f"Unable to find CloudFront distribution id for {domain} "
+                           "(are your AWS credentials for the right account?)")
+    print(f"Creating CloudFront invalidation of {len(paths)} path(s) for distribution {distribution}", file=sys.stderr)
+    invalidation = cloudfront.create_invalidation(DistributionId=distribution, InvalidationBatch={
+        "Paths": {"Quantity": len(paths), "Items": paths},
+        "CallerReference": f"s3_upload-{os.getpid()}-{time.time()}",
+    })["Invalidation"]["Id"]
+    if not wait:
+        return
+    print(f"Waiting for CloudFront invalidation {invalidation} to complete", file=sys.stderr)
+    cloudfront.get_waiter("invalidation_completed").wait(DistributionId=distribution, Id=invalidation)
+
+
+def read_manifest(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    os.replace(f"{path}.tmp", path)
+
+
+def parse_pair(value):
+    src, sep, remote = value.partition("=")
+    if not sep or not src or not remote:
+        raise argparse.ArgumentTypeError(f"expected LOCAL=REMOTE, not {value!r}")
+    return src, remote.lstrip("/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=parse_pair, metavar="LOCAL=REMOTE",
+                        help="Local file and its remote path, relative to --s3-dst")
+    parser.add_argument("--s3-dst", required=True, help="s3:// URL of the bucket and prefix to upload to")
+    parser.add_argument("--cloudfront-domain", help="Domain whose CloudFront distribution to invalidate the changed paths of")
+    parser.add_argument("--no-wait", action="store_true", help="Don't wait for the CloudFront invalidation to complete")
+    parser.add_argument("--manifest", help="JSON file recording the files' hashes, to avoid re-hashing unchanged files")
+    parser.add_argument("--jobs", type=int, default=4, help="Files to upload at once (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Concurrent part uploads per file (default: %(default)s)")
+    parser.add_argument("--report", help="JSON file to write each file's outcome to")
+    parser.add_argument("--quiet", action="store_true", help="Don't send a Slack notification")
+    args = parser.parse_args()
+    instrument.start()
+
+    if not args.s3_dst.startswith("s3://"):
+        parser.error("--s3-dst must be an s3:// URL")
+    if unreadable := [src for src, _remote in args.files if not os.access(src, os.R_OK)]:
+        print(f"ERROR: Cannot read source file(s): {', '.join(unreadable)}", file=sys.stderr)
+        sys.exit(2)
+
+    import boto3
+    manifest = read_manifest(args.manifest) if args.manifest else {}
+    uploader = Uploader(boto3.client("s3"), args.s3_dst, manifest, args.concurrency)
+    with instrument.phase("upload"), ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        reports = list(pool.map(lambda pair: uploader(*pair), args.files))
+    instrument.count("files_uploaded", sum(r["uploaded"] for r in reports))
+    if args.manifest:
+        write_manifest(args.manifest, manifest)
+
+    uploaded = [r for r in reports if r["uploaded"]]
+    failed = [r for r in reports if "error" in r]
+    print(f"Uploaded {len(uploaded)} of {len(reports)} file(s), {len(failed)} failed", file=sys.stderr)
+
+    if uploaded and args.cloudfront_domain:
+        paths = [urlparse(r["dst"]).path for r in uploaded]
+        try:
+            with instrument.phase("invalidate"):
+                invalidate(args.cloudfront_domain, paths, wait=not args.no_wait)
+        except Exception as e:
+            print(f"CloudFront invalidation failed, but continuing anyway: {e}", file=sys.stderr)
+
+    if uploaded and not args.quiet:
+        message = "\n".join(f"Updated {r['dst']} available." for r in uploaded)
+        if subprocess.run([NOTIFY_SLACK, message]).returncode != 0:
+            print("Notifying Slack failed, but continuing anyway.", file=sys.stderr)
+
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(reports, fh, indent=2)
+            fh.write("\n")
+    if failed:
+        sys.exit(2)
@@ -0,0 +1,118 @@
+"""
+Computes per-sequence statistics of a FASTA file in a single pass:
+
+    length          number of characters
+    ACGT            number of A, C, G & T characters (case-insensitive)
+    N               number of N characters
+    ambiguous       number of other IUPAC ambiguity codes (RYSWKMBDHV)
+    gaps            number of gap ('-') characters
+    sequence_hash   BLAKE2b (128 bit) hex digest of the sequence bytes
+
+Sequences are counted in batches by mapping each byte to a character class and
+taking a single `bincount` over the batch, rather than per-character counting
+in Python.
+
+--aligned omits the `length` column, which for an alignment is the same (the
+alignment length) for every sequence.
+
+--output-index additionally writes the same counts in the format of
+`augur index`, which `augur filter` / `augur subsample` accept via
+--sequence-index (e.g. for min_length) instead of indexing the sequences
+themselves.
+"""
+import argparse
+import contextlib
+import csv
+import hashlib
+import numpy as np
+from file_io import open_file
+
+# Character classes, in the column order of `augur index` (for nucleotides)
+CLASSES = ["A", "C", "G", "T", "N", "other_IUPAC", "-", "?", "invalid_nucleotides"]
+INVALID = CLASSES.index("invalid_nucleotides")
+CLASS_OF_BYTE = np.full(256, INVALID, dtype=np.int64)
+for _idx, _chars in enumerate(["a", "c", "g", "t", "n", "ryswkmbdhv", "-", "?"]):
+    for _c in _chars:
+        CLASS_OF_BYTE[ord(_c)] = CLASS_OF_BYTE[ord(_c.upper())] = _idx
+
+STATS_COLUMNS = ["length", "ACGT", "N", "ambiguous", "gaps", "sequence_hash"]
+BATCH_BYTES = 1 << 24
+
+
+def read_fasta(fname):
+    """Yield (name, sequence bytes) for each record of a (possibly compressed) FASTA file"""
+    name, chunks = None, []
+    with open_file(fname, "rb") as fh:
+        for line in fh:
+            if line.startswith(b">"):
+                if name is not None:
+                    yield name, b"".join(chunks)
+                parts = line[1:].split(maxsplit=1)
+                name, chunks = (parts[0].decode() if parts else ""), []
+            elif name is not None:
+                chunks.append(line.rstrip(b"\r\n"))
+    if name is not None:
+        yield name, b"".join(chunks)
+
+
+def count_classes(seqs):
+    """Return an array of shape (len(seqs), len(CLASSES)) of character class counts"""
+    lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+    codes = CLASS_OF_BYTE[np.frombuffer(b"".join(seqs), dtype=np.uint8)]
+    owner = np.repeat(np.arange(len(seqs), dtype=np.int64), lengths)
+    counts = np.bincount(owner * len(CLASSES) + codes, minlength=len(seqs) * len(CLASSES))
+    return counts.reshape(len(seqs), len(CLASSES))
+
+
+def batches(records, max_bytes=BATCH_BYTES):
+    """Group (name, seq) records into lists of up to *max_bytes* of sequence"""
+    batch, size = [], 0
+    for record in records:
+        batch.append(record)
+        size += len(record[1])
+        if size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def sequence_stats(fname, output, id_column="strain", output_index=None, aligned=False):
+    """
+    Write the stats of each sequence in *fname* to the TSV *output* (and, if
+    given, an `augur index` style TSV to *output_index*). If *aligned*, the
+    `length` column is omitted. Returns the number of sequences.
+    """
+    columns = [c for c in STATS_COLUMNS if not (aligned and c == "length")]
+    n = 0
+    with contextlib.ExitStack() as stack:
+        writer = csv.writer(stack.enter_context(open_file(output, "w", newline="")), delimiter="\t", lineterminator="\n")
+        writer.writerow([id_column, *columns])
+        index_writer = None
+        if output_index:
+            index_writer = csv.writer(stack.enter_context(open_file(output_index, "w", newline="")), delimiter="\t", lineterminator="\n")
+            index_writer.writerow(["strain", "length", *CLASSES])
+        for batch in batches(read_fasta(fname)):
+            counts = count_classes([seq for _name, seq in batch])
+            acgt = counts[:, :4].sum(axis=1)
+            for (name, seq), row, n_acgt in zip(batch, counts.tolist(), acgt.tolist()):
+                stats = [n_acgt, row[4], row[5], row[6], hashlib.blake2b(seq, digest_size=16).hexdigest()]
+                writer.writerow([name, *stats] if aligned else [name, len(seq), *stats])
+                if index_writer:
+                    index_writer.writerow([name, len(seq), *row])
+            n += len(batch)
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", required=True, help="FASTA file")
+    parser.add_argument("--id-column", default="strain", help="Name of the ID column in --output")
+    parser.add_argument("--output", required=True, help="TSV of per-sequence statistics")
+    parser.add_argument("--output-index", required=False, help="Sequence index TSV, as produced by `augur index`")
+    parser.add_argument("--aligned", action="store_true", help="The sequences are aligned (omits the length column)")
+    args = parser.parse_args()
+
+    n = sequence_stats(args.sequences, args.output, id_column=args.id_column, output_index=args.output_index,
+                       aligned=args.aligned)
+    print(f"Computed statistics for {n} sequences")